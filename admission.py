@@ -0,0 +1,205 @@
+"""Допуск обновлений до разбора: лимит на чат, общий лимит исходящих и сброс нагрузки
+
+Telegram принимает от бота около 30 сообщений в секунду всего и около одного
+в секунду в один чат, сверх этого отвечает 429 с retry_after — и ждут все.
+Каждому чату положено ведро токенов (GCRA: одно число — время, когда ведро
+снова будет полным). Сообщение сверх лимита не разбирается: повтор прошлого
+текста отбрасывается, остальное склеивается в одно отложенное сообщение чата
+и обрабатывается, когда у чата появится токен. То же происходит со всеми
+чатами, пока очередь исходящих длиннее ADMISSION_MAX_BACKLOG секунд.
+
+Лимиты действуют на процесс: при нескольких воркерах делите OUTBOUND_RATE
+между ними.
+"""
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+# Сообщений в секунду; 0 снимает лимит
+ADMISSION_CHAT_RATE = float(os.getenv('ADMISSION_CHAT_RATE', '1'))
+ADMISSION_CHAT_BURST = int(os.getenv('ADMISSION_CHAT_BURST', '3'))
+ADMISSION_MAX_CHATS = int(os.getenv('ADMISSION_MAX_CHATS', '10000'))
+# Дольше этого новый ответ не должен ждать общего лимита, иначе — перегрузка
+ADMISSION_MAX_BACKLOG = float(os.getenv('ADMISSION_MAX_BACKLOG', '2'))
+# Исходящих в секунду на процесс; 0 снимает лимит
+OUTBOUND_RATE = float(os.getenv('OUTBOUND_RATE', '30'))
+OUTBOUND_BURST = int(os.getenv('OUTBOUND_BURST', '1'))
+
+# Отложенные сообщения чата склеиваются не длиннее этого
+MERGED_TEXT_LIMIT = 1000
+
+# Решения допуска; MERGED и SHED — заодно метки bot_updates_total
+ADMIT, MERGED, SHED = 'admit', 'merged', 'shed'
+
+
+class RateLimiter:
+    """Общий лимит исходящих: GCRA, хранит одно время, обходится без задачи-наполнителя"""
+
+    def __init__(self, rate: float = OUTBOUND_RATE, burst: int = OUTBOUND_BURST):
+        self.interval = 1 / rate if rate else 0.0
+        self.tolerance = self.interval * (burst - 1)
+        self._tat = 0.0
+        self._lock = threading.Lock()
+
+    def backlog(self, now: Optional[float] = None) -> float:
+        """Сколько секунд прождал бы отправленный сейчас ответ"""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._tat - now - self.tolerance)
+
+    def reserve(self) -> float:
+        """Занимает место в расписании; возвращает, сколько до него ждать"""
+        now = time.monotonic()
+        with self._lock:
+            tat = max(self._tat, now)
+            self._tat = tat + self.interval
+        return max(0.0, tat - now - self.tolerance)
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class ChatBucket:
+    """Состояние чата: ведро токенов, прошлый текст и отложенные сообщения"""
+
+    __slots__ = ('tat', 'last', 'pending', 'scheduled')
+
+    def __init__(self):
+        self.tat = 0.0
+        self.last = None
+        self.pending = None
+        self.scheduled = False
+
+
+class AdmissionController:
+    """Решает до разбора, обрабатывать ли сообщение сейчас, позже или никогда
+
+    Чаты хранятся в OrderedDict в порядке последнего сообщения. Чат с полным
+    ведром и без отложенного текста ничем не отличается от нового, поэтому
+    такие записи из начала удаляются без потерь; сверх max_chats вытесняются
+    самые давние. Отложенный текст дожидается токена по таймеру цикла событий,
+    а без цикла (ответ в теле webhook) — уходит вместе со следующим сообщением чата.
+    """
+
+    def __init__(self, on_ready: Optional[Callable[[Any, str], Awaitable[Any]]] = None,
+                 rate: float = ADMISSION_CHAT_RATE, burst: int = ADMISSION_CHAT_BURST,
+                 max_chats: int = ADMISSION_MAX_CHATS, max_backlog: float = ADMISSION_MAX_BACKLOG,
+                 outbound: Optional[RateLimiter] = None):
+        self.on_ready = on_ready
+        self.interval = 1 / rate if rate else 0.0
+        self.tolerance = self.interval * (burst - 1)
+        self.max_chats = max_chats
+        self.max_backlog = max_backlog
+        self.outbound = outbound or RateLimiter()
+        self.merged = 0
+        self.shed = 0
+        self._chats = OrderedDict()
+        self._lock = threading.Lock()
+        self._tasks = set()
+
+    def _wait(self, bucket: ChatBucket, now: float) -> float:
+        """Сколько ждать токена чату с учетом перегрузки исходящих"""
+        return max(bucket.tat - now - self.tolerance,
+                   self.outbound.backlog(now) - self.max_backlog)
+
+    def _take(self, bucket: ChatBucket, now: float):
+        bucket.tat = max(bucket.tat, now) + self.interval
+
+    def admit(self, chat_id, text: str) -> Tuple[str, Optional[str]]:
+        """(ADMIT, текст для разбора), (MERGED, None) или (SHED, None)
+
+        Текст допущенного сообщения включает отложенные сообщения чата.
+        """
+        now = time.monotonic()
+        key = hash(text)
+        # Пока исходящие перегружены, ждут все чаты, даже с полным ведром
+        overload = self.outbound.backlog(now) - self.max_backlog
+        with self._lock:
+            chats = self._chats
+            bucket = chats.get(chat_id)
+            if bucket is None:
+                # Таблица растет только здесь, здесь же и чистится
+                self._evict(now)
+                bucket = chats[chat_id] = ChatBucket()
+            else:
+                chats.move_to_end(chat_id)
+            repeat = bucket.last == key
+            bucket.last = key
+
+            # _wait и _take повторены здесь: вызовы методов дороже самой арифметики
+            tat = bucket.tat if bucket.tat > now else now
+            wait = max(tat - now - self.tolerance, overload)
+            if wait <= 0:
+                bucket.tat = tat + self.interval
+                if bucket.pending is not None:
+                    text = _merge(bucket.pending, text)
+                    bucket.pending = None
+                decision = ADMIT
+            elif repeat:
+                self.shed += 1
+                decision, text = SHED, None
+            else:
+                bucket.pending = text if bucket.pending is None else _merge(bucket.pending, text)
+                self.merged += 1
+                self._schedule(chat_id, bucket, wait)
+                decision, text = MERGED, None
+        return decision, text
+
+    def _schedule(self, chat_id, bucket: ChatBucket, delay: float):
+        if bucket.scheduled or self.on_ready is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Синхронный ответ: текст уйдет со следующим сообщением чата
+            return
+        bucket.scheduled = True
+        loop.call_later(delay, self._flush, chat_id)
+
+    def _flush(self, chat_id):
+        """Таймер отложенного текста: отдает его on_ready или ждет дальше"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                return
+            bucket.scheduled = False
+            if bucket.pending is None:
+                return
+            wait = self._wait(bucket, now)
+            if wait > 0:
+                self._schedule(chat_id, bucket, wait)
+                return
+            self._take(bucket, now)
+            text, bucket.pending = bucket.pending, None
+
+        task = asyncio.ensure_future(self.on_ready(chat_id, text))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _evict(self, now: float):
+        chats = self._chats
+        while chats:
+            chat_id, bucket = next(iter(chats.items()))
+            idle = bucket.tat <= now and bucket.pending is None
+            if not idle and len(chats) < self.max_chats:
+                break
+            if bucket.pending is not None:
+                self.shed += 1
+            del chats[chat_id]
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+
+def _merge(pending: str, text: str) -> str:
+    """Склеивает сообщения чата; при переполнении отрезает самые старые строки"""
+    merged = f"{pending}\n{text}"
+    if len(merged) > MERGED_TEXT_LIMIT:
+        merged = merged[-MERGED_TEXT_LIMIT:]
+        merged = merged.partition('\n')[2] or merged
+    return merged
@@ -1,157 +1,216 @@
 import os
-import re
+import sys
 import json
+import time
 import asyncio
-import aiohttp
-from http.server import BaseHTTPRequestHandler
-from urllib.parse import parse_qs
 
-class WebhookHandler(BaseHTTPRequestHandler):
+# Общие модули лежат в корне проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram_client import TelegramClient
+from loop_runner import loop_runner
+from context_store import ChatContext, create_context_store
+from reply_queue import ReplyQueue
+from update_dedup import UpdateDeduplicator
+from admission import AdmissionController, ADMIT
+from metrics import (registry, stage_seconds, updates_total, parse_misses_total, unknown_brands_total,
+                     errors_total, duplicate_updates_total, profiler, register_bot, CONTENT_TYPE)
+
+# Один цикл событий на весь теплый воркер; PERSISTENT_LOOP=0 возвращает цикл на каждый запрос
+PERSISTENT_LOOP = os.getenv('PERSISTENT_LOOP', '1') != '0'
+
+# Как отвечать на webhook:
+#   inline   — дождаться отправки ответа в Telegram (по умолчанию);
+#   queue    — сразу вернуть 200, ответ отправят фоновые воркеры очереди
+#              (для долгоживущих процессов: после ответа функция может быть заморожена);
+#   response — вернуть ответ в теле ответа на webhook, без исходящего запроса
+WEBHOOK_MODE = os.getenv('WEBHOOK_MODE', 'inline')
+
+# Тарифы, парсер и расчет импортируются при первом обращении: /start и /help обходятся без них,
+# а дальше берутся из глобальных, без import на каждом сообщении
+_tariff_store = None
+_parser = None
+_quote_formatter = None
+
+class WebhookHandler:
     def __init__(self):
         self.bot_token = os.getenv('BOT_TOKEN', '')
-        
-        # Тарифы
-        self.tariffs = {
-            'B1': {'name': 'до 1600 см³', 'price': 1959},
-            'B2': {'name': '1601-2000 см³', 'price': 2527},
-            'B3': {'name': '2001-3000 см³', 'price': 2585},
-            'B4': {'name': 'свыше 3000 см³', 'price': 3349}
-        }
-        
-        self.car_brands = [
-            'BMW', 'MERCEDES', 'AUDI', 'VOLKSWAGEN', 'TOYOTA', 'HONDA', 'NISSAN',
-            'HYUNDAI', 'KIA', 'FORD', 'CHEVROLET', 'OPEL', 'PEUGEOT', 'RENAULT',
-            'LEXUS', 'DAEWOO', 'MAZDA', 'SUBARU', 'MITSUBISHI', 'LADA'
-        ]
+        self.telegram = TelegramClient(self.bot_token)
+        self.reply_queue = ReplyQueue(self.send_message)
+        self.dedup = UpdateDeduplicator()
+        self.admission = AdmissionController(self.send_merged)
+        self.user_contexts = create_context_store()
     
     def get_category(self, engine_volume):
-        try:
-            volume = int(engine_volume)
-            if volume <= 1600:
-                return 'B1'
-            elif volume <= 2000:
-                return 'B2'
-            elif volume <= 3000:
-                return 'B3'
-            else:
-                return 'B4'
-        except:
-            return 'B2'
+        global _tariff_store
+        if _tariff_store is None:
+            from tariff_store import tariff_store as _tariff_store
+        return _tariff_store.current.engine.get_category(engine_volume)
     
     def parse_text(self, text):
-        text = text.upper().strip()
-        result = {'brand': None, 'model': None, 'engine_volume': None}
-        
-        # Поиск объема двигателя
-        volume_patterns = [
-            r'(\d{3,4})\s*(?:СМ|CM|КУБОВ|КУБ)',
-            r'(\d{1,2})[.,](\d{3})',
-            r'(\d{3,4})(?=\s|$)'
-        ]
-        
-        for pattern in volume_patterns:
-            match = re.search(pattern, text)
-            if match:
-                if len(match.groups()) == 2:
-                    volume = match.group(1) + match.group(2)
-                else:
-                    volume = match.group(1)
-                
-                if 500 <= int(volume) <= 8000:
-                    result['engine_volume'] = volume
-                    break
-        
-        # Поиск марки
-        for brand in self.car_brands:
-            if brand in text:
-                result['brand'] = brand
-                break
-        
-        return result
+        global _parser
+        if _parser is None:
+            from text_parser import vehicle_parser as _parser
+        return _parser.parse(text)
     
     def format_result(self, data):
-        engine_volume = data.get('engine_volume')
-        if not engine_volume:
-            return "❓ Не указан объем двигателя. Напиши например: 'BMW X3 1998 см³'"
+        global _quote_formatter
+        if _quote_formatter is None:
+            from quotes import quote_formatter as _quote_formatter
+        return _quote_formatter.format(data)
+    
+    async def send_message(self, chat_id, text):
+        # Общий лимит исходящих: ждем своего места в расписании, а не 429 от Telegram
+        await self.admission.outbound.acquire()
+        return await self.telegram.send_message(chat_id, text)
+    
+    def build_reply(self, update_data):
+        """Готовит ответ на обновление: (chat_id, текст) или None, если отвечать не нужно"""
+        # Повтор webhook от Telegram отбрасываем до любого разбора
+        if self.dedup.seen(update_data.get('update_id')):
+            updates_total.inc('duplicate')
+            duplicate_updates_total.inc()
+            return None
         
-        category = self.get_category(engine_volume)
-        price = self.tariffs[category]['price']
+        message = update_data.get('message', {})
+        if not message:
+            return None
         
-        brand = data.get('brand', 'Автомобиль')
-        model = data.get('model', '')
-        volume_liters = f"{float(engine_volume)/1000:.3f} л"
+        chat_id = message['chat']['id']
         
-        vehicle_name = f"{brand} {model}".strip()
-        if volume_liters:
-            vehicle_name += f", {volume_liters} бензин"
+        # Сверх лимита чата текст не разбираем: повтор отбрасывается, остальное ждет токена
+        decision, text = self.admission.admit(chat_id, message.get('text', ''))
+        if decision != ADMIT:
+            updates_total.inc(decision)
+            return None
         
-        return f"""✅ Ціна автоцивілки (ОСЦПВ) для {vehicle_name}:
-🩺 Покриття: життя і здоров'я потерпілих до 5 000 000 грн
-🚗 Покриття: майно потерпілих до 1 250 000 грн
-👤 Діє для водіїв віком: більше 30 років
-💰 Ціна: {price} грн"""
+        return chat_id, self.reply_text(chat_id, text)
     
-    async def send_message(self, chat_id, text):
-        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-        data = {
-            'chat_id': chat_id,
-            'text': text
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=data) as response:
-                return await response.json()
-    
-    async def process_update(self, update_data):
-        try:
-            message = update_data.get('message', {})
-            if not message:
-                return
-            
-            chat_id = message['chat']['id']
-            text = message.get('text', '')
-            
-            if text == '/start':
-                response = """🚗 Привет! Я помогу рассчитать ОСЦПВ.
+    def reply_text(self, chat_id, text):
+        if text == '/start':
+            updates_total.inc('command')
+            response = """🚗 Привет! Я помогу рассчитать ОСЦПВ.
 
 💬 Напиши данные автомобиля:
 • "BMW X3 1998 см³"
 • "Toyota Camry 1800"
 
 Что рассчитываем?"""
-            
-            elif text == '/help':
-                response = """ℹ️ Как использовать:
+        
+        elif text == '/help':
+            updates_total.inc('command')
+            response = """ℹ️ Как использовать:
 
 💭 Пиши естественно:
 • "BMW X3 объем 2000"
 • "хочу для Тойоты, 1800 кубов"
 
 Бот понимает обычную речь! 😊"""
-            
-            else:
+        
+        else:
+            with stage_seconds.time('parse'):
                 parsed = self.parse_text(text)
-                
-                if parsed['engine_volume']:
+            
+            # Объем без марки продолжает описание авто из прошлых сообщений
+            with stage_seconds.time('context'):
+                context = self.user_contexts.get(chat_id)
+                if context is not None and context.brand and parsed.get('brand_guessed'):
+                    # Марка, угаданная по опечатке, не заменяет уже названную в диалоге
+                    parsed = dict(parsed, brand=None, model=None)
+                if context is not None and parsed['engine_volume']:
+                    parsed = context.merge(parsed)
+                if parsed['brand'] or parsed['engine_volume']:
+                    self.user_contexts.set(chat_id, ChatContext.from_dict(parsed))
+            
+            if parsed['engine_volume']:
+                updates_total.inc('quote')
+                if not parsed['brand']:
+                    unknown_brands_total.inc()
+                with stage_seconds.time('format'):
                     response = self.format_result(parsed)
-                elif any(word in text.lower() for word in ['спасибо', 'дякую']):
-                    response = "😊 Пожалуйста! Обращайтесь для новых расчетов."
+            elif any(word in text.lower() for word in ['спасибо', 'дякую']):
+                updates_total.inc('smalltalk')
+                response = "😊 Пожалуйста! Обращайтесь для новых расчетов."
+            else:
+                if parsed['brand']:
+                    updates_total.inc('ask_volume')
+                    response = f"🔍 Понял: {parsed['brand']}\n\n❓ Какой объем двигателя в см³?"
                 else:
-                    if parsed['brand']:
-                        response = f"🔍 Понял: {parsed['brand']}\n\n❓ Какой объем двигателя в см³?"
-                    else:
-                        response = "🤔 Не понял. Напиши например: 'BMW X3 1998 см³'"
+                    updates_total.inc('not_understood')
+                    parse_misses_total.inc()
+                    response = "🤔 Не понял. Напиши например: 'BMW X3 1998 см³'"
+        
+        return response
+    
+    async def process_update(self, update_data):
+        """Обрабатывает обновление от Telegram"""
+        started = time.perf_counter()
+        try:
+            with profiler.sample():
+                reply = self.build_reply(update_data)
+            if reply is not None:
+                # Отправляем ответ
+                with stage_seconds.time('send'):
+                    await self.send_message(*reply)
             
-            await self.send_message(chat_id, response)
+        except Exception as e:
+            errors_total.inc('process_update')
+            print(f"Ошибка: {e}")
+        finally:
+            stage_seconds.observe(time.perf_counter() - started, 'total')
+    
+    async def send_merged(self, chat_id, text):
+        """Отвечает на отложенные и склеенные сообщения чата, когда у него появился токен"""
+        try:
+            response = self.reply_text(chat_id, text)
+            with stage_seconds.time('send'):
+                await self.send_message(chat_id, response)
+        
+        except Exception as e:
+            errors_total.inc('send_merged')
+            print(f"Ошибка: {e}")
+    
+    async def enqueue_update(self, update_data):
+        """Готовит ответ и отдает его фоновой очереди, не дожидаясь Telegram"""
+        try:
+            reply = self.build_reply(update_data)
+            if reply is not None:
+                await self.reply_queue.put(*reply)
             
         except Exception as e:
+            errors_total.inc('enqueue_update')
             print(f"Ошибка: {e}")
+    
+    def reply_payload(self, update_data):
+        """Ответ в виде вызова Bot API для тела ответа на webhook (без исходящего запроса)"""
+        try:
+            reply = self.build_reply(update_data)
+        except Exception as e:
+            errors_total.inc('reply_payload')
+            print(f"Ошибка: {e}")
+            return None
+        if reply is None:
+            return None
+        
+        # Отправит Telegram, но в общий лимит исходящих ответ тоже входит
+        self.admission.outbound.reserve()
+        chat_id, text = reply
+        return {'method': 'sendMessage', 'chat_id': chat_id, 'text': text}
 
 # Глобальный экземпляр
 webhook_handler = WebhookHandler()
+loop_runner.add_shutdown_callback(webhook_handler.reply_queue.close, before_drain=True)
+loop_runner.add_shutdown_callback(webhook_handler.telegram.close)
+register_bot(webhook_handler)
 
 def handler(request, response):
     """Главная функция для Vercel API"""
+    # GET /metrics (маршрут в vercel.json ведет сюда же)
+    path = request.get('path') or request.get('url') or ''
+    if path.split('?')[0].rstrip('/').endswith('/metrics'):
+        response.setHeader('Content-Type', CONTENT_TYPE)
+        return response.status(200).send(registry.render())
+    
     try:
         # Получаем тело запроса
         body = request.get('body', '{}')
@@ -160,11 +219,22 @@ def handler(request, response):
         else:
             update_data = body
         
+        if WEBHOOK_MODE == 'response':
+            # Telegram сам выполнит sendMessage из тела ответа
+            payload = webhook_handler.reply_payload(update_data) or {"status": "ok"}
+            return response.status(200).json(payload)
+        
         # Обрабатываем асинхронно
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(webhook_handler.process_update(update_data))
-        loop.close()
+        if WEBHOOK_MODE == 'queue':
+            loop_runner.run(webhook_handler.enqueue_update(update_data))
+        elif PERSISTENT_LOOP:
+            loop_runner.run(webhook_handler.process_update(update_data))
+        else:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(webhook_handler.process_update(update_data))
+            loop.run_until_complete(webhook_handler.telegram.close())
+            loop.close()
         
         return response.status(200).json({"status": "ok"})
         
@@ -0,0 +1,95 @@
+"""Поиск марки по каталогу: перебор всех названий с Левенштейном против индекса триграмм
+
+Каталог data/vehicle_catalog.json дополняется синтетическими моделями до
+нескольких размеров; запросы — кириллица, падежи и опечатки вперемешку со
+словами обычного сообщения. Кэш слов отключен, чтобы мерить сам индекс.
+
+Запуск: python benchmarks/bench_brand_catalog.py [--words 2000] [--sizes 500,2000,10000,50000]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from brand_catalog import (CATALOG_PATH, BrandCatalog, load_catalog, levenshtein,
+                           max_distance, phonetic_key)
+
+QUERIES = [
+    'Тойоты', 'Тайота', 'мерс', 'Мерседеса', 'Фольксваген', 'фольцваген', 'Шкоде', 'Хюндай',
+    'Хендай', 'Ситроена', 'Опеля', 'камри', 'Королла', 'солярис', 'октавия', 'пассат', 'Toyta',
+    'Volkswagn', 'Mitsubisi', 'аутлендер', 'Ниссан', 'Шевроле',
+    'хочу', 'для', 'сколько', 'стоит', 'страховка', 'машину', 'привет', 'кубов', 'полис',
+    'Добрий', 'день', 'Скільки', 'коштує', 'авто', 'газу', 'газе', 'супер',
+]
+
+CONSONANTS = 'BDFGKLMNPRSTVZ'
+VOWELS = 'AEIOU'
+
+
+def grow(brands, size, seed=1):
+    """Копия каталога с синтетическими моделями до size записей"""
+    rnd = random.Random(seed)
+    grown = {brand: {'aliases': list(item.get('aliases', ())), 'models': list(item.get('models', ()))}
+             for brand, item in brands.items()}
+    names = list(grown)
+    keys = set(BrandCatalog(grown, cache_size=0).keys)
+    while len(keys) < size:
+        model = ''.join(rnd.choice(CONSONANTS) + rnd.choice(VOWELS) for _ in range(rnd.randint(2, 4)))
+        if phonetic_key(model) not in keys:
+            keys.add(phonetic_key(model))
+            grown[rnd.choice(names)]['models'].append(model)
+    return grown
+
+
+def linear_lookup(catalog):
+    """Наивный способ: расстояние до каждого ключа каталога"""
+    keys = catalog.keys
+
+    def lookup(word):
+        key = phonetic_key(word)
+        limit = max_distance(key)
+        best, best_distance = None, limit + 1
+        for index, candidate in enumerate(keys):
+            distance = levenshtein(key, candidate, limit)
+            if distance < best_distance:
+                best, best_distance = index, distance
+        return None if best is None else catalog.entries[best]
+    return lookup
+
+
+def measure(lookup, words):
+    started = time.perf_counter()
+    for word in words:
+        lookup(word)
+    return (time.perf_counter() - started) / len(words) * 1e6
+
+
+def main(count, sizes):
+    with open(CATALOG_PATH, encoding='utf-8') as f:
+        brands = json.load(f)['brands']
+    rnd = random.Random(7)
+    words = [rnd.choice(QUERIES) for _ in range(count)]
+
+    base = load_catalog()
+    found = sum(1 for word in QUERIES if base.lookup(word) is not None)
+    print(f"{found} of {len(QUERIES)} query words resolve in the shipped catalog ({len(base)} entries)")
+
+    print(f"{'entries':>8}{'linear us/word':>16}{'index us/word':>15}{'speedup':>9}")
+    for size in sizes:
+        catalog = BrandCatalog(grow(brands, size), cache_size=0)
+        # Перебор медленный: на больших каталогах хватает части запросов
+        linear = measure(linear_lookup(catalog), words[:max(50, count * 500 // size)])
+        indexed = measure(catalog.lookup, words)
+        print(f"{len(catalog):>8}{linear:>16.1f}{indexed:>15.1f}{linear / indexed:>8.0f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--words', type=int, default=2000)
+    parser.add_argument('--sizes', default='500,2000,10000,50000')
+    args = parser.parse_args()
+    main(args.words, [int(size) for size in args.sizes.split(',')])
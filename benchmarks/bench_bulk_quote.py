@@ -0,0 +1,66 @@
+"""Массовый расчет цен для автопарка: построчно против векторного TariffHandler.quote_dataframe
+
+Запуск: python benchmarks/bench_bulk_quote.py [--rows 100000]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from excel_handler import TariffHandler
+
+VEHICLE_TYPES = ['легковой', 'седан', 'грузовик', 'фургон', 'автобус', 'мотоцикл', 'прицеп', 'трактор', '']
+
+
+def make_fleet(rows, seed=7):
+    rnd = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'brand': rnd.choice(['BMW', 'TOYOTA', 'MAN', 'SKODA', 'RENAULT'], rows),
+        'model': rnd.choice(['X3', 'CAMRY', 'TGS', 'OCTAVIA', 'MASTER'], rows),
+        'engine_volume': rnd.integers(900, 6000, rows),
+        'vehicle_type': rnd.choice(VEHICLE_TYPES, rows),
+        'driver_age': rnd.integers(18, 75, rows),
+    })
+
+
+def quote_rowwise(handler, df):
+    """Тот же расчет через get_car_category/get_price по одной строке"""
+    prices = []
+    for volume, vehicle_type, age in zip(df['engine_volume'], df['vehicle_type'], df['driver_age']):
+        category = handler.search_category_by_name(vehicle_type) if vehicle_type else 'AUTO'
+        if category in ('AUTO', 'B2'):
+            category = handler.get_car_category(volume)
+        prices.append(handler.get_price(category, age >= 30))
+    return prices
+
+
+def main(rows):
+    handler = TariffHandler()
+    df = make_fleet(rows)
+
+    started = time.perf_counter()
+    expected = quote_rowwise(handler, df)
+    rowwise = time.perf_counter() - started
+
+    handler.quote_dataframe(df.head(10))  # прогрев
+    started = time.perf_counter()
+    result = handler.quote_dataframe(df)
+    vectorized = time.perf_counter() - started
+
+    assert list(result['price']) == expected, 'векторный расчет расходится с построчным'
+
+    print(f"rows: {rows}")
+    print(f"row-by-row:  {rowwise:.3f} s")
+    print(f"vectorized:  {vectorized:.3f} s  ({rows / vectorized:,.0f} rows/s, x{rowwise / vectorized:.0f})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+    main(args.rows)
@@ -0,0 +1,165 @@
+"""Всплеск нагрузки: спамер, групповой чат и обычные пользователи против лимитов Telegram
+
+Заглушка Bot API отвечает 429 (retry_after=1), как Telegram: больше 30
+sendMessage за секунду всего или больше 4 за секунду в один чат. Сравнивает
+бота без допуска и с AdmissionController: сколько было 429, сколько ответов
+не дошло и как долго ждали ответа обычные пользователи. Вторая часть
+проверяет, что состояние чатов не растет сверх max_chats.
+
+Запуск: python benchmarks/bench_burst.py [--spam 400] [--group 60] [--users 50] [--seconds 2]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from collections import defaultdict, deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+
+from admission import AdmissionController, RateLimiter, ChatBucket
+from benchmarks.corpus import make_messages, make_update
+from benchmarks.fake_telegram import FakeTelegram
+
+SPAMMER, GROUP = 1, 2
+
+
+class LimitedTelegram(FakeTelegram):
+    """Заглушка с лимитами Telegram на sendMessage за последнюю секунду"""
+
+    def __init__(self, global_limit=30, chat_limit=4, retry_after=1, latency=0.01):
+        super().__init__(latency=latency)
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.retry_after = retry_after
+        self.rejected = 0
+        self._sent = deque()
+        self._chat_sent = defaultdict(deque)
+        # chat_id -> время принятых ответов
+        self.replies = defaultdict(list)
+
+    async def _on_call(self, request):
+        if request.match_info['method'] == 'sendMessage':
+            chat_id = (await request.json())['chat_id']
+            now = time.monotonic()
+            chat_sent = self._chat_sent[chat_id]
+            for window in (self._sent, chat_sent):
+                while window and now - window[0] >= 1.0:
+                    window.popleft()
+            if len(self._sent) >= self.global_limit or len(chat_sent) >= self.chat_limit:
+                self.rejected += 1
+                body = {'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry later',
+                        'parameters': {'retry_after': self.retry_after}}
+                return web.json_response(body, status=429)
+            self._sent.append(now)
+            chat_sent.append(now)
+            self.replies[chat_id].append(now)
+        return await super()._on_call(request)
+
+
+def make_schedule(spam, group, users, seconds, seed=5):
+    """(время от начала, update): спамер все время, групповой чат пачкой, пользователи по одному"""
+    rnd = random.Random(seed)
+    texts = make_messages(spam + group + users, seed=seed)
+    schedule = []
+    for i in range(spam):
+        # Половина спама — один и тот же текст
+        text = 'BMW X5 3000' if i % 2 else texts[i]
+        schedule.append((seconds * i / spam, SPAMMER, text))
+    for i in range(group):
+        schedule.append((0.5 + 0.3 * i / group, GROUP, texts[spam + i]))
+    for i in range(users):
+        schedule.append((rnd.uniform(0, seconds), 1000 + i, texts[spam + group + i]))
+    schedule.sort(key=lambda item: item[0])
+    return [(at, make_update(500000 + i, text, chat_id=chat_id)) for i, (at, chat_id, text) in enumerate(schedule)]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else float('nan')
+
+
+async def replay(bot, schedule):
+    """Доставляет update по расписанию; возвращает время доставки первого сообщения чата"""
+    started = time.monotonic()
+    delivered = {}
+
+    async def deliver(at, update):
+        await asyncio.sleep(at)
+        delivered.setdefault(update['message']['chat']['id'], time.monotonic())
+        await bot.process_update(update)
+
+    await asyncio.gather(*(deliver(at, update) for at, update in schedule))
+    # Отложенные и склеенные сообщения уходят по таймерам допуска
+    admission = bot.admission
+    while admission._tasks or any(bucket.pending is not None for bucket in admission._chats.values()):
+        await asyncio.sleep(0.05)
+    return delivered, time.monotonic() - started
+
+
+async def burst(spam, group, users, seconds):
+    fake = LimitedTelegram()
+    os.environ['TELEGRAM_API_URL'] = await fake.start()
+    os.environ.setdefault('BOT_TOKEN', 'TOKEN')
+
+    from bot import SimpleBot
+    from metrics import errors_total
+
+    schedule = make_schedule(spam, group, users, seconds)
+    print(f"{len(schedule)} updates in {seconds:g} s: spammer {spam}, group chat {group}, {users} users x 1")
+    print(f"{'admission':<10}{'sent':>7}{'429':>6}{'failed':>8}{'merged':>8}{'shed':>6}"
+          f"{'users p50, s':>14}{'users p95, s':>14}{'total, s':>10}")
+
+    for enabled in (False, True):
+        bot = SimpleBot()
+        if not enabled:
+            bot.admission = AdmissionController(bot.send_merged, rate=0, outbound=RateLimiter(rate=0))
+        fake.replies.clear()
+        sent, rejected, failed = fake.requests, fake.rejected, errors_total.get('telegram')
+
+        delivered, elapsed = await replay(bot, schedule)
+        latencies = [fake.replies[chat_id][0] - at for chat_id, at in delivered.items()
+                     if chat_id >= 1000 and fake.replies[chat_id]]
+        answered = len(latencies)
+        print(f"{'on' if enabled else 'off':<10}{fake.requests - sent:>7}{fake.rejected - rejected:>6}"
+              f"{errors_total.get('telegram') - failed:>8.0f}{bot.admission.merged:>8}{bot.admission.shed:>6}"
+              f"{percentile(latencies, 0.5):>14.2f}{percentile(latencies, 0.95):>14.2f}{elapsed:>10.2f}")
+        if answered < users:
+            print(f"  {users - answered} of {users} users got no reply")
+        await bot.telegram.close()
+
+    await fake.stop()
+
+
+def memory(chats, max_chats):
+    """Много разных чатов через admit(): таблица не больше max_chats, время на вызов"""
+    admission = AdmissionController(max_chats=max_chats, outbound=RateLimiter(rate=0))
+    admit = admission.admit
+    started = time.perf_counter()
+    peak = 0
+    for chat_id in range(chats):
+        admit(chat_id, 'BMW X5 3000')
+        admit(chat_id, 'BMW X5 3000')
+        if not chat_id % 1000:
+            peak = max(peak, len(admission))
+    elapsed = time.perf_counter() - started
+    slot = sys.getsizeof(ChatBucket()) + 2 * sys.getsizeof(0.5)
+    print(f"{chats} chats x 2 messages: {elapsed / chats / 2 * 1e9:.0f} ns/admit, "
+          f"peak {peak} tracked chats (max {max_chats}), ~{slot} bytes per chat, shed {admission.shed}")
+    assert peak <= max_chats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--spam', type=int, default=400)
+    parser.add_argument('--group', type=int, default=60)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--chats', type=int, default=200000)
+    parser.add_argument('--max-chats', type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(burst(args.spam, args.group, args.users, args.seconds))
+    memory(args.chats, args.max_chats)
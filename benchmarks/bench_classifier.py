@@ -0,0 +1,120 @@
+"""Пропускная способность определения категории ТС по описанию
+
+Сравнивает прежний каскад any(word in ...), такой же каскад с полным словарем
+классификатора и индекс основ vehicle_classifier (который еще и извлекает
+числа) на коротких описаниях и на целых сообщениях; печатает, сколько
+описаний получили более точную подкатегорию.
+
+Запуск: python benchmarks/bench_classifier.py [--descriptions 20000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vehicle_classifier import vehicle_classifier, STEMS, FAMILIES
+
+TEMPLATES = [
+    'легковой автомобиль', 'седан {cc} см3', 'хэтчбек', 'универсал {liters} л', 'кроссовер',
+    'грузовик', 'грузовой фургон грузоподъемность {kg} кг', 'грузовой автомобиль {tons} т',
+    'грузовик полная масса {tons} т', 'самосвал', 'автобус на {seats} мест', 'микроавтобус {seats} чел',
+    'мотоцикл {moto_cc} см3', 'скутер {kw} кВт', 'мопед', 'квадроцикл', 'трактор', 'комбайн',
+    'экскаватор', 'бульдозер', 'автокран', 'прицеп', 'прицеп к грузовику', 'тракторный прицеп',
+    'троллейбус', 'трамвай', 'просто машина', 'Toyota Camry', 'седан {liters} л, {hp} л.с.', 'мотоцикл {hp} л. с.',
+]
+
+
+def legacy_search(vehicle_type):
+    """Копия прежнего TariffHandler.search_category_by_name для сравнения"""
+    vehicle_type = vehicle_type.lower()
+    if any(word in vehicle_type for word in ['легков', 'автомобил', 'седан', 'хэтчбек', 'универсал', 'купе']):
+        return 'AUTO'
+    elif any(word in vehicle_type for word in ['грузов', 'фургон', 'грузовик']):
+        return 'C1'
+    elif any(word in vehicle_type for word in ['автобус', 'микроавтобус']):
+        return 'D1'
+    elif any(word in vehicle_type for word in ['мотоцикл', 'скутер', 'мопед']):
+        return 'A1'
+    elif any(word in vehicle_type for word in ['трактор']):
+        return 'G1'
+    elif any(word in vehicle_type for word in ['экскаватор', 'бульдозер', 'кран']):
+        return 'H2'
+    elif any(word in vehicle_type for word in ['прицеп']):
+        return 'F'
+    return 'B2'
+
+
+def cascade_search(vehicle_type, families=tuple((family, STEMS[family]) for family in FAMILIES)):
+    """Каскад any() с тем же словарем, что у индекса, но без чисел — только поиск семейства"""
+    vehicle_type = vehicle_type.lower()
+    for family, words in families:
+        if any(word in vehicle_type for word in words):
+            return family
+    return None
+
+
+# Описание внутри обычного сообщения в чат
+MESSAGE_WRAPPERS = [
+    'Добрый день! Подскажите, сколько будет стоить полис ОСАГО на {text}, зарегистрирован в Киеве',
+    'Здравствуйте, нужна автоцивілка: {text}. Водитель один, стаж 10 лет',
+    '{text}',
+]
+
+
+def make_descriptions(count, seed=11, messages=False):
+    rnd = random.Random(seed)
+    descriptions = [rnd.choice(TEMPLATES).format(
+        cc=rnd.choice([1396, 1598, 1998, 2494, 3498]), liters=rnd.choice(['1.4', '2.0', '3.5']),
+        kg=rnd.choice([800, 1500, 3000]), tons=rnd.choice(['1,5', '2', '3,5', '7']),
+        seats=rnd.choice([8, 18, 22, 45]), moto_cc=rnd.choice([125, 250, 600, 1200]),
+        kw=rnd.choice([3, 4, 8, 11]), hp=rnd.choice([5, 90, 150])
+    ) for _ in range(count)]
+    if messages:
+        descriptions = [rnd.choice(MESSAGE_WRAPPERS).format(text=text) for text in descriptions]
+    return descriptions
+
+
+def throughput(func, descriptions, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for text in descriptions:
+            func(text)
+        best = min(best, time.perf_counter() - started)
+    return len(descriptions) / best
+
+
+def main(count):
+    descriptions = make_descriptions(count)
+    classify = lambda text: vehicle_classifier.classify(text).category
+    runs = (
+        ('legacy any() cascade', legacy_search),
+        ('full-vocabulary cascade', cascade_search),
+        ('stem index + numbers', classify),
+    )
+
+    for title, texts in (('short descriptions', descriptions),
+                         ('full chat messages', make_descriptions(count, messages=True))):
+        print(f"{count} {title}, avg {sum(map(len, texts)) / len(texts):.0f} chars")
+        print(f"{'classifier':<26}{'per second':>12}{'us/op':>8}")
+        for name, func in runs:
+            rate = throughput(func, texts)
+            print(f"{name:<26}{rate:>12,.0f}{1e6 / rate:>8.2f}")
+        print()
+
+    unique = sorted(set(descriptions))
+    changed = [(text, legacy_search(text), classify(text)) for text in unique
+               if legacy_search(text) != classify(text)]
+    print(f"{len(changed)} of {len(unique)} distinct descriptions now get a different category:")
+    for text, old, new in changed[:15]:
+        print(f"  {text:<45}{old:>5} -> {new}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--descriptions', type=int, default=20000)
+    args = parser.parse_args()
+    main(args.descriptions)
@@ -0,0 +1,116 @@
+"""Бюджет холодного старта функции Vercel
+
+Для каждой точки входа в отдельном процессе измеряет:
+  * время импорта модуля по python -X importtime (cumulative);
+  * время от начала импорта до ответа на первый update (/start и расчет).
+Лучшее из нескольких запусков (меньше всего шума) сравнивается с cold_start_budget.json;
+при превышении скрипт завершается с кодом 1.
+
+Запуск: python benchmarks/bench_cold_start.py [--runs 5] [--update-budget]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BUDGET_PATH = os.path.join(ROOT, 'benchmarks', 'cold_start_budget.json')
+
+ENTRY_POINTS = ['api.webhook', 'bot']
+
+# Запас при --update-budget: машины CI медленнее и шумнее
+BUDGET_HEADROOM = 2.0
+
+FIRST_REQUEST_SCRIPT = r'''
+import json, sys, time
+started = time.perf_counter()
+import {module} as entry
+
+class Response:
+    def status(self, code):
+        return self
+    def json(self, body):
+        return body
+
+class Request:
+    def __init__(self, body):
+        self.body = body
+    def get(self, key, default=None):
+        return self.body if key == 'body' else default
+
+update = {{'update_id': 1, 'message': {{'chat': {{'id': 1}}, 'text': sys.argv[1]}}}}
+args = (Request(json.dumps(update)),) + ((Response(),) if '{module}' == 'api.webhook' else ())
+entry.handler(*args)
+print(json.dumps({{'ms': (time.perf_counter() - started) * 1000,
+                  'heavy': sorted(m for m in ('pandas', 'numpy', 'text_parser', 'tariff_engine') if m in sys.modules)}}))
+'''
+
+
+def import_time_ms(module, env):
+    """Cumulative-время импорта модуля по -X importtime"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    for line in proc.stderr.splitlines():
+        parts = [p.strip() for p in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"{module} не найден в выводе importtime")
+
+
+def first_request_ms(module, text, env):
+    proc = subprocess.run([sys.executable, '-c', FIRST_REQUEST_SCRIPT.format(module=module), text],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(runs, update_budget):
+    from loop_runner import LoopRunner
+    from benchmarks.fake_telegram import FakeTelegram
+
+    fake_runner = LoopRunner()
+    fake = FakeTelegram()
+    env = dict(os.environ, BOT_TOKEN='TOKEN', TELEGRAM_API_URL=fake_runner.run(fake.start()),
+               PYTHONDONTWRITEBYTECODE='')
+
+    measured = {}
+    for module in ENTRY_POINTS:
+        imports = [import_time_ms(module, env) for _ in range(runs)]
+        starts = [first_request_ms(module, '/start', env) for _ in range(runs)]
+        quotes = [first_request_ms(module, 'BMW X3 1998', env) for _ in range(runs)]
+        measured[f'{module}:import'] = min(imports)
+        measured[f'{module}:first /start'] = min(r['ms'] for r in starts)
+        measured[f'{module}:first quote'] = min(r['ms'] for r in quotes)
+        print(f"{module}: /start loaded {starts[0]['heavy'] or 'nothing heavy'}, quote loaded {quotes[0]['heavy']}")
+
+    fake_runner.run(fake.stop())
+    fake_runner.shutdown()
+
+    if update_budget:
+        budget = {key: round(value * BUDGET_HEADROOM, 1) for key, value in measured.items()}
+        with open(BUDGET_PATH, 'w', encoding='utf-8') as f:
+            json.dump(budget, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"budget written to {BUDGET_PATH}")
+
+    with open(BUDGET_PATH, encoding='utf-8') as f:
+        budget = json.load(f)
+
+    failed = False
+    print(f"{'metric':<28}{'best, ms':>12}{'budget, ms':>12}")
+    for key, value in measured.items():
+        limit = budget.get(key)
+        over = limit is not None and value > limit
+        failed = failed or over
+        print(f"{key:<28}{value:>12.1f}{limit if limit is not None else '-':>12}{'  OVER BUDGET' if over else ''}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--update-budget', action='store_true', help='записать замеры с запасом как новый бюджет')
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.update_budget))
@@ -0,0 +1,91 @@
+"""Запросы в секунду: цикл событий на каждый вызов handler() против общего цикла
+
+Запуск: python benchmarks/bench_event_loop.py [--requests 500]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Мерим обработку, а не лимиты Telegram — их проверяет bench_burst.py
+os.environ.setdefault('ADMISSION_CHAT_RATE', '0')
+os.environ.setdefault('OUTBOUND_RATE', '0')
+
+from loop_runner import LoopRunner
+from benchmarks.fake_telegram import FakeTelegram
+
+
+def make_update(i):
+    return {'update_id': i, 'message': {'chat': {'id': 1000 + i % 50}, 'text': 'BMW X3 1998 см³'}}
+
+
+def measure(handler, requests, base=0):
+    """base — начало диапазона update_id: повтор id отбросила бы дедупликация"""
+    started = time.perf_counter()
+    for i in range(base, base + requests):
+        handler(SimpleNamespace(body=json.dumps(make_update(i))))
+    return requests / (time.perf_counter() - started)
+
+
+def measure_noop(requests, persistent):
+    """Только накладные расходы цикла, без сети"""
+    async def noop():
+        return None
+
+    runner = LoopRunner()
+    started = time.perf_counter()
+    for _ in range(requests):
+        if persistent:
+            runner.run(noop())
+        else:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(noop())
+            loop.close()
+    rate = requests / (time.perf_counter() - started)
+    runner.shutdown()
+    return rate
+
+
+def main(requests):
+    # Заглушка Telegram живет в своем цикле, чтобы не делить его с ботом
+    fake_runner = LoopRunner()
+    fake = FakeTelegram()
+    os.environ['TELEGRAM_API_URL'] = fake_runner.run(fake.start())
+    os.environ.setdefault('BOT_TOKEN', 'TOKEN')
+
+    import bot
+
+    rows = [
+        ('noop, per-request loop', measure_noop(requests, persistent=False)),
+        ('noop, persistent loop', measure_noop(requests, persistent=True)),
+    ]
+
+    bot.PERSISTENT_LOOP = False
+    rows.append(('handler, per-request loop', measure(bot.handler, requests)))
+    per_request_conns = fake.connections
+
+    fake.peers.clear()
+    bot.PERSISTENT_LOOP = True
+    rows.append(('handler, persistent loop', measure(bot.handler, requests, base=requests)))
+    persistent_conns = fake.connections
+
+    print(f"{'mode':<28}{'req/s':>10}")
+    for name, rate in rows:
+        print(f"{name:<28}{rate:>10.0f}")
+    print(f"new connections: per-request {per_request_conns}, persistent {persistent_conns}")
+
+    fake_runner.run(fake.stop())
+    fake_runner.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+    main(args.requests)
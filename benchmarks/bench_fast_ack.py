@@ -0,0 +1,74 @@
+"""Время ответа webhook при медленном Telegram: inline, очередь и ответ в теле webhook
+
+Запуск: python benchmarks/bench_fast_ack.py [--requests 200] [--latency 0.05]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Мерим обработку, а не лимиты Telegram — их проверяет bench_burst.py
+os.environ.setdefault('ADMISSION_CHAT_RATE', '0')
+os.environ.setdefault('OUTBOUND_RATE', '0')
+
+from loop_runner import LoopRunner
+from benchmarks.corpus import make_messages, make_update
+from benchmarks.fake_telegram import FakeTelegram
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def main(requests, latency):
+    fake_runner = LoopRunner()
+    fake = FakeTelegram(latency=latency)
+    os.environ['TELEGRAM_API_URL'] = fake_runner.run(fake.start())
+    os.environ.setdefault('BOT_TOKEN', 'TOKEN')
+
+    import bot
+    from loop_runner import loop_runner
+
+    messages = make_messages(requests)
+    print(f"fake Telegram latency {latency * 1000:.0f} ms, {requests} updates")
+    print(f"{'mode':<10}{'p50, ms':>10}{'p99, ms':>10}{'total, s':>10}{'sent via API':>14}{'in body':>9}")
+
+    for number, mode in enumerate(('inline', 'queue', 'response')):
+        # Свой диапазон update_id на каждый режим, иначе дедупликация отбросит повторы
+        base = number * requests
+        bot.WEBHOOK_MODE = mode
+        before = fake.requests
+        timings = []
+        in_body = 0
+
+        started = time.perf_counter()
+        for i, text in enumerate(messages):
+            request = SimpleNamespace(body=json.dumps(make_update(base + i, text, chat_id=1000 + i % 50)))
+            t0 = time.perf_counter()
+            result = bot.handler(request)
+            timings.append((time.perf_counter() - t0) * 1000)
+            in_body += 'sendMessage' in result['body']
+        if mode == 'queue':
+            # Ответы должны дойти до Telegram, иначе сравнение нечестное
+            loop_runner.run(bot.simple_bot.reply_queue.join())
+        total = time.perf_counter() - started
+
+        print(f"{mode:<10}{percentile(timings, 0.5):>10.2f}{percentile(timings, 0.99):>10.2f}"
+              f"{total:>10.2f}{fake.requests - before:>14}{in_body:>9}")
+
+    loop_runner.shutdown()
+    fake_runner.run(fake.stop())
+    fake_runner.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help='задержка ответа заглушки Telegram, с')
+    args = parser.parse_args()
+    main(args.requests, args.latency)
@@ -0,0 +1,98 @@
+"""Пиковая память при распознавании больших фото: целиком в bytes или потоком
+
+Режимы: raw — прежний путь (файл целиком и base64 от исходных байтов),
+bytes — ImagePipeline.analyze от скачанных целиком байтов, stream —
+ImagePipeline.analyze_stream прямо из TelegramClient.download_file.
+Каждый режим запускается в отдельном процессе; фото скачиваются с
+локальной заглушки Bot API. Печатается прирост пикового RSS и размер запроса.
+
+Запуск: python benchmarks/bench_image_memory.py [--images 8] [--size 4000x3000]
+"""
+import os
+import sys
+import base64
+import asyncio
+import argparse
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ('raw', 'bytes', 'stream')
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss в Linux — килобайты
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(mode, count, size):
+    from PIL import Image
+    from telegram_client import TelegramClient
+    from image_pipeline import ImagePipeline, StubExtractor
+    from loop_runner import LoopRunner
+    from benchmarks.fake_telegram import FakeTelegram
+    from benchmarks.bench_image_pipeline import make_photo, FIELDS
+
+    width, height = map(int, size.split('x'))
+    photo = make_photo(width, height, 1)
+
+    fake_runner = LoopRunner()
+    fake = FakeTelegram()
+    fake.files = {f'photos/{i}.jpg': photo for i in range(count)}
+    telegram = TelegramClient('TOKEN', api_url=fake_runner.run(fake.start()))
+    extractor = StubExtractor(FIELDS, latency=0.5)
+
+    # Прогрев: импорты Pillow/aiohttp и пул соединений не должны попасть в замер
+    Image.open(__import__('io').BytesIO(photo)).load()
+    async for _ in telegram.download_file('photos/0.jpg'):
+        pass
+    baseline = peak_rss_mb()
+
+    pipeline = ImagePipeline(extractor, concurrency=count)
+    if mode == 'raw':
+        async def one(file_id):
+            # Прежний путь: файл целиком, затем base64 от полных байтов
+            data = b''.join([chunk async for chunk in telegram.download_file(file_id)])
+            image_b64 = base64.b64encode(data).decode('utf-8')
+            return await extractor.extract(image_b64, 'image/jpeg')
+    elif mode == 'bytes':
+        async def one(file_id):
+            data = b''.join([chunk async for chunk in telegram.download_file(file_id)])
+            return await pipeline.analyze(data)
+    else:
+        async def one(file_id):
+            return await pipeline.analyze_stream(telegram.download_file(file_id))
+
+    results = await asyncio.gather(*(one(file_id) for file_id in fake.files))
+    assert all(result['brand'] == FIELDS['brand'] for result in results)
+
+    await telegram.close()
+    fake_runner.run(fake.stop())
+    fake_runner.shutdown()
+    payload = pipeline.bytes_out if mode != 'raw' else len(photo) * 4 // 3 * count
+    print(f"{peak_rss_mb() - baseline:.1f} {payload / 1024 / 1024:.1f}")
+
+
+def main(count, size):
+    print(f"{count} concurrent photos {size}")
+    print(f"{'mode':<8}{'payload, MB':>12}{'peak RSS +MB':>14}")
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', mode, '--images', str(count), '--size', size],
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        peak, payload = output[-2:]
+        print(f"{mode:<8}{payload:>12}{peak:>14}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=8)
+    parser.add_argument('--size', default='4000x3000')
+    parser.add_argument('--child', choices=MODES)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(run(args.child, args.images, args.size))
+    else:
+        main(args.images, args.size)
@@ -0,0 +1,100 @@
+"""Размер запроса и время распознавания нескольких фото документа
+
+Сравнивает прежний путь (base64 от исходных байтов, фото по очереди) с
+конвейером image_pipeline (уменьшение в пуле потоков, параллельные запросы).
+Распознавание — StubExtractor, время которого растет с размером запроса.
+
+Запуск: python benchmarks/bench_image_pipeline.py [--images 4] [--size 4000x3000] [--bandwidth 2000000]
+"""
+import os
+import io
+import sys
+import time
+import base64
+import random
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_pipeline import ImagePipeline, StubExtractor, merge_fields
+from recognition_cache import RecognitionCache
+
+FIELDS = {'brand': 'TOYOTA', 'model': 'CAMRY', 'year': '2018', 'engine_volume': '2494'}
+
+
+def make_photo(width, height, seed):
+    """Фото-подобный JPEG: шум плюс полосы «текста», плохо сжимается, как снимок с телефона"""
+    from PIL import Image, ImageDraw
+
+    rnd = random.Random(seed)
+    noise = Image.effect_noise((width, height), 40).convert('RGB')
+    draw = ImageDraw.Draw(noise)
+    for y in range(0, height, 60):
+        draw.rectangle((100, y, 100 + rnd.randint(200, width - 200), y + 20), fill=(20, 20, 20))
+    output = io.BytesIO()
+    noise.save(output, 'JPEG', quality=92)
+    return output.getvalue()
+
+
+async def naive(images, extractor):
+    """Прежний путь: encode_image от полных байтов и последовательные запросы"""
+    payload = 0
+    results = []
+    for image in images:
+        image_b64 = base64.b64encode(image).decode('utf-8')
+        payload += len(image_b64)
+        results.append(await extractor.extract(image_b64, 'image/jpeg'))
+    return merge_fields(results), payload
+
+
+async def pipelined(images, extractor, concurrency, cache=None):
+    pipeline = ImagePipeline(extractor, concurrency=concurrency, cache=cache)
+    try:
+        return await pipeline.analyze_many(images), pipeline.bytes_out
+    finally:
+        pipeline.close()
+
+
+def main(count, size, bandwidth, latency):
+    width, height = map(int, size.split('x'))
+    images = [make_photo(width, height, seed) for seed in range(count)]
+    raw = sum(len(image) for image in images)
+    print(f"{count} photos {size}, {raw / 1024:.0f} KB raw, upload {bandwidth / 1e6:.1f} MB/s,"
+          f" API latency {latency * 1000:.0f} ms")
+    print(f"{'path':<18}{'payload, KB':>12}{'total, s':>10}")
+
+    runs = [('naive sequential', lambda e: naive(images, e))]
+    runs += [(f'pipeline x{c}', lambda e, c=c: pipelined(images, e, c)) for c in (1, count)]
+    for name, run in runs:
+        extractor = StubExtractor(FIELDS, latency=latency, bytes_per_second=bandwidth)
+        started = time.perf_counter()
+        result, payload = asyncio.run(run(extractor))
+        elapsed = time.perf_counter() - started
+        assert result['brand'] == 'TOYOTA' and result['images'] == count
+        print(f"{name:<18}{payload / 1024:>12.0f}{elapsed:>10.2f}")
+
+    # Повторная отправка тех же фото: второй проход целиком из кэша распознавания
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RecognitionCache(os.path.join(tmp, 'recognition.sqlite3'))
+        extractor = StubExtractor(FIELDS, latency=latency, bytes_per_second=bandwidth)
+        for name in ('first send', 'resend (cached)'):
+            started = time.perf_counter()
+            result, payload = asyncio.run(pipelined(images, extractor, count, cache))
+            elapsed = time.perf_counter() - started
+            assert result['brand'] == 'TOYOTA'
+            print(f"{name:<18}{payload / 1024:>12.0f}{elapsed:>10.2f}")
+        stats = cache.stats()
+        print(f"recognition cache: hit rate {stats['hit_rate']:.0%}, extractor calls {extractor.calls}")
+        cache.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=4)
+    parser.add_argument('--size', default='4000x3000')
+    parser.add_argument('--bandwidth', type=float, default=2_000_000)
+    parser.add_argument('--latency', type=float, default=0.8)
+    args = parser.parse_args()
+    main(args.images, args.size, args.bandwidth, args.latency)
@@ -0,0 +1,94 @@
+"""Пропускная способность разбора текста: старый цикл re.search против общего парсера
+
+Запуск: python benchmarks/bench_parser.py [--messages 20000]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_parser import CAR_BRANDS, vehicle_parser
+from benchmarks.corpus import make_messages, YEAR_AND_VOLUME
+
+
+def legacy_parse(text):
+    """Копия прежнего ClaudeProcessor.parse_text_input для сравнения"""
+    text = text.upper().strip()
+    result = {"brand": None, "model": None, "year": None, "engine_volume": None}
+
+    volume_patterns = [
+        r'(\d{3,4})\s*(?:СМ|CM|КУБОВ|КУБ)',
+        r'(\d{1,2})[.,](\d{3})\s*(?:Л|L)',
+        r'(\d{3,4})\s*(?:СС|CC)',
+        r'(\d{3,4})(?=\s|$)'
+    ]
+    for pattern in volume_patterns:
+        match = re.search(pattern, text)
+        if match:
+            if len(match.groups()) == 2:
+                volume = match.group(1) + match.group(2)
+            else:
+                volume = match.group(1)
+            if 500 <= int(volume) <= 8000:
+                result["engine_volume"] = volume
+                break
+
+    for brand in CAR_BRANDS:
+        if brand in text:
+            result["brand"] = brand
+            brand_index = text.find(brand)
+            text_after_brand = text[brand_index + len(brand):].strip()
+            model_match = re.search(r'^[А-ЯA-Z0-9\-]+', text_after_brand)
+            if model_match:
+                potential_model = model_match.group()
+                if not re.match(r'^\d{3,4}$', potential_model):
+                    result["model"] = potential_model
+            break
+
+    year_match = re.search(r'\b(19[8-9]\d|20[0-2]\d)\b', text)
+    if year_match:
+        result["year"] = year_match.group(1)
+    return result
+
+
+def measure(parse, messages, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in messages:
+            parse(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(messages) / best
+
+
+def main(count, repeat):
+    messages = make_messages(count)
+    wrong = [(text, vehicle_parser.parse_uncached(text)['engine_volume'], volume)
+             for text, volume in YEAR_AND_VOLUME if vehicle_parser.parse_uncached(text)['engine_volume'] != volume]
+    assert not wrong, f"год принят за объем: {wrong}"
+
+    mismatches = sum(1 for text in messages
+                     if legacy_parse(text)['engine_volume'] != vehicle_parser.parse_uncached(text)['engine_volume'])
+
+    legacy = measure(legacy_parse, messages, repeat)
+    shared = measure(vehicle_parser.parse_uncached, messages, repeat)
+    cached = measure(vehicle_parser.parse, messages, repeat)
+
+    print(f"{'parser':<16}{'msg/s':>12}{'us/msg':>10}")
+    for name, rate in (('legacy', legacy), ('shared', shared), ('shared + cache', cached)):
+        print(f"{name:<16}{rate:>12.0f}{1e6 / rate:>10.2f}")
+    print(f"speedup x{shared / legacy:.2f} (x{cached / legacy:.2f} with cache, "
+          f"hit rate {vehicle_parser.cache.stats()['hit_rate']:.0%}); "
+          f"engine_volume differs on {mismatches}/{count} messages")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    main(args.messages, args.repeat)
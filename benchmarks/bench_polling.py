@@ -0,0 +1,100 @@
+"""Пропускная способность long polling на локальной заглушке Bot API
+
+Сравнивает последовательную обработку (concurrency=1) и параллельную и
+проверяет, что ответы каждого чата пришли в порядке сообщений.
+
+Запуск: python benchmarks/bench_polling.py [--updates 2000] [--chats 50] [--latency 0.01]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Мерим обработку, а не лимиты Telegram — их проверяет bench_burst.py
+os.environ.setdefault('ADMISSION_CHAT_RATE', '0')
+os.environ.setdefault('OUTBOUND_RATE', '0')
+
+from benchmarks.corpus import make_messages, make_update
+from benchmarks.fake_telegram import FakeTelegram
+
+
+class PollingTelegram(FakeTelegram):
+    """Заглушка, которая отдает заранее заготовленные обновления через getUpdates"""
+
+    def __init__(self, updates, **kwargs):
+        super().__init__(**kwargs)
+        self.updates = updates
+        self.replies = {}
+
+    def result_for(self, method, payload):
+        if method == 'getUpdates':
+            offset = payload.get('offset') or 0
+            batch = [u for u in self.updates if u['update_id'] >= offset][:payload['limit']]
+            return batch
+        if method == 'sendMessage':
+            self.replies.setdefault(payload['chat_id'], []).append(payload['text'])
+        return super().result_for(method, payload)
+
+
+def expected_replies(updates):
+    """Ответы по чатам при строго последовательной обработке"""
+    from bot import SimpleBot
+
+    bot = SimpleBot()
+    replies = {}
+    for update in updates:
+        chat_id, text = bot.build_reply(update)
+        replies.setdefault(chat_id, []).append(text)
+    return replies
+
+
+async def run_once(fake, updates, concurrency):
+    from bot import SimpleBot
+    from polling import PollingRunner
+
+    fake.replies = {}
+    bot = SimpleBot()
+    runner = PollingRunner(bot, concurrency=concurrency, poll_timeout=0)
+
+    started = time.perf_counter()
+    task = asyncio.ensure_future(runner.run())
+    while runner.processed < len(updates):
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    runner.stop()
+    await task
+    await bot.telegram.close()
+    return elapsed
+
+
+async def main(count, chats, latency):
+    messages = make_messages(count)
+    updates = [make_update(i + 1, text, chat_id=1000 + i % chats) for i, text in enumerate(messages)]
+
+    fake = PollingTelegram(updates, latency=latency)
+    os.environ['TELEGRAM_API_URL'] = await fake.start()
+    os.environ.setdefault('BOT_TOKEN', 'TOKEN')
+
+    expected = expected_replies(updates)
+    print(f"{count} updates in {chats} chats, fake Telegram latency {latency * 1000:.0f} ms")
+    print(f"{'concurrency':<13}{'total, s':>10}{'updates/s':>11}{'ordered':>9}")
+
+    for concurrency in (1, 10, 50):
+        elapsed = await run_once(fake, updates, concurrency)
+        ordered = fake.replies == expected
+        print(f"{concurrency:<13}{elapsed:>10.2f}{count / elapsed:>11.0f}{str(ordered):>9}")
+        assert ordered, "нарушен порядок ответов внутри чата"
+
+    await fake.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.01)
+    args = parser.parse_args()
+    asyncio.run(main(args.updates, args.chats, args.latency))
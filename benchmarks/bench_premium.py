@@ -0,0 +1,115 @@
+"""Расчет премии: вложенные словари и float против плотной таблицы копеек PremiumEngine
+
+Сравнивает одиночные расчеты (словари на каждый фактор, offset + чтение,
+готовое смещение) и пакетные: quote_many без numpy и quote_indices по массивам.
+
+Запуск: python benchmarks/bench_premium.py [--quotes 200000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from premium_engine import premium_engine, usage_coefficients, BONUS_MALUS, COEFFICIENT_SCALE
+from tariff_snapshot import load_snapshot
+from tariff_engine import AGE_CLASSES
+
+
+def nested_tables(snapshot):
+    """Те же коэффициенты в виде словарей, как считали бы без таблицы"""
+    prices = {
+        item['code']: {zone: dict(zip(AGE_CLASSES, pair)) for zone, pair in zip(snapshot['zones'], item['prices'])}
+        for item in snapshot['categories']
+    }
+    terms = dict(zip(premium_engine.terms, (coefficient for _, coefficient in snapshot['terms'])))
+    scaled = usage_coefficients(snapshot['usage'], list(prices))
+    usage = {code: dict(zip(premium_engine.usages, (value / COEFFICIENT_SCALE for value in coefficients)))
+             for code, coefficients in scaled.items()}
+    return prices, dict(BONUS_MALUS), terms, usage
+
+
+def make_queries(count, seed=3):
+    rnd = random.Random(seed)
+    engine = premium_engine
+    return [{
+        'category': rnd.choice(engine.categories), 'zone': rnd.choice(engine.zones),
+        'age_over_30': rnd.random() < 0.7, 'bonus_malus': rnd.choice(engine.bonus_malus),
+        'months': rnd.choice(engine.terms), 'usage': rnd.choice(engine.usages),
+    } for _ in range(count)]
+
+
+def measure(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(count):
+    import numpy as np
+
+    prices, bonus_malus_table, terms, usage_table = nested_tables(load_snapshot())
+    queries = make_queries(count)
+    engine = premium_engine
+
+    def nested_quote(category, zone, age_over_30, bonus_malus, months, usage):
+        price = prices[category][zone]['30plus' if age_over_30 else 'noLimit']
+        return round(price * bonus_malus_table[bonus_malus] * terms[months] * usage_table[category][usage] * 100)
+
+    # Позиционные аргументы: разбор **kwargs стоит дороже самого расчета и скрыл бы разницу
+    rows = [tuple(q.values()) for q in queries]
+
+    def nested():
+        return [nested_quote(*row) for row in rows]
+
+    def indexed():
+        quote = engine.quote
+        return [quote(*row) for row in rows]
+
+    offsets = [engine.offset(**q) for q in queries]
+
+    def read_only():
+        table = engine.table
+        return [table[i] for i in offsets]
+
+    positions = engine.positions
+    arrays = [
+        np.array([positions['category'][q['category']] for q in queries]),
+        np.array([positions['zone'][q['zone']] for q in queries]),
+        np.array([0 if q['age_over_30'] else 1 for q in queries]),
+        np.array([positions['bonus_malus'][q['bonus_malus']] for q in queries]),
+        np.array([positions['term'][q['months']] for q in queries]),
+        np.array([positions['usage'][q['usage']] for q in queries]),
+    ]
+
+    results = {}
+    print(f"{count} quotes over {len(engine.table):,} precomputed premiums ({engine.table.itemsize * len(engine.table) / 1e6:.1f} MB)")
+    print(f"{'method':<34}{'quotes/s':>14}{'ns/quote':>10}")
+    for name, func in (
+        ('nested dicts + float', nested),
+        ('PremiumEngine.quote', indexed),
+        ('precomputed offset, one read', read_only),
+        ('quote_many (no numpy)', lambda: list(engine.quote_many(queries))),
+        ('quote_indices (numpy arrays)', lambda: engine.quote_indices(*arrays)),
+    ):
+        elapsed, results[name] = measure(func)
+        print(f"{name:<34}{count / elapsed:>14,.0f}{elapsed / count * 1e9:>10.0f}")
+
+    expected = results['PremiumEngine.quote']
+    assert list(results['quote_indices (numpy arrays)']) == expected
+    assert results['quote_many (no numpy)'] == expected
+    differs = sum(1 for a, b in zip(results['nested dicts + float'], expected) if a != b)
+    print(f"float math differs from integer kopecks on {differs}/{count} quotes")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--quotes', type=int, default=200000)
+    args = parser.parse_args()
+    main(args.quotes)
@@ -0,0 +1,84 @@
+"""Повтор шторма ретраев Telegram: каждое обновление приходит несколько раз вперемешку
+
+Проверяет, что на каждый update_id уходит ровно один ответ, и сравнивает
+число исходящих вызовов и время с выключенной дедупликацией.
+
+Запуск: python benchmarks/bench_retry_storm.py [--updates 500] [--retries 3]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Мерим обработку, а не лимиты Telegram — их проверяет bench_burst.py
+os.environ.setdefault('ADMISSION_CHAT_RATE', '0')
+os.environ.setdefault('OUTBOUND_RATE', '0')
+
+from update_dedup import UpdateDeduplicator
+from benchmarks.corpus import make_messages, make_update
+from benchmarks.fake_telegram import FakeTelegram
+
+
+def make_storm(updates, retries, seed=3):
+    """Каждый update повторяется retries раз; повторы приходят с опозданием и вперемешку"""
+    rnd = random.Random(seed)
+    messages = make_messages(updates, seed=seed)
+    deliveries = []
+    for i, text in enumerate(messages):
+        update = make_update(100000 + i, text, chat_id=1000 + i % 100)
+        for attempt in range(retries):
+            deliveries.append((i + attempt * rnd.uniform(1, 20), update))
+    deliveries.sort(key=lambda item: item[0])
+    return [update for _, update in deliveries]
+
+
+async def replay(bot, storm, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def deliver(update):
+        async with semaphore:
+            await bot.process_update(update)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(deliver(update) for update in storm))
+    return time.perf_counter() - started
+
+
+async def main(updates, retries, concurrency):
+    fake = FakeTelegram()
+    os.environ['TELEGRAM_API_URL'] = await fake.start()
+    os.environ.setdefault('BOT_TOKEN', 'TOKEN')
+
+    from bot import SimpleBot
+
+    storm = make_storm(updates, retries)
+    print(f"{updates} updates x {retries} deliveries = {len(storm)} webhook calls")
+    print(f"{'dedup':<8}{'sent':>8}{'dropped':>10}{'total, s':>10}")
+
+    for enabled in (False, True):
+        bot = SimpleBot()
+        bot.dedup = UpdateDeduplicator() if enabled else UpdateDeduplicator(capacity=0)
+        before = fake.requests
+        elapsed = await replay(bot, storm, concurrency)
+        sent = fake.requests - before
+        print(f"{'on' if enabled else 'off':<8}{sent:>8}{bot.dedup.dropped:>10}{elapsed:>10.3f}")
+        await bot.telegram.close()
+
+        if enabled:
+            assert sent == updates, f"ожидали {updates} ответов, отправлено {sent}"
+            assert bot.dedup.dropped == len(storm) - updates
+
+    await fake.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=500)
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.updates, args.retries, args.concurrency))
@@ -0,0 +1,119 @@
+"""Нагрузочный тест webhook-сервера: локальный Telegram-заглушка и генератор HTTP-нагрузки
+
+Поднимает server.py с разным числом воркеров и шлет webhook-запросы с
+заданной параллельностью; печатает p50/p99 задержки и запросов в секунду.
+
+Запуск: python benchmarks/bench_server.py [--requests 3000] [--concurrency 64] [--workers 1 4]
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Мерим обработку, а не лимиты Telegram — их проверяет bench_burst.py; воркеры наследуют окружение
+os.environ.setdefault('ADMISSION_CHAT_RATE', '0')
+os.environ.setdefault('OUTBOUND_RATE', '0')
+
+from loop_runner import LoopRunner
+from benchmarks.corpus import make_messages, make_update
+from benchmarks.fake_telegram import FakeTelegram
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, api_url):
+    env = dict(os.environ, TELEGRAM_API_URL=api_url, BOT_TOKEN='TOKEN')
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'server.py'),
+         '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers)],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            # Даем подняться остальным воркерам
+            time.sleep(0.3 * workers)
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("сервер не запустился")
+
+
+async def load(url, bodies, concurrency):
+    import aiohttp
+
+    timings = []
+    errors = 0
+    queue = iter(bodies)
+
+    async def client(session):
+        nonlocal errors
+        for body in queue:
+            t0 = time.perf_counter()
+            async with session.post(url, json=body) as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            timings.append((time.perf_counter() - t0) * 1000)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return timings, elapsed, errors
+
+
+def main(requests, concurrency, workers_list, latency):
+    fake_runner = LoopRunner()
+    fake = FakeTelegram(latency=latency)
+    api_url = fake_runner.run(fake.start())
+
+    messages = make_messages(requests)
+    bodies = [make_update(i, text, chat_id=1000 + i % 200) for i, text in enumerate(messages)]
+
+    print(f"{requests} webhooks, concurrency {concurrency}, fake Telegram latency {latency * 1000:.0f} ms,"
+          f" {os.cpu_count()} CPU")
+    print(f"{'workers':<9}{'p50, ms':>10}{'p99, ms':>10}{'req/s':>9}{'errors':>8}")
+
+    for workers in workers_list:
+        port = free_port()
+        server = start_server(port, workers, api_url)
+        try:
+            url = f"http://127.0.0.1:{port}/api/webhook"
+            timings, elapsed, errors = asyncio.run(load(url, bodies, concurrency))
+        finally:
+            server.terminate()
+            server.wait(10)
+        print(f"{workers:<9}{percentile(timings, 0.5):>10.2f}{percentile(timings, 0.99):>10.2f}"
+              f"{requests / elapsed:>9.0f}{errors:>8}")
+
+    fake_runner.run(fake.stop())
+    fake_runner.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--latency', type=float, default=0.005)
+    args = parser.parse_args()
+    main(args.requests, args.concurrency, args.workers, args.latency)
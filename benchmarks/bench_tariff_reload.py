@@ -0,0 +1,115 @@
+"""Горячая перезагрузка тарифов: расчеты в потоках, пока снимок на диске меняется
+
+Два снимка с разными ценами по очереди записываются во временный каталог,
+TariffStore.check() подменяет набор. Читатели считают премии без блокировок
+и сверяют каждую цену с версией, которую взяли: расхождение значило бы, что
+расчет увидел наполовину обновленную таблицу. Заодно меряются время сборки
+набора и цена обращения через tariff_store.current против прямой ссылки.
+
+Запуск: python benchmarks/bench_tariff_reload.py [--reloads 20] [--readers 4]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tariff_snapshot import TARIFFS_SNAPSHOT, load_snapshot, snapshot_checksum, write_snapshot
+from tariff_store import TariffStore, build_tariffs
+
+
+def variant(snapshot, extra):
+    """Копия снимка, где все цены выше на extra гривен"""
+    changed = dict(snapshot, categories=[
+        dict(item, prices=[[price + extra for price in pair] for pair in item['prices']])
+        for item in snapshot['categories']
+    ])
+    changed.pop('stale', None)
+    changed['checksum'] = snapshot_checksum(changed)
+    return changed
+
+
+def main(reloads, readers):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'tariffs.json')
+    shutil.copy(TARIFFS_SNAPSHOT, path)
+    base = load_snapshot(path, None)
+    variants = [variant(base, 0), variant(base, 100)]
+
+    store = TariffStore(build_tariffs(path, None), path, None, interval=0)
+    zone = base['zones'][0]
+    expected = {}
+
+    stop = threading.Event()
+    quotes = [0] * readers
+    mismatches = []
+
+    def reader(slot):
+        count = 0
+        while not stop.is_set():
+            tariffs = store.current
+            premium = tariffs.premiums.quote('B2', zone, True, '3', 12, 'personal')
+            price = tariffs.engine.get_price('B2')
+            want = expected.get(tariffs.version)
+            if want is not None and want != (premium, price):
+                mismatches.append((tariffs.version, premium, price))
+            count += 1
+        quotes[slot] = count
+
+    # Эталон для каждой версии считается один раз заранее
+    for snapshot in variants:
+        write_snapshot(snapshot, path)
+        tariffs = store.reload()
+        expected[tariffs.version] = (tariffs.premiums.quote('B2', zone, True, '3', 12, 'personal'),
+                                     tariffs.engine.get_price('B2'))
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+
+    build_times = []
+    started = time.perf_counter()
+    for i in range(reloads):
+        write_snapshot(variants[i % 2], path)
+        # Время изменения файла может совпасть с прошлым, размер тоже: сбрасываем подпись
+        store._signature = None
+        t0 = time.perf_counter()
+        assert store.check() is not None
+        build_times.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join()
+    shutil.rmtree(directory)
+
+    build_times.sort()
+    print(f"{reloads} reloads in {elapsed:.2f} s, build p50 {build_times[len(build_times) // 2] * 1000:.0f} ms, "
+          f"max {build_times[-1] * 1000:.0f} ms")
+    print(f"{readers} reader threads: {sum(quotes)} quotes, {len(mismatches)} saw a mixed table")
+    assert not mismatches
+
+    tariffs = store.current
+    engine = tariffs.premiums
+    count = 500000
+    t0 = time.perf_counter()
+    for _ in range(count):
+        engine.quote('B2')
+    direct = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(count):
+        store.current.premiums.quote('B2')
+    through_store = time.perf_counter() - t0
+    print(f"quote via direct reference {direct / count * 1e9:.0f} ns, "
+          f"via store.current {through_store / count * 1e9:.0f} ns")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reloads', type=int, default=20)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+    main(args.reloads, args.readers)
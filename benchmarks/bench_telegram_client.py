@@ -0,0 +1,64 @@
+"""Сравнение новой ClientSession на каждый ответ и общего пула TelegramClient
+
+Запуск: python benchmarks/bench_telegram_client.py [--messages 500] [--concurrency 20]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+
+from telegram_client import TelegramClient
+from benchmarks.fake_telegram import FakeTelegram
+
+
+async def send_with_new_session(api_url, chat_id, text):
+    """Старый путь: сессия и TCP-соединение создаются на каждое сообщение"""
+    url = f"{api_url}/botTOKEN/sendMessage"
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json={'chat_id': chat_id, 'text': text}) as response:
+            return await response.json()
+
+
+async def run_batch(send, messages, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await send(i, f"quote #{i}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(messages)))
+    return time.perf_counter() - started
+
+
+async def main(messages, concurrency, latency):
+    fake = FakeTelegram(latency=latency)
+    api_url = await fake.start()
+
+    elapsed = await run_batch(lambda c, t: send_with_new_session(api_url, c, t), messages, concurrency)
+    legacy = (elapsed, fake.connections)
+
+    fake.peers.clear()
+    client = TelegramClient('TOKEN', api_url=api_url, max_concurrency=concurrency)
+    elapsed = await run_batch(client.send_message, messages, concurrency)
+    pooled = (elapsed, fake.connections)
+    await client.close()
+    await fake.stop()
+
+    print(f"{'mode':<14}{'total, s':>10}{'ms/msg':>10}{'msg/s':>10}{'new conns':>11}")
+    for name, (total, conns) in (('new session', legacy), ('pooled', pooled)):
+        print(f"{name:<14}{total:>10.3f}{total * 1000 / messages:>10.3f}{messages / total:>10.0f}{conns:>11}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа заглушки, с')
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.concurrency, args.latency))
@@ -0,0 +1,123 @@
+"""Синтетический корпус сообщений, похожих на реальные обращения к боту"""
+import random
+from typing import List
+
+BRANDS_MODELS = [
+    ('BMW', ['X3', 'X5', '320i', '520d']), ('Toyota', ['Camry', 'Corolla', 'RAV4']),
+    ('Mercedes', ['E200', 'C180', 'Sprinter']), ('Volkswagen', ['Golf', 'Passat', 'Tiguan']),
+    ('Skoda', ['Octavia', 'Fabia', 'Superb']), ('Hyundai', ['Tucson', 'Elantra']),
+    ('Kia', ['Sportage', 'Ceed', 'Rio']), ('Renault', ['Megane', 'Logan', 'Duster']),
+    ('Audi', ['A4', 'A6', 'Q5']), ('Nissan', ['Qashqai', 'Leaf', 'X-Trail']),
+    ('Land Rover', ['Discovery', 'Evoque']), ('Lada', ['Vesta', '2107']),
+]
+
+VOLUMES = [998, 1196, 1398, 1598, 1798, 1968, 1998, 2494, 2996, 3498, 4395]
+
+TEMPLATES = [
+    '{brand} {model} {volume} см³',
+    '{brand} {model} {volume}',
+    '{brand} {model} объем {volume}',
+    'хочу для {brand}, {volume} кубов',
+    '{brand} {model} {liters} л {year}',
+    '{brand} {model} {short_liters} {year}',
+    '{brand} {model} {short_liters} л, {year} року',
+    '{brand} {model}, {year} рік, {volume} см3',
+    '{brand} {model} {year}, {volume}',
+    '{brand} {model} ({year}) {volume}',
+    '{brand} {year}/{volume}',
+    'год {year}, объем {volume}',
+    'Добрий день! Скільки коштує поліс на {brand} {model} {volume} cc?',
+    '{brand} {model}',
+    'привет',
+    'дякую',
+    'сколько стоит страховка на машину',
+]
+
+# Год перед объемом: год не должен становиться объемом
+YEAR_AND_VOLUME = [
+    ('Opel Astra 2008, 1598', '1598'),
+    ('Toyota Camry 2012, 2494', '2494'),
+    ('BMW X3 (2008) 1995', '1995'),
+    ('BMW 2008/1995', '1995'),
+    ('год 2015, объем 1600', '1600'),
+    ('BMW X3 2000', '2000'),
+    # Литры с одним-двумя знаками: год рядом с ними — не объем
+    ('Skoda Octavia 1.4 2016', '1400'),
+    ('Toyota Camry 2.5 л 2018', '2500'),
+    ('Opel Astra 1.6 2008 року', '1600'),
+    ('VW Passat 1.8 TSI 2011', '1800'),
+    ('Kia Rio 1,4л 2015', '1400'),
+    # Другое число есть, но не объем: год объемом не становится
+    ('Toyota 2008 на 130', None),
+]
+
+
+def make_messages(count: int = 1000, seed: int = 42) -> List[str]:
+    """Возвращает воспроизводимый список сообщений"""
+    rnd = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        brand, models = rnd.choice(BRANDS_MODELS)
+        volume = rnd.choice(VOLUMES)
+        template = rnd.choice(TEMPLATES)
+        if rnd.random() < 0.5:
+            brand = brand.upper()
+        messages.append(template.format(
+            brand=brand, model=rnd.choice(models), volume=volume,
+            liters=f"{volume / 1000:.3f}", short_liters=f"{volume / 1000:.1f}", year=rnd.randint(1995, 2024)
+        ))
+    return messages
+
+
+def make_update(update_id: int, text: str, chat_id: int = 1000) -> dict:
+    """Собирает update в форме, которую присылает Telegram"""
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Test', 'language_code': 'uk'},
+            'chat': {'id': chat_id, 'first_name': 'Test', 'type': 'private'},
+            'date': 1700000000 + update_id,
+            'text': text
+        }
+    }
+
+
+def make_recorded_updates(start_id: int = 1) -> List[dict]:
+    """Update в формах, которые реально приходят от Telegram, кроме обычного текста
+
+    Правка сообщения, фото без текста и с подписью, стикер, группа,
+    пересланное сообщение, команды с упоминанием бота, callback без message.
+    """
+    chat = {'id': 2000, 'first_name': 'Test', 'type': 'private'}
+    group = {'id': -100200, 'title': 'Автопарк', 'type': 'supergroup'}
+    sender = {'id': 2000, 'is_bot': False, 'first_name': 'Test', 'language_code': 'ru'}
+
+    def message(update_id, **fields):
+        body = {'message_id': update_id, 'from': sender, 'chat': chat, 'date': 1700000000 + update_id}
+        body.update(fields)
+        return body
+
+    shapes = [
+        lambda i: {'update_id': i, 'message': message(i, text='/start', entities=[
+            {'type': 'bot_command', 'offset': 0, 'length': 6}])},
+        lambda i: {'update_id': i, 'message': message(i, text='/help@osago_calc_bot', entities=[
+            {'type': 'bot_command', 'offset': 0, 'length': 20}])},
+        lambda i: {'update_id': i, 'edited_message': message(i, text='BMW X5 2993 см³', edit_date=1700000100 + i)},
+        lambda i: {'update_id': i, 'message': message(i, photo=[
+            {'file_id': f'AgAC{i}s', 'file_unique_id': f'u{i}s', 'width': 90, 'height': 67, 'file_size': 1200},
+            {'file_id': f'AgAC{i}m', 'file_unique_id': f'u{i}m', 'width': 1280, 'height': 960, 'file_size': 160000}])},
+        lambda i: {'update_id': i, 'message': message(i, caption='техпаспорт Skoda Octavia 1598', photo=[
+            {'file_id': f'AgAD{i}', 'file_unique_id': f'd{i}', 'width': 1280, 'height': 960, 'file_size': 150000}])},
+        lambda i: {'update_id': i, 'message': message(i, sticker={
+            'file_id': f'CAAC{i}', 'file_unique_id': f's{i}', 'type': 'regular', 'width': 512, 'height': 512,
+            'is_animated': False, 'is_video': False, 'emoji': '👍'})},
+        lambda i: {'update_id': i, 'message': message(i, chat=group, text='Renault Logan 1.598 л 2012')},
+        lambda i: {'update_id': i, 'message': message(i, text='Toyota Camry 2494', forward_origin={
+            'type': 'user', 'date': 1699990000, 'sender_user': sender})},
+        lambda i: {'update_id': i, 'message': message(i, text='а если 1998?', reply_to_message=message(
+            i - 1, text='🔍 Понял: KIA\n\n❓ Какой объем двигателя в см³?'))},
+        lambda i: {'update_id': i, 'callback_query': {'id': str(i), 'from': sender, 'chat_instance': '1',
+                                                      'data': 'age:noLimit'}},
+    ]
+    return [shape(start_id + n) for n, shape in enumerate(shapes)]
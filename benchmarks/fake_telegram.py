@@ -0,0 +1,80 @@
+"""Локальная заглушка Telegram Bot API для бенчмарков"""
+import asyncio
+from typing import Dict, Any
+
+from aiohttp import web
+
+
+class FakeTelegram:
+    """Отвечает на вызовы Bot API и считает запросы и новые TCP-соединения"""
+
+    def __init__(self, latency: float = 0.0, fail_every: int = 0, retry_after: int = 0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.requests = 0
+        self.peers = set()
+        self.calls = []
+        # file_path -> содержимое для getFile и /file/bot{token}/{file_path}
+        self.files = {}
+        self.url = None
+        self._runner = None
+
+    async def _on_call(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        # Каждое новое TCP-соединение приходит с нового клиентского порта
+        self.peers.add(request.transport.get_extra_info('peername'))
+        method = request.match_info['method']
+        payload = await request.json() if request.can_read_body else {}
+        self.calls.append((method, payload))
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.fail_every and self.requests % self.fail_every == 0:
+            body = {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                    'parameters': {'retry_after': self.retry_after}}
+            return web.json_response(body, status=429)
+
+        return web.json_response({'ok': True, 'result': self.result_for(method, payload)})
+
+    async def _on_file(self, request: web.Request) -> web.StreamResponse:
+        data = self.files.get(request.match_info['path'])
+        if data is None:
+            return web.Response(status=404)
+        response = web.StreamResponse(headers={'Content-Length': str(len(data))})
+        await response.prepare(request)
+        view = memoryview(data)
+        for start in range(0, len(view), 64 * 1024):
+            await response.write(view[start:start + 64 * 1024])
+        await response.write_eof()
+        return response
+
+    def result_for(self, method: str, payload: Dict[str, Any]) -> Any:
+        """Результат вызова; переопределяется в бенчмарках с особыми методами"""
+        if method == 'getFile':
+            file_id = payload.get('file_id')
+            return {'file_id': file_id, 'file_path': file_id, 'file_size': len(self.files.get(file_id, b''))}
+        return {'message_id': self.requests, 'chat': {'id': payload.get('chat_id')}}
+
+    @property
+    def connections(self) -> int:
+        return len(self.peers)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._on_call)
+        app.router.add_get('/file/bot{token}/{path:.+}', self._on_file)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        sock_port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{sock_port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,229 @@
+"""Набор бенчмарков горячего пути с сохранением результатов в JSON
+
+Покрывает разбор текста (SimpleBot.parse_text, ClaudeProcessor.parse_text_input),
+тарифы (TariffHandler.get_car_category/get_price), format_result и
+process_update целиком против локальной заглушки Bot API. Корпус —
+синтетические сообщения плюс update в формах, записанных с реального бота.
+Каждый замер повторяется, в результат идут медиана и минимум нс на операцию;
+сравнение идет по минимуму — он меньше всего зависит от шума машины.
+
+Запуск:
+  python benchmarks/suite.py --output results/HEAD.json
+  python benchmarks/suite.py --output new.json --compare results/HEAD.json [--threshold 0.1]
+  python benchmarks/suite.py --compare new.json --baseline old.json   # только сравнить файлы
+При регрессии больше threshold скрипт завершается с кодом 1.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Мерим обработку, а не лимиты Telegram — их проверяет bench_burst.py
+os.environ.setdefault('ADMISSION_CHAT_RATE', '0')
+os.environ.setdefault('OUTBOUND_RATE', '0')
+
+from benchmarks.corpus import make_messages, make_update, make_recorded_updates
+
+FORMAT_VERSION = 1
+
+
+def measure(cases, repeats):
+    """Время одного вызова func(x) по inputs, нс: по одному значению на повтор для каждого случая
+
+    cases: {имя: (func, inputs)}. Повторы идут по кругу через все случаи, чтобы
+    всплеск нагрузки на машине не достался целиком одному бенчмарку. Первый
+    проход — прогрев, сборщик мусора на время замера выключен, как в timeit.
+    """
+    samples = {name: [] for name in cases}
+    gc.disable()
+    try:
+        for repeat in range(repeats + 1):
+            for name, (func, inputs) in cases.items():
+                started = time.perf_counter_ns()
+                for item in inputs:
+                    func(item)
+                if repeat:
+                    samples[name].append((time.perf_counter_ns() - started) / len(inputs))
+    finally:
+        gc.enable()
+    return samples
+
+
+def summarize(samples, **extra):
+    result = {
+        'ns_per_op': statistics.median(samples),
+        'min_ns_per_op': min(samples),
+        'repeats': len(samples),
+    }
+    result.update(extra)
+    return result
+
+
+def micro_benchmarks(messages, repeats):
+    """Синхронные части обработки update"""
+    from bot import SimpleBot
+    from text_parser import vehicle_parser
+    from ocr_processor import ClaudeProcessor
+    from excel_handler import TariffHandler
+    from quotes import quote_formatter
+
+    bot = SimpleBot()
+    processor = ClaudeProcessor()
+    tariffs = TariffHandler()
+
+    parsed = [vehicle_parser.parse_uncached(text) for text in messages]
+    volumes = [item['engine_volume'] for item in parsed]
+    categories = [tariffs.get_car_category(volume) for volume in volumes]
+    with_volume = [item for item in parsed if item['engine_volume']]
+
+    cases = {
+        'parse_text.cold': (vehicle_parser.parse_uncached, messages),
+        'parse_text.cached': (bot.parse_text, messages),
+        'parse_text_input': (processor.parse_text_input, messages),
+        'get_car_category': (tariffs.get_car_category, volumes),
+        'get_price': (tariffs.get_price, categories),
+        'format_result.cold': (lambda data: quote_formatter._render(data, True, quote_formatter.store.current),
+                               with_volume),
+        'format_result.cached': (bot.format_result, with_volume),
+    }
+    return {name: summarize(samples, ops=len(cases[name][1]))
+            for name, samples in measure(cases, repeats).items()}
+
+
+def process_update_benchmark(messages, repeats):
+    """process_update целиком: разбор, контекст, расчет и sendMessage в локальную заглушку"""
+    import asyncio
+    from bot import SimpleBot
+
+    recorded = make_recorded_updates()
+    samples, latencies = [], []
+    for repeat in range(repeats):
+        bot = SimpleBot()
+        base = repeat * (len(messages) + len(recorded)) + 1
+        updates = [make_update(base + i, text, chat_id=1000 + i % 50) for i, text in enumerate(messages)]
+        updates += make_recorded_updates(base + len(messages))
+
+        async def run():
+            for update in updates:
+                started = time.perf_counter_ns()
+                await bot.process_update(update)
+                latencies.append(time.perf_counter_ns() - started)
+            await bot.telegram.close()
+
+        started = time.perf_counter_ns()
+        asyncio.run(run())
+        samples.append((time.perf_counter_ns() - started) / len(updates))
+
+    latencies.sort()
+    return {'process_update': summarize(
+        samples, ops=len(messages) + len(recorded),
+        p50_ns=latencies[len(latencies) // 2], p99_ns=latencies[int(len(latencies) * 0.99)]
+    )}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(messages_count, updates_count, repeats):
+    from loop_runner import LoopRunner
+    from benchmarks.fake_telegram import FakeTelegram
+
+    # Заглушка Bot API поднимается до импорта бота: адрес API читается при импорте
+    fake_runner = LoopRunner()
+    fake = FakeTelegram()
+    os.environ['TELEGRAM_API_URL'] = fake_runner.run(fake.start())
+    os.environ.setdefault('BOT_TOKEN', 'TOKEN')
+
+    messages = make_messages(messages_count)
+    try:
+        results = micro_benchmarks(messages, repeats)
+        results.update(process_update_benchmark(make_messages(updates_count, seed=7), repeats))
+    finally:
+        fake_runner.run(fake.stop())
+        fake_runner.shutdown()
+    return {
+        'format': FORMAT_VERSION,
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def print_results(report):
+    print(f"commit {report['commit']}, Python {report['python']}")
+    print(f"{'benchmark':<24}{'ns/op':>12}{'min ns/op':>12}")
+    for name, result in report['results'].items():
+        print(f"{name:<24}{result['ns_per_op']:>12.0f}{result['min_ns_per_op']:>12.0f}")
+
+
+def compare(current, baseline, threshold):
+    """Печатает изменения относительно baseline; возвращает список регрессий"""
+    print(f"\n{baseline.get('commit')} -> {current.get('commit')}")
+    print(f"{'benchmark':<24}{'base min':>12}{'min ns/op':>12}{'change':>9}")
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<24}{'—':>12}{result['min_ns_per_op']:>12.0f}{'new':>9}")
+            continue
+        change = result['min_ns_per_op'] / base['min_ns_per_op'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<24}{base['min_ns_per_op']:>12.0f}{result['min_ns_per_op']:>12.0f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--updates', type=int, default=500)
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--output', help='куда сохранить результаты JSON')
+    parser.add_argument('--compare', help='JSON предыдущего запуска для сравнения')
+    parser.add_argument('--baseline', help='вместе с --compare: сравнить два готовых файла без запуска')
+    parser.add_argument('--threshold', type=float, default=0.10, help='допустимое замедление, доля')
+    args = parser.parse_args()
+    if args.baseline and not args.compare:
+        parser.error('--baseline requires --compare')
+
+    if args.baseline:
+        with open(args.compare, encoding='utf-8') as f:
+            current = json.load(f)
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        sys.exit(1 if compare(current, baseline, args.threshold) else 0)
+
+    report = run_suite(args.messages, args.updates, args.repeats)
+    print_results(report)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,144 +1,109 @@
 import os
-import re
 import json
+import time
 import asyncio
 from typing import Dict, Any
 
+from telegram_client import TelegramClient
+from loop_runner import loop_runner
+from context_store import ChatContext, create_context_store
+from reply_queue import ReplyQueue
+from update_dedup import UpdateDeduplicator
+from admission import AdmissionController, ADMIT
+from metrics import (registry, stage_seconds, updates_total, parse_misses_total, unknown_brands_total,
+                     errors_total, duplicate_updates_total, profiler, register_bot, CONTENT_TYPE)
+
+# Один цикл событий на весь теплый воркер; PERSISTENT_LOOP=0 возвращает цикл на каждый запрос
+PERSISTENT_LOOP = os.getenv('PERSISTENT_LOOP', '1') != '0'
+
+# Как отвечать на webhook:
+#   inline   — дождаться отправки ответа в Telegram (по умолчанию);
+#   queue    — сразу вернуть 200, ответ отправят фоновые воркеры очереди
+#              (для долгоживущих процессов: после ответа функция может быть заморожена);
+#   response — вернуть ответ в теле ответа на webhook, без исходящего запроса
+WEBHOOK_MODE = os.getenv('WEBHOOK_MODE', 'inline')
+
+# Тарифы, парсер и расчет импортируются при первом обращении: /start и /help обходятся без них,
+# а дальше берутся из глобальных, без import на каждом сообщении
+_tariff_store = None
+_parser = None
+_quote_formatter = None
+
 # Простая обработка без aiogram - он конфликтует с Vercel
 class SimpleBot:
     def __init__(self):
         self.bot_token = os.getenv('BOT_TOKEN', '')
-        self.user_contexts = {}
-        
-        # Тарифы напрямую в коде (проще чем Excel на Vercel)
-        self.tariffs = {
-            'B1': {'name': 'до 1600 см³', 'price': 1959},
-            'B2': {'name': '1601-2000 см³', 'price': 2527},
-            'B3': {'name': '2001-3000 см³', 'price': 2585},
-            'B4': {'name': 'свыше 3000 см³', 'price': 3349}
-        }
-        
-        self.car_brands = [
-            'BMW', 'MERCEDES', 'AUDI', 'VOLKSWAGEN', 'TOYOTA', 'HONDA', 'NISSAN',
-            'HYUNDAI', 'KIA', 'FORD', 'CHEVROLET', 'OPEL', 'PEUGEOT', 'RENAULT',
-            'LEXUS', 'DAEWOO', 'MAZDA', 'SUBARU', 'MITSUBISHI', 'LADA'
-        ]
+        self.user_contexts = create_context_store()
+        self.telegram = TelegramClient(self.bot_token)
+        self.reply_queue = ReplyQueue(self.send_message)
+        self.dedup = UpdateDeduplicator()
+        self.admission = AdmissionController(self.send_merged)
     
     def get_category(self, engine_volume):
         """Определяет категорию по объему двигателя"""
-        try:
-            volume = int(engine_volume)
-            if volume <= 1600:
-                return 'B1'
-            elif volume <= 2000:
-                return 'B2'
-            elif volume <= 3000:
-                return 'B3'
-            else:
-                return 'B4'
-        except:
-            return 'B2'
+        global _tariff_store
+        if _tariff_store is None:
+            from tariff_store import tariff_store as _tariff_store
+        return _tariff_store.current.engine.get_category(engine_volume)
     
     def parse_text(self, text):
         """Парсит текст пользователя"""
-        text = text.upper().strip()
-        result = {'brand': None, 'model': None, 'engine_volume': None}
-        
-        # Поиск объема двигателя
-        volume_patterns = [
-            r'(\d{3,4})\s*(?:СМ|CM|КУБОВ|КУБ)',
-            r'(\d{1,2})[.,](\d{3})',
-            r'(\d{3,4})(?=\s|$)'
-        ]
-        
-        for pattern in volume_patterns:
-            match = re.search(pattern, text)
-            if match:
-                if len(match.groups()) == 2:
-                    volume = match.group(1) + match.group(2)
-                else:
-                    volume = match.group(1)
-                
-                if 500 <= int(volume) <= 8000:
-                    result['engine_volume'] = volume
-                    break
-        
-        # Поиск марки
-        for brand in self.car_brands:
-            if brand in text:
-                result['brand'] = brand
-                # Ищем модель после марки
-                brand_index = text.find(brand)
-                text_after = text[brand_index + len(brand):].strip()
-                model_match = re.search(r'^[А-ЯA-Z0-9\-]+', text_after)
-                if model_match:
-                    model = model_match.group()
-                    if not re.match(r'^\d{3,4}$', model):
-                        result['model'] = model
-                break
-        
-        return result
+        global _parser
+        if _parser is None:
+            from text_parser import vehicle_parser as _parser
+        return _parser.parse(text)
     
     def format_result(self, data):
         """Форматирует результат расчета"""
-        engine_volume = data.get('engine_volume')
-        if not engine_volume:
-            return "❓ Не указан объем двигателя. Напиши например: 'BMW X3 1998 см³'"
-        
-        category = self.get_category(engine_volume)
-        price = self.tariffs[category]['price']
-        
-        brand = data.get('brand', 'Автомобиль')
-        model = data.get('model', '')
-        volume_liters = f"{float(engine_volume)/1000:.3f} л"
-        
-        vehicle_name = f"{brand} {model}".strip()
-        if volume_liters:
-            vehicle_name += f", {volume_liters} бензин"
-        
-        return f"""✅ Ціна автоцивілки (ОСЦПВ) для {vehicle_name}:
-🩺 Покриття: життя і здоров'я потерпілих до 5 000 000 грн
-🚗 Покриття: майно потерпілих до 1 250 000 грн
-👤 Діє для водіїв віком: більше 30 років
-💰 Ціна: {price} грн"""
+        global _quote_formatter
+        if _quote_formatter is None:
+            from quotes import quote_formatter as _quote_formatter
+        return _quote_formatter.format(data)
     
     async def send_message(self, chat_id, text):
         """Отправляет сообщение через Telegram API"""
-        import aiohttp
+        # Общий лимит исходящих: ждем своего места в расписании, а не 429 от Telegram
+        await self.admission.outbound.acquire()
+        return await self.telegram.send_message(chat_id, text, parse_mode='HTML')
+    
+    def build_reply(self, update_data):
+        """Готовит ответ на обновление: (chat_id, текст) или None, если отвечать не нужно"""
+        # Повтор webhook от Telegram отбрасываем до любого разбора
+        if self.dedup.seen(update_data.get('update_id')):
+            updates_total.inc('duplicate')
+            duplicate_updates_total.inc()
+            return None
         
-        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-        data = {
-            'chat_id': chat_id,
-            'text': text,
-            'parse_mode': 'HTML'
-        }
+        message = update_data.get('message', {})
+        if not message:
+            return None
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=data) as response:
-                return await response.json()
+        chat_id = message['chat']['id']
+        
+        # Сверх лимита чата текст не разбираем: повтор отбрасывается, остальное ждет токена
+        decision, text = self.admission.admit(chat_id, message.get('text', ''))
+        if decision != ADMIT:
+            updates_total.inc(decision)
+            return None
+        
+        return chat_id, self.reply_text(chat_id, text)
     
-    async def process_update(self, update_data):
-        """Обрабатывает обновление от Telegram"""
-        try:
-            message = update_data.get('message', {})
-            if not message:
-                return
-            
-            chat_id = message['chat']['id']
-            text = message.get('text', '')
-            
-            # Команды
-            if text == '/start':
-                response = """🚗 Привет! Я помогу рассчитать ОСЦПВ.
+    def reply_text(self, chat_id, text):
+        """Текст ответа на сообщение чата"""
+        # Команды
+        if text == '/start':
+            updates_total.inc('command')
+            response = """🚗 Привет! Я помогу рассчитать ОСЦПВ.
 
 💬 Напиши данные автомобиля:
 • "BMW X3 1998 см³"
 • "Toyota Camry 1800"
 
 Что рассчитываем?"""
-            
-            elif text == '/help':
-                response = """ℹ️ Как использовать:
+        
+        elif text == '/help':
+            updates_total.inc('command')
+            response = """ℹ️ Как использовать:
 
 💭 Пиши естественно:
 • "BMW X3 объем 2000"
@@ -149,38 +114,121 @@ class SimpleBot:
 • Имущество: до 1 250 000 грн
 
 Бот понимает обычную речь! 😊"""
-            
-            else:
-                # Обрабатываем текст
+        
+        else:
+            # Обрабатываем текст
+            with stage_seconds.time('parse'):
                 parsed = self.parse_text(text)
-                
-                if parsed['engine_volume']:
-                    # Есть объем - рассчитываем
+            
+            # Объем без марки продолжает описание авто из прошлых сообщений
+            with stage_seconds.time('context'):
+                context = self.user_contexts.get(chat_id)
+                if context is not None and context.brand and parsed.get('brand_guessed'):
+                    # Марка, угаданная по опечатке, не заменяет уже названную в диалоге
+                    parsed = dict(parsed, brand=None, model=None)
+                if context is not None and parsed['engine_volume']:
+                    parsed = context.merge(parsed)
+                if parsed['brand'] or parsed['engine_volume']:
+                    self.user_contexts.set(chat_id, ChatContext.from_dict(parsed))
+            
+            if parsed['engine_volume']:
+                # Есть объем - рассчитываем
+                updates_total.inc('quote')
+                if not parsed['brand']:
+                    unknown_brands_total.inc()
+                with stage_seconds.time('format'):
                     response = self.format_result(parsed)
-                elif any(word in text.lower() for word in ['спасибо', 'дякую', 'благодарю']):
-                    response = "😊 Пожалуйста! Обращайтесь для новых расчетов."
-                elif any(word in text.lower() for word in ['привет', 'здравствуй', 'добрый']):
-                    response = "👋 Привет! Какой автомобиль будем рассчитывать?"
+            elif any(word in text.lower() for word in ['спасибо', 'дякую', 'благодарю']):
+                updates_total.inc('smalltalk')
+                response = "😊 Пожалуйста! Обращайтесь для новых расчетов."
+            elif any(word in text.lower() for word in ['привет', 'здравствуй', 'добрый']):
+                updates_total.inc('smalltalk')
+                response = "👋 Привет! Какой автомобиль будем рассчитывать?"
+            else:
+                if parsed['brand']:
+                    updates_total.inc('ask_volume')
+                    response = f"🔍 Понял: {parsed['brand']} {parsed.get('model') or ''}\n\n❓ Какой объем двигателя в см³?"
                 else:
-                    if parsed['brand']:
-                        response = f"🔍 Понял: {parsed['brand']} {parsed.get('model', '')}\n\n❓ Какой объем двигателя в см³?"
-                    else:
-                        response = "🤔 Не понял данные автомобиля.\n\n💡 Напиши например: 'BMW X3 1998 см³'"
+                    updates_total.inc('not_understood')
+                    parse_misses_total.inc()
+                    response = "🤔 Не понял данные автомобиля.\n\n💡 Напиши например: 'BMW X3 1998 см³'"
+        
+        return response
+    
+    async def process_update(self, update_data):
+        """Обрабатывает обновление от Telegram"""
+        started = time.perf_counter()
+        try:
+            with profiler.sample():
+                reply = self.build_reply(update_data)
+            if reply is not None:
+                # Отправляем ответ
+                with stage_seconds.time('send'):
+                    await self.send_message(*reply)
             
-            # Отправляем ответ
-            await self.send_message(chat_id, response)
+        except Exception as e:
+            errors_total.inc('process_update')
+            print(f"Ошибка обработки: {e}")
+        finally:
+            stage_seconds.observe(time.perf_counter() - started, 'total')
+    
+    async def send_merged(self, chat_id, text):
+        """Отвечает на отложенные и склеенные сообщения чата, когда у него появился токен"""
+        try:
+            response = self.reply_text(chat_id, text)
+            with stage_seconds.time('send'):
+                await self.send_message(chat_id, response)
+        
+        except Exception as e:
+            errors_total.inc('send_merged')
+            print(f"Ошибка обработки: {e}")
+    
+    async def enqueue_update(self, update_data):
+        """Готовит ответ и отдает его фоновой очереди, не дожидаясь Telegram"""
+        try:
+            reply = self.build_reply(update_data)
+            if reply is not None:
+                await self.reply_queue.put(*reply)
             
         except Exception as e:
+            errors_total.inc('enqueue_update')
+            print(f"Ошибка обработки: {e}")
+    
+    def reply_payload(self, update_data):
+        """Ответ в виде вызова Bot API для тела ответа на webhook (без исходящего запроса)"""
+        try:
+            reply = self.build_reply(update_data)
+        except Exception as e:
+            errors_total.inc('reply_payload')
             print(f"Ошибка обработки: {e}")
+            return None
+        if reply is None:
+            return None
+        
+        # Отправит Telegram, но в общий лимит исходящих ответ тоже входит
+        self.admission.outbound.reserve()
+        chat_id, text = reply
+        return {'method': 'sendMessage', 'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'}
 
 # Создаем экземпляр бота
 simple_bot = SimpleBot()
+loop_runner.add_shutdown_callback(simple_bot.reply_queue.close, before_drain=True)
+loop_runner.add_shutdown_callback(simple_bot.telegram.close)
+register_bot(simple_bot)
 
 # Главная функция для Vercel
 def handler(request):
     """Простая функция для обработки webhook"""
     import asyncio
     
+    # GET /metrics (маршрут в vercel.json ведет сюда же)
+    if getattr(request, 'path', '').rstrip('/').endswith('/metrics'):
+        return {
+            "statusCode": 200,
+            "headers": {"Content-Type": CONTENT_TYPE},
+            "body": registry.render()
+        }
+    
     try:
         # Получаем тело запроса
         if hasattr(request, 'get_json'):
@@ -195,11 +243,26 @@ def handler(request):
             else:
                 body = body_content
         
+        if WEBHOOK_MODE == 'response':
+            # Telegram сам выполнит sendMessage из тела ответа
+            payload = simple_bot.reply_payload(body) or {"status": "ok"}
+            return {
+                "statusCode": 200,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps(payload)
+            }
+        
         # Запускаем обработку
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(simple_bot.process_update(body))
-        loop.close()
+        if WEBHOOK_MODE == 'queue':
+            loop_runner.run(simple_bot.enqueue_update(body))
+        elif PERSISTENT_LOOP:
+            loop_runner.run(simple_bot.process_update(body))
+        else:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(simple_bot.process_update(body))
+            loop.run_until_complete(simple_bot.telegram.close())
+            loop.close()
         
         return {
             "statusCode": 200,
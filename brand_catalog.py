@@ -0,0 +1,278 @@
+"""Нечеткий поиск марок и моделей по каталогу: кириллица, сокращения, опечатки
+
+Все названия и псевдонимы приводятся к фонетическому ключу латиницей
+(«Тойота» и TOYOTA дают TOIOTA) и раскладываются по триграммам. Поиск слова
+идет по спискам его триграмм, поэтому расстояние Левенштейна считается только
+для нескольких кандидатов с общими триграммами, а не для всего каталога.
+"""
+import os
+import re
+import json
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from lru_cache import LRUCache
+
+CATALOG_PATH = os.getenv('BRAND_CATALOG_PATH', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'vehicle_catalog.json'
+))
+
+# Кириллица -> латиница в той же упрощенной записи, что и ключи латинских названий
+CYRILLIC = str.maketrans({
+    'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'G', 'Ґ': 'G', 'Д': 'D', 'Е': 'E', 'Ё': 'E', 'Є': 'E',
+    'Ж': 'ZH', 'З': 'Z', 'И': 'I', 'І': 'I', 'Ї': 'I', 'Й': 'I', 'К': 'K', 'Л': 'L', 'М': 'M',
+    'Н': 'N', 'О': 'O', 'П': 'P', 'Р': 'R', 'С': 'S', 'Т': 'T', 'У': 'U', 'Ф': 'F', 'Х': 'H',
+    'Ц': 'TS', 'Ч': 'CH', 'Ш': 'SH', 'Щ': 'SH', 'Ъ': '', 'Ы': 'I', 'Ь': '', 'Э': 'E',
+    'Ю': 'IU', 'Я': 'IA',
+})
+
+# Латинские сочетания, которые по-русски пишутся одинаково: CE/CI -> С, Y -> И, W -> В
+LATIN_RULES = {
+    'PH': 'F', 'CK': 'K', 'CH': 'CH', 'CE': 'SE', 'CI': 'SI', 'CY': 'SI',
+    'C': 'K', 'Y': 'I', 'W': 'V', 'Q': 'K', 'X': 'KS', 'J': 'DZH',
+}
+LATIN_PATTERN = re.compile(r'PH|CK|CH|C[EIY]|[CYWQXJ]')
+
+# В названиях с цифрами (Х5, С200, А4) кириллица — это латинские буквы того же вида
+HOMOGLYPHS = str.maketrans('АВЕКМНОРСТХ', 'ABEKMHOPCTX')
+DIGIT_PATTERN = re.compile(r'\d')
+HYPHEN_X_PATTERN = re.compile(r'Х(?=-)')
+
+# Падежные окончания: «для Опеля», «на Шкоде» ищем по основе
+ENDING_PATTERN = re.compile(r'(?:ОЙ|ЕЙ|ОМ|ЕМ|ОЮ|ЕЮ|[АЫУЕИЯЮІЄ])$')
+
+DOUBLE_PATTERN = re.compile(r'(.)\1+')
+NON_KEY_PATTERN = re.compile(r'[^A-Z0-9]')
+TOKEN_PATTERN = re.compile(r'[А-ЯЁІЇЄҐA-Z0-9][А-ЯЁІЇЄҐA-Z0-9\-]*')
+
+WORD_CACHE_SIZE = 8192
+
+# Модель без марки ищем только по длинным буквенным названиям: «A4» или «2107» без марки — не модель
+MIN_MODEL_ONLY_LENGTH = 4
+
+# Обычные слова, совпадающие с названиями каталога: «на газу», «газ/бензин», «супер», «мини-вэн».
+# Их не ищем с опечатками и по основе, а марку по ним берем, только если следом идет её модель (ГАЗ 3110)
+AMBIGUOUS_WORDS = ('ГАЗ', 'МИНИ', 'МІНІ', 'СУПЕР', 'АВТО', 'МАШИНА', 'ТАЧКА')
+
+
+def phonetic_key(text: str) -> str:
+    """Ключ для сравнения: латиница, без дефисов и пробелов, без двойных букв"""
+    text = text.upper()
+    if DIGIT_PATTERN.search(text) is not None:
+        text = text.translate(HOMOGLYPHS)
+    else:
+        text = HYPHEN_X_PATTERN.sub('X', text)
+    text = LATIN_PATTERN.sub(lambda m: LATIN_RULES[m.group()], text)
+    text = NON_KEY_PATTERN.sub('', text.translate(CYRILLIC))
+    return DOUBLE_PATTERN.sub(r'\1', text)
+
+
+def max_distance(key: str) -> int:
+    """Допустимое число правок: короткие ключи и ключи с цифрами — только точно"""
+    if len(key) <= 4 or not key.isalpha():
+        return 0
+    return 1 if len(key) <= 7 else 2
+
+
+AMBIGUOUS_KEYS = frozenset(phonetic_key(word) for word in AMBIGUOUS_WORDS)
+
+
+def _trigrams(key: str) -> List[str]:
+    padded = '^' + key + '$'
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def levenshtein(a: str, b: str, limit: int) -> int:
+    """Расстояние Левенштейна; как только оно заведомо больше limit, возвращает limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class CatalogEntry(NamedTuple):
+    brand: str
+    model: Optional[str]
+
+
+class BrandCatalog:
+    """Индекс марок и моделей: точный словарь ключей и триграммы для опечаток"""
+
+    def __init__(self, brands: Dict[str, Dict[str, List[str]]], cache_size: int = WORD_CACHE_SIZE):
+        self.entries: List[CatalogEntry] = []
+        self.keys: List[str] = []
+        self.exact: Dict[str, int] = {}
+        # (триграмма, длина ключа) -> записи: кандидаты сразу только близкой длины
+        self.grams: Dict[Tuple[str, int], List[int]] = {}
+        # Первые слова составных названий: пару слов склеиваем, только начиная с них
+        self.heads: Set[str] = set()
+        # Модели каждой марки отдельно: одно название бывает у нескольких марок (Logan, Lanos)
+        self.models: Dict[str, Dict[str, str]] = {}
+        # Слово -> (ключ, запись): лексика чата повторяется, ключ и поиск считаются один раз
+        self.cache = LRUCache(cache_size) if cache_size else None
+
+        # Сначала марки, потом модели: при совпадении ключей побеждает марка
+        for brand, item in brands.items():
+            for name in (brand, *item.get('aliases', ())):
+                self._add(name, CatalogEntry(brand, None))
+        for brand, item in brands.items():
+            for model in item.get('models', ()):
+                self.models.setdefault(brand, {}).setdefault(phonetic_key(model), model)
+                self._add(model, CatalogEntry(brand, model))
+
+    @classmethod
+    def from_brands(cls, brands: Iterable[str]) -> 'BrandCatalog':
+        return cls({brand: {} for brand in brands})
+
+    def _add(self, name: str, entry: CatalogEntry):
+        key = phonetic_key(name)
+        if not key or key in self.exact:
+            return
+        index = len(self.entries)
+        self.entries.append(entry)
+        self.keys.append(key)
+        self.exact[key] = index
+        if ' ' in name:
+            self.heads.add(phonetic_key(name.split()[0]))
+        if max_distance(key):
+            for gram in set(_trigrams(key)):
+                self.grams.setdefault((gram, len(key)), []).append(index)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def lookup(self, word: str) -> Optional[CatalogEntry]:
+        """Ближайшая запись каталога для одного слова или None"""
+        return self._word(word)[1]
+
+    def _word(self, word: str) -> Tuple[str, Optional[CatalogEntry], bool]:
+        if self.cache is None:
+            return self._search(word)
+        found = self.cache.get(word)
+        if found is None:
+            found = self._search(word)
+            self.cache.set(word, found)
+        return found
+
+    def _search(self, word: str) -> Tuple[str, Optional[CatalogEntry], bool]:
+        """(ключ, запись, найдена ли запись с опечаткой)"""
+        key = phonetic_key(word)
+        index = self._exact_index(word, key)
+        if index is not None:
+            return key, self.entries[index], False
+        limit = max_distance(key)
+        if not limit or key in AMBIGUOUS_KEYS:
+            return key, None, False
+
+        grams = set(_trigrams(key))
+        counts: Dict[int, int] = {}
+        for length in range(len(key) - limit, len(key) + limit + 1):
+            for gram in grams:
+                for index in self.grams.get((gram, length), ()):
+                    counts[index] = counts.get(index, 0) + 1
+
+        # Одна правка портит не больше трех триграмм: остальные кандидаты заведомо дальше limit
+        best, best_distance = None, limit + 1
+        for index, common in counts.items():
+            candidate = self.keys[index]
+            if common < max(len(grams), len(candidate)) - 3 * limit:
+                continue
+            distance = levenshtein(key, candidate, limit)
+            if distance < best_distance:
+                best, best_distance = index, distance
+        if best is None:
+            return key, None, False
+        return key, self.entries[best], True
+
+    def _exact_index(self, word: str, key: str) -> Optional[int]:
+        index = self.exact.get(key)
+        if index is not None:
+            return index
+        word = word.upper()
+        ending = ENDING_PATTERN.search(word)
+        if ending is None:
+            return None
+        stem = word[:ending.start()]
+        # Основа целиком (Опеля -> Опел) или с -а (Тойоты -> Тойота)
+        for candidate in (stem, stem + 'А'):
+            key = phonetic_key(candidate)
+            if len(key) >= 3 and key in self.exact and key not in AMBIGUOUS_KEYS:
+                return self.exact[key]
+        return None
+
+    def match(self, text: str) -> Tuple[Optional[str], Optional[str], bool]:
+        """Марка и модель из текста: (brand, model, fuzzy), канонические названия каталога
+
+        fuzzy — марка угадана по слову с опечаткой, а не найдена точно.
+        """
+        tokens = TOKEN_PATTERN.findall(text.upper())
+        brand = model = None
+        fuzzy = False
+        position = 0
+        i = 0
+        while i < len(tokens):
+            word = tokens[i]
+            if brand is not None:
+                model = self.models.get(brand, {}).get(self._word(word)[0])
+                if model is not None:
+                    break
+            if word.isdigit():
+                # Число без марки — объем или год; Mazda 6 и ВАЗ 2107 находятся по моделям марки
+                i += 1
+                continue
+
+            key, entry, typo = self._word(word)
+            used = 1
+            if key in self.heads and i + 1 < len(tokens):
+                # Составные названия (LAND ROVER, SANTA FE) лежат в индексе слитно
+                pair = word + tokens[i + 1]
+                index = self._exact_index(pair, phonetic_key(pair))
+                if index is not None:
+                    entry, used = self.entries[index], 2
+
+            if entry is None:
+                pass
+            elif entry.model is None:
+                if brand is None and (key not in AMBIGUOUS_KEYS or self._model_follows(entry.brand, tokens, i + 1)):
+                    brand, position, fuzzy = entry.brand, i + used, typo
+            elif brand is None:
+                if self._model_only(word):
+                    brand, model, fuzzy = entry.brand, entry.model, typo
+                    break
+            elif entry.brand == brand:
+                model = entry.model
+                break
+            i += used
+
+        if brand is not None and model is None and position < len(tokens):
+            # Модели нет в каталоге: берем слово после марки, как основной разбор
+            following = tokens[position]
+            if not following.isdigit():
+                model = following
+        return brand, model, fuzzy
+
+    def _model_follows(self, brand: str, tokens: List[str], i: int) -> bool:
+        if i >= len(tokens):
+            return False
+        entry = self._word(tokens[i])[1]
+        return entry is not None and entry.brand == brand and entry.model is not None
+
+    @staticmethod
+    def _model_only(word: str) -> bool:
+        return len(word) >= MIN_MODEL_ONLY_LENGTH and not any(char.isdigit() for char in word)
+
+
+def load_catalog(path: str = CATALOG_PATH, brands: Iterable[str] = ()) -> BrandCatalog:
+    """Каталог из JSON; без файла — только переданные марки без псевдонимов"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return BrandCatalog(json.load(f)['brands'])
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Каталог марок недоступен, используем только список марок: {e}")
+        return BrandCatalog.from_brands(brands)
@@ -0,0 +1,156 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+CONTEXT_TTL = float(os.getenv('CONTEXT_TTL', '1800'))
+CONTEXT_MAX_CHATS = int(os.getenv('CONTEXT_MAX_CHATS', '10000'))
+
+CONTEXT_FIELDS = ('brand', 'model', 'year', 'engine_volume')
+
+
+class ChatContext:
+    """Данные автомобиля, накопленные в диалоге с одним чатом"""
+
+    __slots__ = CONTEXT_FIELDS + ('updated_at',)
+
+    def __init__(self, brand=None, model=None, year=None, engine_volume=None, updated_at=None):
+        self.brand = brand
+        self.model = model
+        self.year = year
+        self.engine_volume = engine_volume
+        self.updated_at = time.time() if updated_at is None else updated_at
+
+    def merge(self, parsed: Dict[str, Any]) -> Dict[str, Any]:
+        """Дополняет разбор нового сообщения данными из прошлых сообщений
+
+        Сообщение с новой маркой начинает описание заново и ничего не наследует.
+        """
+        if parsed.get('brand'):
+            return parsed
+        merged = dict(parsed)
+        for field in CONTEXT_FIELDS:
+            if not merged.get(field):
+                merged[field] = getattr(self, field)
+        return merged
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ChatContext':
+        return cls(*(data.get(field) for field in CONTEXT_FIELDS))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in CONTEXT_FIELDS}
+
+
+class InMemoryContextStore:
+    """Контексты в памяти процесса с вытеснением по TTL и LRU
+
+    Порядок OrderedDict совпадает с порядком последнего обновления, поэтому
+    просроченные записи всегда в начале и удаляются за O(1) на запись.
+    """
+
+    def __init__(self, ttl: float = CONTEXT_TTL, maxsize: int = CONTEXT_MAX_CHATS):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, chat_id) -> Optional[ChatContext]:
+        context = self._data.get(chat_id)
+        if context is None:
+            return None
+        if time.time() - context.updated_at > self.ttl:
+            self._data.pop(chat_id, None)
+            return None
+        return context
+
+    def set(self, chat_id, context: ChatContext):
+        context.updated_at = time.time()
+        self._data[chat_id] = context
+        self._data.move_to_end(chat_id)
+        self._evict(context.updated_at)
+
+    def delete(self, chat_id):
+        self._data.pop(chat_id, None)
+
+    def _evict(self, now: float):
+        while self._data:
+            chat_id, oldest = next(iter(self._data.items()))
+            if len(self._data) <= self.maxsize and now - oldest.updated_at <= self.ttl:
+                break
+            self._data.pop(chat_id, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteContextStore:
+    """Контексты в локальной SQLite, общие для нескольких воркеров на одной машине"""
+
+    # Чистка просроченных записей раз в столько записей
+    CLEANUP_EVERY = 500
+
+    def __init__(self, path: str, ttl: float = CONTEXT_TTL, maxsize: int = CONTEXT_MAX_CHATS):
+        import sqlite3
+
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS chat_context ('
+            ' chat_id INTEGER PRIMARY KEY, brand TEXT, model TEXT, year TEXT,'
+            ' engine_volume TEXT, updated_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS chat_context_updated ON chat_context (updated_at)')
+
+    def get(self, chat_id) -> Optional[ChatContext]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT brand, model, year, engine_volume, updated_at FROM chat_context'
+                ' WHERE chat_id = ? AND updated_at >= ?', (chat_id, time.time() - self.ttl)
+            ).fetchone()
+        return ChatContext(*row) if row else None
+
+    def set(self, chat_id, context: ChatContext):
+        context.updated_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO chat_context VALUES (?, ?, ?, ?, ?, ?)',
+                (chat_id, context.brand, context.model, context.year, context.engine_volume, context.updated_at)
+            )
+            self._writes += 1
+            if self._writes % self.CLEANUP_EVERY == 0:
+                self._cleanup(context.updated_at)
+
+    def delete(self, chat_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM chat_context WHERE chat_id = ?', (chat_id,))
+
+    def _cleanup(self, now: float):
+        self._conn.execute('DELETE FROM chat_context WHERE updated_at < ?', (now - self.ttl,))
+        self._conn.execute(
+            'DELETE FROM chat_context WHERE chat_id IN ('
+            ' SELECT chat_id FROM chat_context ORDER BY updated_at DESC LIMIT -1 OFFSET ?)',
+            (self.maxsize,)
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM chat_context').fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def create_context_store():
+    """Хранилище по переменным окружения: CONTEXT_STORE=memory|sqlite, CONTEXT_DB_PATH"""
+    backend = os.getenv('CONTEXT_STORE', 'memory')
+    if backend == 'sqlite':
+        return SQLiteContextStore(os.getenv('CONTEXT_DB_PATH', '/tmp/chat_context.sqlite3'))
+    return InMemoryContextStore()
@@ -1,102 +1,170 @@
-
-import pandas as pd
 import os
 
+from tariff_engine import AGE_CLASSES, AGE_30_PLUS, AGE_NO_LIMIT, \
+    CAR_VOLUME_THRESHOLDS, CAR_VOLUME_CATEGORIES, DEFAULT_CAR_CATEGORY, DEFAULT_ZONE
+from premium_engine import DEFAULT_BONUS_MALUS, DEFAULT_TERM_MONTHS, DEFAULT_USAGE
+from tariff_store import tariff_store
+
+# Необязательные столбцы автопарка -> измерение таблицы премий и значение по умолчанию
+PREMIUM_COLUMNS = (
+    ('zone', 'zone', DEFAULT_ZONE),
+    ('bonus_malus', 'bonus_malus', DEFAULT_BONUS_MALUS),
+    ('term_months', 'term', DEFAULT_TERM_MONTHS),
+    ('usage', 'usage', DEFAULT_USAGE),
+)
+
+
+def _bonus_malus_class(value):
+    """Класс бонус-малус из ячейки: 5, 5.0, '5' и 'm' -> '5', 'M'"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip().upper()
+
+
 class TariffHandler:
-    def __init__(self):
-        self.tariffs = {
-            # Легковые автомобили
-            'B1': {'name': 'до 1600 см³, в т.ч. гибриды', '30plus': 1959, 'noLimit': 2176},
-            'B2': {'name': '1601-2000 см³, в т.ч. гибриды', '30plus': 2527, 'noLimit': 2807},
-            'B3': {'name': '2001-3000 см³, в т.ч. гибриды', '30plus': 2585, 'noLimit': 2873},
-            'B4': {'name': 'более 3001 см³, в т.ч. гибриды', '30plus': 3349, 'noLimit': 3721},
-            'B5': {'name': 'исключительно с ДВС, кроме гибридных', '30plus': 3330, 'noLimit': 3700},
-            
-            # Автобусы и пассажирский транспорт
-            'D1': {'name': 'до 20 чел.', '30plus': 5464, 'noLimit': 6071},
-            'D2': {'name': 'более 20 чел.', '30plus': 6855, 'noLimit': 7616},
-            'D3': {'name': 'трамваи', '30plus': 6855, 'noLimit': 7616},
-            'D4': {'name': 'троллейбусы', '30plus': 6855, 'noLimit': 7616},
-            
-            # Грузовые автомобили
-            'C0': {'name': 'грузовые до 2,4т', '30plus': 2703, 'noLimit': 3003},
-            'C1': {'name': 'грузовые свыше 2,4т, грузоподъемность до 2т', '30plus': 4113, 'noLimit': 4570},
-            'C2': {'name': 'грузоподъемность свыше 2т', '30plus': 5660, 'noLimit': 6289},
-            
-            # Мотоциклы
-            'A1': {'name': 'мотоциклы до 300 см³, до 5 кВт', '30plus': 745, 'noLimit': 827},
-            'A2': {'name': 'мотоциклы свыше 300 см³, багги, квадроциклы', '30plus': 1371, 'noLimit': 1524},
-            
-            # Сельхозтехника
-            'G1': {'name': 'тракторы', '30plus': 3134, 'noLimit': 3482},
-            'G2': {'name': 'с/х техника', '30plus': 3917, 'noLimit': 4352},
-            'G3': {'name': 'прицепы к с/х технике и тракторам', '30plus': 980, 'noLimit': 1088},
-            
-            # Спецтехника
-            'H1': {'name': 'ТС специального назначения', '30plus': 3917, 'noLimit': 4352},
-            'H2': {'name': 'дорожно-строительная техника', '30plus': 3917, 'noLimit': 4352},
-            'H3': {'name': 'военная техника', '30plus': 3917, 'noLimit': 4352},
-            
-            # Прицепы
-            'F': {'name': 'прицепы к легковым ТС', '30plus': 666, 'noLimit': 740},
-            'E': {'name': 'прицепы к грузовым ТС', '30plus': 980, 'noLimit': 1088}
-        }
+    def __init__(self, store=tariff_store):
+        # Тарифы не копируются: каждое обращение берет текущую версию из хранилища
+        self.store = store
+    
+    @property
+    def engine(self):
+        return self.store.current.engine
+    
+    @property
+    def premiums(self):
+        return self.store.current.premiums
+    
+    @property
+    def tariffs(self):
+        return self.store.current.engine.as_dict()
+    
+    @property
+    def version(self):
+        """Версия тарифов, по которой сейчас идут расчеты"""
+        return self.store.current.version
     
     def get_car_category(self, engine_volume):
         """Определяет категорию легкового автомобиля по объему двигателя"""
-        try:
-            volume = int(engine_volume)
-            if volume <= 1600:
-                return 'B1'
-            elif volume <= 2000:
-                return 'B2'
-            elif volume <= 3000:
-                return 'B3'
-            else:
-                return 'B4'
-        except:
-            return 'B2'  # по умолчанию
+        return self.store.current.engine.get_category(engine_volume)
     
     def get_price(self, category, age_over_30=True):
         """Получает цену для категории и возраста водителя"""
-        if category not in self.tariffs:
-            return None
-        
-        price_type = '30plus' if age_over_30 else 'noLimit'
-        return self.tariffs[category][price_type]
+        return self.store.current.engine.get_price(category, age_over_30)
+    
+    def get_premium(self, category, age_over_30=True, zone=DEFAULT_ZONE, bonus_malus=DEFAULT_BONUS_MALUS,
+                    term_months=DEFAULT_TERM_MONTHS, usage=DEFAULT_USAGE):
+        """Премия в копейках с коэффициентами зоны, бонус-малус, срока и сферы использования"""
+        return self.store.current.premiums.quote(category, zone, age_over_30, bonus_malus, term_months, usage)
+    
+    def get_premium_quote(self, category, age_over_30=True, zone=DEFAULT_ZONE, bonus_malus=DEFAULT_BONUS_MALUS,
+                          term_months=DEFAULT_TERM_MONTHS, usage=DEFAULT_USAGE):
+        """(премия в копейках, версия тарифов): версия та, по которой посчитана именно эта премия"""
+        tariffs = self.store.current
+        return tariffs.premiums.quote(category, zone, age_over_30, bonus_malus, term_months, usage), tariffs.version
     
     def get_all_categories(self):
         """Возвращает список всех доступных категорий"""
-        return list(self.tariffs.keys())
+        return list(self.store.current.engine.categories)
     
     def search_category_by_name(self, vehicle_type):
-        """Поиск категории по типу ТС"""
-        vehicle_type = vehicle_type.lower()
+        """Поиск категории по типу ТС
+        
+        'AUTO' — легковой без объема, категорию определит объем двигателя.
+        Тоннаж, число мест, кВт и см³ в описании уточняют подкатегорию.
+        """
+        from vehicle_classifier import vehicle_classifier
+        return vehicle_classifier.classify(vehicle_type).category
+    
+    def quote_dataframe(self, df):
+        """Массовый расчет для автопарка: добавляет к таблице категорию и цену
+        
+        Ожидаемые столбцы: brand, model, engine_volume, vehicle_type, driver_age
+        (vehicle_type и driver_age необязательны). Необязательные zone, bonus_malus,
+        term_months и usage дают столбец premium — премию в гривнах; строки с
+        неизвестным значением фактора получают NaN. Столбец tariff_version —
+        версия тарифов, по которой посчитана вся таблица.
+        """
+        # numpy и pandas нужны только для массового расчета
+        import numpy as np
+        import pandas as pd
         
-        # Легковые
-        if any(word in vehicle_type for word in ['легков', 'автомобил', 'седан', 'хэтчбек', 'универсал', 'купе']):
-            return 'AUTO'  # требует определения по объему
+        # Вся таблица считается по одной версии тарифов
+        tariffs = self.store.current
+        engine = tariffs.engine
+        rows = len(df)
         
-        # Грузовые
-        elif any(word in vehicle_type for word in ['грузов', 'фургон', 'грузовик']):
-            return 'C1'  # по умолчанию средний грузовик
+        # Легковые: категория по порогам объема одним searchsorted
+        volumes = pd.to_numeric(df['engine_volume'], errors='coerce').to_numpy(dtype=np.float64)
+        car_codes = np.array([engine.index[code] for code in CAR_VOLUME_CATEGORIES], dtype=np.intp)
+        category_idx = car_codes[np.searchsorted(CAR_VOLUME_THRESHOLDS, volumes, side='left')]
+        category_idx[np.isnan(volumes)] = engine.index[DEFAULT_CAR_CATEGORY]
         
-        # Автобусы
-        elif any(word in vehicle_type for word in ['автобус', 'микроавтобус']):
-            return 'D1'  # по умолчанию малый автобус
+        # Тип ТС классифицируем только по уникальным значениям
+        if 'vehicle_type' in df.columns:
+            type_codes, type_names = pd.factorize(df['vehicle_type'].fillna('').astype(str))
+            type_categories = np.array([
+                -1 if category in ('AUTO', DEFAULT_CAR_CATEGORY) else engine.index[category]
+                for category in (self.search_category_by_name(name) for name in type_names)
+            ], dtype=np.intp)
+            if len(type_categories):
+                by_type = type_categories[type_codes]
+                category_idx = np.where(by_type >= 0, by_type, category_idx)
         
-        # Мотоциклы
-        elif any(word in vehicle_type for word in ['мотоцикл', 'скутер', 'мопед']):
-            return 'A1'  # по умолчанию малый мотоцикл
+        # Класс возраста: моложе 30 лет — тариф без ограничений
+        if 'driver_age' in df.columns:
+            ages = pd.to_numeric(df['driver_age'], errors='coerce').to_numpy(dtype=np.float64)
+            age_idx = np.where(ages < 30, AGE_NO_LIMIT, AGE_30_PLUS)
+        else:
+            age_idx = np.full(rows, AGE_30_PLUS)
+        
+        prices = np.frombuffer(engine.prices, dtype=np.int32).reshape(-1, len(AGE_CLASSES))
+        
+        result = df.copy()
+        result['category'] = np.asarray(engine.categories, dtype=object)[category_idx]
+        result['price'] = prices[category_idx, age_idx]
+        
+        # Премия: индексы по каждому измерению и одна выборка из плотной таблицы
+        premiums = tariffs.premiums
+        positions = premiums.positions
+        premium_category = np.array([positions['category'].get(code, -1) for code in engine.categories],
+                                    dtype=np.intp)[category_idx]
+        valid = premium_category >= 0
+        indices = []
+        for column, dimension, default in PREMIUM_COLUMNS:
+            if column not in df.columns:
+                indices.append(positions[dimension][default])
+                continue
+            # Как и тип ТС, значения сопоставляются только по уникальным
+            codes, uniques = pd.factorize(df[column].where(df[column].notna(), default))
+            if dimension == 'bonus_malus':
+                uniques = [_bonus_malus_class(value) for value in uniques]
+            mapped = np.array([positions[dimension].get(value, -1) for value in uniques] + [-1], dtype=np.intp)
+            index = mapped[codes]
+            valid &= index >= 0
+            indices.append(np.maximum(index, 0))
+        
+        zone_idx, bonus_idx, term_idx, usage_idx = indices
+        kopecks = premiums.quote_indices(np.where(valid, premium_category, 0), zone_idx, age_idx,
+                                         bonus_idx, term_idx, usage_idx)
+        result['premium'] = np.where(valid, kopecks / 100, np.nan)
+        result['tariff_version'] = tariffs.version
+        return result
+    
+    def quote_file(self, input_path, output_path=None):
+        """Считает цены для CSV/Excel файла автопарка и сохраняет результат рядом"""
+        import pandas as pd
         
-        # Спецтехника
-        elif any(word in vehicle_type for word in ['трактор']):
-            return 'G1'
-        elif any(word in vehicle_type for word in ['экскаватор', 'бульдозер', 'кран']):
-            return 'H2'
+        name, ext = os.path.splitext(input_path)
+        if ext.lower() in ('.xlsx', '.xls'):
+            df = pd.read_excel(input_path)
+        else:
+            df = pd.read_csv(input_path)
         
-        # Прицепы
-        elif any(word in vehicle_type for word in ['прицеп']):
-            return 'F'  # легковой прицеп по умолчанию
+        result = self.quote_dataframe(df)
         
-        return 'B2'  # легковой по умолчанию
+        output_path = output_path or f"{name}_quoted{ext}"
+        if output_path.lower().endswith(('.xlsx', '.xls')):
+            result.to_excel(output_path, index=False)
+        else:
+            result.to_csv(output_path, index=False)
+        return output_path
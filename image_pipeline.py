@@ -0,0 +1,278 @@
+import os
+import io
+import json
+import base64
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+# Длинная сторона после уменьшения: текст техпаспорта читается и при 1600 px
+IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', '1600'))
+IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', '80'))
+IMAGE_CONCURRENCY = int(os.getenv('IMAGE_CONCURRENCY', '4'))
+# Bot API отдает через getFile файлы до 20 МБ
+IMAGE_MAX_DOWNLOAD = int(os.getenv('IMAGE_MAX_DOWNLOAD', str(20 * 1024 * 1024)))
+# Кусок base64-кодирования, кратный 3 байтам
+BASE64_CHUNK = 3 * 64 * 1024
+
+DOCUMENT_FIELDS = ('brand', 'model', 'year', 'engine_volume')
+
+DOCUMENT_PROMPT = (
+    "На фото документ на транспортное средство (техпаспорт или свидетельство о регистрации). "
+    "Верни только JSON с полями brand, model, year, engine_volume (объем в см³ числом). "
+    "Если поле не видно — null."
+)
+
+
+def detect_media_type(image_bytes: Union[bytes, memoryview]) -> str:
+    if image_bytes[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+
+def content_hash(image_bytes: Union[bytes, memoryview]) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def encode_base64(data: Union[bytes, memoryview]) -> str:
+    """base64 по кускам в заранее выделенный буфер, без промежуточных копий входа"""
+    view = memoryview(data)
+    encoded = bytearray(4 * ((len(view) + 2) // 3))
+    position = 0
+    for start in range(0, len(view), BASE64_CHUNK):
+        chunk = base64.b64encode(view[start:start + BASE64_CHUNK])
+        encoded[position:position + len(chunk)] = chunk
+        position += len(chunk)
+    return encoded.decode('ascii')
+
+
+async def read_stream(chunks: AsyncIterator[bytes],
+                      max_bytes: int = IMAGE_MAX_DOWNLOAD) -> Tuple[str, io.BytesIO]:
+    """Читает поток в один буфер, по пути считая sha256; возвращает хэш и буфер"""
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    try:
+        async for chunk in chunks:
+            view = memoryview(chunk)
+            digest.update(view)
+            buffer.write(view)
+            if buffer.tell() > max_bytes:
+                raise ValueError(f"файл больше {max_bytes} байт")
+    finally:
+        # Закрываем генератор сразу, чтобы освободить соединение при обрыве
+        aclose = getattr(chunks, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+    return digest.hexdigest(), buffer
+
+
+def prepare_image(image: Union[bytes, io.BytesIO], max_side: int = IMAGE_MAX_SIDE,
+                  quality: int = IMAGE_JPEG_QUALITY) -> Tuple[Union[bytes, memoryview], str]:
+    """Уменьшает и пережимает фото в JPEG; без Pillow возвращает исходные байты
+
+    Принимает байты или буфер из read_stream. JPEG декодируется сразу в
+    уменьшенном масштабе (draft), поэтому полноразмерная картинка в памяти
+    не разворачивается.
+    """
+    if isinstance(image, io.BytesIO):
+        source, image_bytes = image, image.getbuffer()
+        source.seek(0)
+    else:
+        source, image_bytes = io.BytesIO(image), image
+
+    try:
+        from PIL import Image
+    except ImportError:
+        return image_bytes, detect_media_type(image_bytes)
+
+    try:
+        with Image.open(source) as image:
+            # draft ограничивает масштаб декодирования JPEG так, чтобы обе стороны
+            # остались не меньше целевых; целевой размер считаем по длинной стороне
+            ratio = min(1.0, max_side / max(image.size))
+            image.draft('RGB', (int(image.width * ratio) + 1, int(image.height * ratio) + 1))
+            image.thumbnail((max_side, max_side))
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            output = io.BytesIO()
+            image.save(output, 'JPEG', quality=quality, optimize=True)
+    except Exception as e:
+        print(f"Не удалось пережать изображение: {e}")
+        return image_bytes, detect_media_type(image_bytes)
+
+    prepared = output.getvalue()
+    # Маленькое исходное фото может оказаться меньше пережатого
+    if len(prepared) >= len(image_bytes):
+        return image_bytes, detect_media_type(image_bytes)
+    return prepared, 'image/jpeg'
+
+
+class DocumentExtractor(ABC):
+    """Бэкенд распознавания: по картинке в base64 возвращает поля документа"""
+
+    @abstractmethod
+    async def extract(self, image_b64: str, media_type: str) -> Dict[str, Any]:
+        """Поля DOCUMENT_FIELDS; ошибку распознавания — в поле error"""
+
+
+class StubExtractor(DocumentExtractor):
+    """Локальная заглушка: отдает заданные поля без обращения к API"""
+
+    def __init__(self, fields: Optional[Dict[str, Any]] = None, latency: float = 0.0,
+                 bytes_per_second: float = 0.0):
+        self.fields = fields or {}
+        self.latency = latency
+        # Имитация загрузки: время растет вместе с размером запроса
+        self.bytes_per_second = bytes_per_second
+        self.calls = 0
+
+    async def extract(self, image_b64: str, media_type: str) -> Dict[str, Any]:
+        self.calls += 1
+        delay = self.latency
+        if self.bytes_per_second:
+            delay += len(image_b64) / self.bytes_per_second
+        if delay:
+            await asyncio.sleep(delay)
+        return dict(self.fields)
+
+
+class RemoteExtractor(DocumentExtractor):
+    """Распознавание через Anthropic API (клиент AsyncAnthropic)"""
+
+    def __init__(self, client=None, model: Optional[str] = None, max_tokens: int = 300):
+        if client is None:
+            from anthropic import AsyncAnthropic
+            client = AsyncAnthropic()
+        self.client = client
+        self.model = model or os.getenv('ANTHROPIC_MODEL', 'claude-3-5-sonnet-latest')
+        self.max_tokens = max_tokens
+
+    async def extract(self, image_b64: str, media_type: str) -> Dict[str, Any]:
+        message = await self.client.messages.create(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            messages=[{'role': 'user', 'content': [
+                {'type': 'image', 'source': {'type': 'base64', 'media_type': media_type, 'data': image_b64}},
+                {'type': 'text', 'text': DOCUMENT_PROMPT},
+            ]}]
+        )
+        text = ''.join(block.text for block in message.content if getattr(block, 'type', '') == 'text')
+        start, end = text.find('{'), text.rfind('}')
+        if start < 0 or end < start:
+            return {'error': 'ответ без JSON'}
+        return json.loads(text[start:end + 1])
+
+
+def merge_fields(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Сводит поля с нескольких фото: побеждает самое частое значение, при равенстве — первое"""
+    merged = {}
+    for field in DOCUMENT_FIELDS:
+        values = [r.get(field) for r in results if r.get(field) not in (None, '')]
+        if values:
+            counts = Counter(str(value) for value in values)
+            best = max(counts.values())
+            merged[field] = next(value for value in values if counts[str(value)] == best)
+        else:
+            merged[field] = None
+    merged['images'] = len(results)
+    errors = [r['error'] for r in results if r.get('error')]
+    if errors:
+        merged['errors'] = errors
+    return merged
+
+
+class ImagePipeline:
+    """Подготовка фото в пуле и параллельное распознавание с ограничением одновременных запросов
+
+    Уменьшение и JPEG-сжатие выполняются в executor (по умолчанию пул потоков:
+    Pillow отпускает GIL при декодировании и масштабировании), чтобы не
+    блокировать цикл событий. Для процессного пула передайте ProcessPoolExecutor.
+    """
+
+    def __init__(self, extractor: DocumentExtractor, concurrency: int = IMAGE_CONCURRENCY,
+                 max_side: int = IMAGE_MAX_SIDE, quality: int = IMAGE_JPEG_QUALITY,
+                 executor: Optional[Executor] = None, cache=None):
+        self.extractor = extractor
+        # recognition_cache.RecognitionCache: повторно присланное фото не распознается заново
+        self.cache = cache
+        self.concurrency = concurrency
+        self.max_side = max_side
+        self.quality = quality
+        # Декодирование упирается в CPU: больше потоков, чем ядер, только умножает
+        # число одновременно развернутых картинок в памяти
+        self.executor = executor or ThreadPoolExecutor(max_workers=min(concurrency, os.cpu_count() or 1),
+                                                       thread_name_prefix='image-prepare')
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._semaphore = None
+        self._loop = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def analyze(self, image_bytes: bytes) -> Dict[str, Any]:
+        """Распознает одно фото"""
+        key = None
+        if self.cache is not None:
+            loop = asyncio.get_running_loop()
+            key = await loop.run_in_executor(self.executor, content_hash, image_bytes)
+        return await self._analyze(image_bytes, len(image_bytes), key)
+
+    async def analyze_stream(self, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """Распознает фото из потока байтов (TelegramClient.download_file)
+
+        Поток хэшируется по ходу чтения и складывается в один буфер; до
+        распознавания доходит только уменьшенная копия.
+        """
+        try:
+            key, buffer = await read_stream(chunks)
+        except Exception as e:
+            print(f"Ошибка загрузки фото: {e}")
+            return {'error': str(e)}
+        return await self._analyze(buffer, buffer.tell(), key if self.cache is not None else None)
+
+    async def _analyze(self, image: Union[bytes, io.BytesIO], size: int, key: Optional[str]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        if key is not None:
+            cached = await loop.run_in_executor(self.executor, self.cache.lookup, key)
+            if cached is not None:
+                return cached
+
+        async with self._get_semaphore():
+            prepared, media_type = await loop.run_in_executor(
+                self.executor, prepare_image, image, self.max_side, self.quality
+            )
+            image_b64 = encode_base64(prepared)
+            if isinstance(prepared, memoryview):
+                prepared.release()
+            if isinstance(image, io.BytesIO):
+                # Исходный файл больше не нужен: освобождаем буфер до ожидания ответа API
+                image.close()
+            self.bytes_in += size
+            self.bytes_out += len(image_b64)
+            try:
+                result = await self.extractor.extract(image_b64, media_type)
+            except Exception as e:
+                print(f"Ошибка распознавания: {e}")
+                return {'error': str(e)}
+
+        if key is not None:
+            await loop.run_in_executor(self.executor, self.cache.store, key, result)
+        return result
+
+    async def analyze_many(self, images: List[bytes]) -> Dict[str, Any]:
+        """Распознает несколько фото одного документа и сводит поля"""
+        results = await asyncio.gather(*(self.analyze(image) for image in images))
+        return merge_fields(list(results))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
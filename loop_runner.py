@@ -0,0 +1,105 @@
+import atexit
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, List, Optional
+
+
+class LoopRunner:
+    """Один цикл событий на всё время жизни теплого воркера
+
+    Цикл крутится в фоновом потоке, поэтому пул соединений, кэши и фоновые
+    задачи переживают отдельные вызовы webhook.
+    """
+
+    def __init__(self, shutdown_timeout: float = 5.0):
+        self.shutdown_timeout = shutdown_timeout
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._shutdown_callbacks: List[Callable[[], Awaitable[Any]]] = []
+        self._before_drain_callbacks: List[Callable[[], Awaitable[Any]]] = []
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Запускает цикл при первом обращении и возвращает его"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(target=self._run_forever, args=(loop,),
+                                              name='loop-runner', daemon=True)
+                    thread.start()
+                    self._thread = thread
+                    self._loop = loop
+        return self._loop
+
+    @staticmethod
+    def _run_forever(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def submit(self, coro: Awaitable[Any]):
+        """Планирует корутину на общем цикле, возвращает concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Выполняет корутину на общем цикле и ждет результат"""
+        return self.submit(coro).result(timeout)
+
+    def add_shutdown_callback(self, callback: Callable[[], Awaitable[Any]], before_drain: bool = False):
+        """Регистрирует корутину-функцию, вызываемую при остановке
+
+        Обычные обработчики (закрытие сессии) выполняются после того, как
+        завершились задачи в полете. before_drain=True — для владельцев
+        бесконечных фоновых задач (воркеры очереди): они должны сами
+        остановиться до ожидания остальных задач.
+        """
+        if before_drain:
+            self._before_drain_callbacks.append(callback)
+        else:
+            self._shutdown_callbacks.append(callback)
+
+    @staticmethod
+    async def _run_callbacks(callbacks: List[Callable[[], Awaitable[Any]]]):
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                print(f"Ошибка при остановке: {e}")
+
+    async def _drain(self):
+        """Дожидается незавершенных задач и выполняет обработчики остановки"""
+        await self._run_callbacks(self._before_drain_callbacks)
+
+        current = asyncio.current_task()
+        pending = [task for task in asyncio.all_tasks() if task is not current]
+        if pending:
+            await asyncio.wait(pending, timeout=self.shutdown_timeout)
+
+        await self._run_callbacks(self._shutdown_callbacks)
+
+    def shutdown(self):
+        """Дает завершиться отправкам в полете и останавливает цикл"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+
+        if loop is None:
+            return
+
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._drain(), loop)
+            future.result(self.shutdown_timeout + 1)
+        except Exception as e:
+            print(f"Ошибка при остановке цикла: {e}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(self.shutdown_timeout)
+            if not thread.is_alive():
+                loop.close()
+
+
+# Общий цикл процесса
+loop_runner = LoopRunner()
+atexit.register(loop_runner.shutdown)
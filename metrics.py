@@ -0,0 +1,293 @@
+"""Метрики горячего пути: гистограммы времени, счетчики и текст для Prometheus
+
+Только stdlib и без блокировок: инкремент под GIL стоит десятки наносекунд,
+а редкая потеря одного инкремента при гонке потоков для метрик не важна.
+cProfile импортируется, только если включена выборка PROFILE_SAMPLE_RATE.
+"""
+import os
+import sys
+import time
+import random
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Границы корзин в секундах: от 50 мкс (разбор из кэша) до 10 с (повторы Telegram)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_PATH = os.getenv('PROFILE_PATH', '/tmp/bot.prof')
+# Сохранять накопленный профиль раз в столько выборок
+PROFILE_DUMP_EVERY = int(os.getenv('PROFILE_DUMP_EVERY', '100'))
+
+
+def _labels_text(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Монотонный счетчик с необязательными метками"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self.values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels_text(self.labelnames, labels)} {value:g}"
+                for labels, value in sorted(self.values.items())]
+
+
+class Histogram:
+    """Гистограмма длительностей с фиксированными корзинами"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # метки -> [счетчики корзин..., +Inf], сумма
+        self.counts: Dict[Tuple[str, ...], List[int]] = {}
+        self.sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self.counts.get(labels)
+        if counts is None:
+            counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+            self.sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def time(self, *labels: str) -> '_Timer':
+        """with histogram.time('parse'): ... — замер по монотонным часам"""
+        return _Timer(self, labels)
+
+    def count(self, *labels: str) -> int:
+        return sum(self.counts.get(labels, ()))
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, counts in sorted(self.counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                bucket_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_labels_text(self.labelnames, labels, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labelnames, labels)} {self.sums[labels]:.6f}")
+            lines.append(f"{self.name}_count{_labels_text(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    # Класс вместо @contextmanager: без генератора замер вдвое дешевле
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class Gauge:
+    """Значение, которое считывается функцией в момент выдачи метрик (размер очереди, hit rate)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, read: Callable[[], Optional[float]]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception:
+            value = None
+        return [] if value is None else [f"{self.name} {value:g}"]
+
+
+class Info:
+    """Строковые значения (версия тарифов) метками gauge со значением 1"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...],
+                 read: Callable[[], Optional[Tuple[str, ...]]]):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.read = read
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.read()
+        except Exception:
+            values = None
+        return [] if values is None else [f"{self.name}{_labels_text(self.labelnames, values)} 1"]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        # Повторная регистрация (второй экземпляр бота) возвращает существующую метрику
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], Optional[float]]) -> Gauge:
+        gauge = Gauge(name, help, read)
+        self.metrics[name] = gauge
+        return gauge
+
+    def info(self, name: str, help: str, labelnames: Tuple[str, ...],
+             read: Callable[[], Optional[Tuple[str, ...]]]) -> Info:
+        info = Info(name, help, labelnames, read)
+        self.metrics[name] = info
+        return info
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus 0.0.4"""
+        lines = []
+        for metric in self.metrics.values():
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
+
+# Этапы обработки обновления: dedup, parse, context, tariff, format, send, total
+stage_seconds = registry.histogram('bot_stage_seconds', 'Время этапа обработки update', ('stage',))
+telegram_seconds = registry.histogram('telegram_request_seconds', 'Время вызова Bot API с повторами', ('method',))
+updates_total = registry.counter('bot_updates_total', 'Обработанные update по типу ответа', ('kind',))
+parse_misses_total = registry.counter('bot_parse_misses_total', 'Сообщения без марки и объема')
+unknown_brands_total = registry.counter('bot_unknown_brands_total', 'Объем найден, марка не распознана')
+errors_total = registry.counter('bot_errors_total', 'Ошибки по этапам', ('stage',))
+telegram_retries_total = registry.counter('telegram_retries_total', 'Повторы вызовов Bot API', ('method',))
+tariff_reloads_total = registry.counter('tariff_reloads_total', 'Перезагрузки тарифов с диска', ('result',))
+duplicate_updates_total = registry.counter('bot_duplicate_updates_total', 'Отброшенные повторы webhook')
+quotes_total = registry.counter('bot_quotes_total', 'Расчеты по версиям тарифов', ('tariff_version',))
+
+
+def cache_hit_rate(get_cache: Callable[[], Optional[object]]) -> Callable[[], Optional[float]]:
+    """Функция для Gauge: hit rate кэша или None, пока модуль с кэшем не загружен"""
+    def read():
+        cache = get_cache()
+        return None if cache is None else cache.stats()['hit_rate']
+    return read
+
+
+def _loaded(module: str, attr: str):
+    """Объект из уже загруженного модуля; ради метрик модуль не импортируется"""
+    return getattr(sys.modules.get(module), attr, None)
+
+
+registry.gauge('parse_cache_hit_rate', 'Доля разборов текста из кэша',
+               cache_hit_rate(lambda: getattr(_loaded('text_parser', 'vehicle_parser'), 'cache', None)))
+registry.gauge('quote_cache_hit_rate', 'Доля готовых текстов расчета из кэша',
+               cache_hit_rate(lambda: getattr(_loaded('quotes', 'quote_formatter'), 'cache', None)))
+
+# Боты, которые обслуживают трафик процесса (bot.simple_bot, api.webhook.webhook_handler).
+# Gauge читают всех сразу: второй загруженный модуль не подменяет метрики первого
+serving_bots = []
+
+
+def register_bot(bot):
+    """Добавляет бота в метрики очереди ответов и допуска"""
+    if bot not in serving_bots:
+        serving_bots.append(bot)
+
+
+registry.gauge('bot_reply_queue_size', 'Ответы в очереди на отправку',
+               lambda: sum(bot.reply_queue.qsize() for bot in serving_bots))
+registry.gauge('bot_admission_chats', 'Чаты с состоянием допуска',
+               lambda: sum(len(bot.admission) for bot in serving_bots))
+registry.gauge('bot_outbound_backlog_seconds', 'Ожидание места в общем лимите исходящих',
+               lambda: max((bot.admission.outbound.backlog() for bot in serving_bots), default=0))
+
+
+class _Profiler:
+    """Выборочный cProfile: профилирует долю PROFILE_SAMPLE_RATE вызовов и копит статистику"""
+
+    def __init__(self, rate: float = PROFILE_SAMPLE_RATE, path: str = PROFILE_PATH,
+                 dump_every: int = PROFILE_DUMP_EVERY):
+        self.rate = rate
+        self.path = path
+        self.dump_every = dump_every
+        self.samples = 0
+        self._stats = None
+        self._active = False
+
+    @contextmanager
+    def sample(self):
+        # Профиль одного потока не вкладывается; во время выборки остальные вызовы идут без него
+        if not self.rate or self._active or random.random() >= self.rate:
+            yield
+            return
+
+        import cProfile
+        import pstats
+
+        self._active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._active = False
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.samples += 1
+            if self.samples % self.dump_every == 0:
+                self.dump()
+
+    def dump(self):
+        """Сохраняет накопленный профиль: python -m pstats $PROFILE_PATH"""
+        if self._stats is not None:
+            try:
+                self._stats.dump_stats(self.path)
+            except OSError as e:
+                print(f"Не удалось сохранить профиль: {e}")
+
+
+profiler = _Profiler()
@@ -1,96 +1,66 @@
 import base64
-import re
 import json
 import os
 from typing import Optional, Dict, Any
 
+from text_parser import vehicle_parser
+from context_store import ChatContext
+
 # Временно закомментируем Anthropic до решения проблем с версией
 # from anthropic import Anthropic
 
 class ClaudeProcessor:
-    def __init__(self):
+    def __init__(self, context_store=None, extractor=None, recognition_cache=None):
         # Временно отключаем Claude API
         self.client = None
-        print("Claude API временно отключен - используем только текстовый парсинг")
-        
-        # Известные марки автомобилей для валидации
-        self.car_brands = [
-            'BMW', 'MERCEDES', 'AUDI', 'VOLKSWAGEN', 'TOYOTA', 'HONDA', 'NISSAN',
-            'HYUNDAI', 'KIA', 'FORD', 'CHEVROLET', 'OPEL', 'PEUGEOT', 'RENAULT',
-            'CITROEN', 'FIAT', 'SKODA', 'SEAT', 'MAZDA', 'SUBARU', 'MITSUBISHI',
-            'LEXUS', 'INFINITI', 'ACURA', 'VOLVO', 'SAAB', 'JAGUAR', 'LAND ROVER',
-            'PORSCHE', 'MINI', 'ALFA ROMEO', 'LADA', 'VAZ', 'GAZ', 'UAZ', 'ZAZ',
-            'DAEWOO', 'SUZUKI', 'ISUZU', 'DACIA', 'LANCIA', 'CHERY', 'GEELY'
-        ]
+        # Хранилище данных, накопленных по чатам (context_store.create_context_store())
+        self.context_store = context_store
+        # Распознавание фото включается передачей бэкенда (image_pipeline.StubExtractor/RemoteExtractor)
+        self.pipeline = None
+        if extractor is not None:
+            from image_pipeline import ImagePipeline
+            if recognition_cache is None:
+                from recognition_cache import create_recognition_cache
+                recognition_cache = create_recognition_cache()
+            self.pipeline = ImagePipeline(extractor, cache=recognition_cache)
+            if recognition_cache is not None:
+                from metrics import registry, cache_hit_rate
+                registry.gauge('recognition_cache_hit_rate', 'Доля фото, распознанных из кэша',
+                               cache_hit_rate(lambda: recognition_cache))
+        else:
+            print("Claude API временно отключен - используем только текстовый парсинг")
     
     def encode_image(self, image_bytes: bytes) -> str:
         """Кодирует изображение в base64"""
         return base64.b64encode(image_bytes).decode('utf-8')
     
     async def analyze_document(self, image_bytes: bytes) -> Dict[str, Any]:
-        """Временно отключен анализ фото - используем только текст"""
+        """Распознает одно фото документа; без бэкенда просит ввести данные текстом"""
+        if self.pipeline is not None:
+            return await self.pipeline.analyze_many([image_bytes])
         return {
             "error": "Анализ фото временно недоступен. Пожалуйста, введите данные текстом: 'BMW X3 1998 см³'"
         }
     
+    async def analyze_document_stream(self, chunks) -> Dict[str, Any]:
+        """Распознает фото из потока, например telegram.download_file(file_id)"""
+        if self.pipeline is not None:
+            from image_pipeline import merge_fields
+            return merge_fields([await self.pipeline.analyze_stream(chunks)])
+        return await self.analyze_document(b'')
+    
     async def analyze_multiple_images(self, images: list) -> Dict[str, Any]:
-        """Анализ нескольких изображений - временно отключен"""
+        """Распознает несколько фото параллельно и сводит поля в один результат"""
+        if self.pipeline is not None:
+            return await self.pipeline.analyze_many(images)
         return {
             "error": "Анализ фото временно недоступен. Введите данные текстом: 'марка модель объем_двигателя'"
         }
     
     def parse_text_input(self, text: str) -> Dict[str, Any]:
         """Парсит текстовый ввод пользователя"""
-        text = text.upper().strip()
-        result = {
-            "brand": None,
-            "model": None,
-            "year": None,
-            "engine_volume": None,
-            "source": "text_input"
-        }
-        
-        # Поиск объема двигателя
-        volume_patterns = [
-            r'(\d{3,4})\s*(?:СМ|CM|КУБОВ|КУБ)',  # 1998 см³, 2000 кубов
-            r'(\d{1,2})[.,](\d{3})\s*(?:Л|L)',    # 1.998 л, 2,000 л
-            r'(\d{3,4})\s*(?:СС|CC)',             # 1998 сс
-            r'(\d{3,4})(?=\s|$)'                  # просто цифры 1998
-        ]
-        
-        for pattern in volume_patterns:
-            match = re.search(pattern, text)
-            if match:
-                if len(match.groups()) == 2:  # для паттерна с точкой
-                    volume = match.group(1) + match.group(2)
-                else:
-                    volume = match.group(1)
-                
-                # Проверяем, что это разумный объем двигателя
-                if 500 <= int(volume) <= 8000:
-                    result["engine_volume"] = volume
-                    break
-        
-        # Поиск марки автомобиля
-        for brand in self.car_brands:
-            if brand in text:
-                result["brand"] = brand
-                # Ищем модель после марки
-                brand_index = text.find(brand)
-                text_after_brand = text[brand_index + len(brand):].strip()
-                model_match = re.search(r'^[А-ЯA-Z0-9\-]+', text_after_brand)
-                if model_match:
-                    potential_model = model_match.group()
-                    # Исключаем года и объемы
-                    if not re.match(r'^\d{3,4}$', potential_model):
-                        result["model"] = potential_model
-                break
-        
-        # Поиск года
-        year_match = re.search(r'\b(19[8-9]\d|20[0-2]\d)\b', text)
-        if year_match:
-            result["year"] = year_match.group(1)
-        
+        result = vehicle_parser.parse(text)
+        result["source"] = "text_input"
         return result
     
     def extract_missing_data(self, current_data: Dict[str, Any], user_message: str) -> Dict[str, Any]:
@@ -103,3 +73,14 @@ class ClaudeProcessor:
                 current_data[key] = value
         
         return current_data
+    
+    def extract_for_chat(self, chat_id, user_message: str) -> Dict[str, Any]:
+        """extract_missing_data с сохранением накопленных данных чата между вызовами"""
+        context = self.context_store.get(chat_id) if self.context_store is not None else None
+        current_data = context.to_dict() if context is not None else {}
+        
+        current_data = self.extract_missing_data(current_data, user_message)
+        
+        if self.context_store is not None:
+            self.context_store.set(chat_id, ChatContext.from_dict(current_data))
+        return current_data
@@ -0,0 +1,145 @@
+import os
+import signal
+import asyncio
+from typing import Any, Dict, Optional
+
+POLL_TIMEOUT = int(os.getenv('POLL_TIMEOUT', '30'))
+POLL_LIMIT = int(os.getenv('POLL_LIMIT', '100'))
+POLL_CONCURRENCY = int(os.getenv('POLL_CONCURRENCY', '20'))
+
+
+class PollingRunner:
+    """Long polling для развертываний вне Vercel
+
+    Обновления забираются пачками через getUpdates и обрабатываются
+    параллельно (не больше concurrency одновременно), но сообщения одного чата
+    идут строго по очереди: от порядка зависит контекст диалога. Пока в
+    работе больше max_pending обновлений, новые не запрашиваются.
+    """
+
+    def __init__(self, bot, concurrency: int = POLL_CONCURRENCY, limit: int = POLL_LIMIT,
+                 poll_timeout: int = POLL_TIMEOUT, max_pending: Optional[int] = None,
+                 error_delay: float = 1.0):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.limit = limit
+        self.poll_timeout = poll_timeout
+        self.max_pending = max_pending or max(limit, concurrency * 4)
+        self.error_delay = error_delay
+        self.offset = None
+        self.processed = 0
+        self._semaphore = None
+        # chat_id -> последняя задача чата; следующая задача ждет её завершения
+        self._chat_tails: Dict[Any, asyncio.Task] = {}
+        self._pending = set()
+        self._has_room = None
+        self._stopping = False
+        self._fetch = None
+
+    @staticmethod
+    def chat_of(update: Dict[str, Any]):
+        message = update.get('message') or {}
+        return (message.get('chat') or {}).get('id')
+
+    async def _process(self, update: Dict[str, Any], previous: Optional[asyncio.Task]):
+        if previous is not None:
+            # Ждем предыдущее сообщение чата, не занимая слот семафора
+            await asyncio.wait([previous])
+        async with self._semaphore:
+            await self.bot.process_update(update)
+        self.processed += 1
+
+    def _schedule(self, update: Dict[str, Any]):
+        chat_id = self.chat_of(update)
+        previous = self._chat_tails.get(chat_id) if chat_id is not None else None
+        task = asyncio.ensure_future(self._process(update, previous))
+        self._pending.add(task)
+        if chat_id is not None:
+            self._chat_tails[chat_id] = task
+        task.add_done_callback(lambda done: self._on_done(done, chat_id))
+
+    def _on_done(self, task: asyncio.Task, chat_id):
+        self._pending.discard(task)
+        if self._chat_tails.get(chat_id) is task:
+            del self._chat_tails[chat_id]
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Ошибка обработки: {task.exception()}")
+        if len(self._pending) < self.max_pending:
+            self._has_room.set()
+
+    async def _wait_for_room(self):
+        while len(self._pending) >= self.max_pending:
+            self._has_room.clear()
+            await self._has_room.wait()
+
+    async def run(self):
+        """Забирает и обрабатывает обновления до вызова stop()"""
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._has_room = asyncio.Event()
+        self._stopping = False
+
+        while not self._stopping:
+            await self._wait_for_room()
+            self._fetch = asyncio.ensure_future(self.bot.telegram.get_updates(
+                self.offset, min(self.limit, self.max_pending - len(self._pending)), self.poll_timeout
+            ))
+            try:
+                updates = await self._fetch
+            except asyncio.CancelledError:
+                if self._stopping:
+                    break
+                raise
+            except Exception as e:
+                print(f"Ошибка получения обновлений: {e}")
+                await asyncio.sleep(self.error_delay)
+                continue
+            finally:
+                self._fetch = None
+
+            for update in updates:
+                self._schedule(update)
+                # Следующий getUpdates с этим offset подтвердит пачку в Telegram
+                self.offset = update['update_id'] + 1
+
+        await self._drain()
+
+    def stop(self):
+        """Перестает запрашивать обновления; начатые будут дообработаны"""
+        self._stopping = True
+        if self._fetch is not None:
+            self._fetch.cancel()
+
+    async def _drain(self):
+        if self._pending:
+            await asyncio.wait(set(self._pending))
+        if self.offset is not None:
+            # Подтверждаем обработанное, чтобы после перезапуска оно не пришло снова
+            try:
+                await self.bot.telegram.get_updates(self.offset, limit=1, timeout=0)
+            except Exception as e:
+                print(f"Не удалось подтвердить обновления: {e}")
+
+
+async def run_polling(bot, **kwargs):
+    """Запускает long polling до SIGINT/SIGTERM и корректно останавливается"""
+    runner = PollingRunner(bot, **kwargs)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, runner.stop)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    await bot.telegram.delete_webhook()
+    try:
+        await runner.run()
+    finally:
+        await bot.reply_queue.close()
+        await bot.telegram.close()
+    return runner
+
+
+if __name__ == '__main__':
+    from bot import simple_bot
+
+    asyncio.run(run_polling(simple_bot))
@@ -0,0 +1,232 @@
+"""Полная премия ОСЦПВ: базовый тариф × зона × бонус-малус × срок × сфера использования
+
+Все произведения коэффициентов считаются при загрузке в плотную таблицу
+копеек (array('i')): расчет одной премии — два обращения к словарям
+смещений, (категория, зона, возраст) и (бонус-малус, срок, сфера), и одно
+чтение, без float. Коэффициенты хранятся в десятитысячных долях,
+поэтому округление до копейки делается целочисленно и одинаково на любой машине.
+"""
+import re
+from array import array
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from tariff_engine import TARIFF_ROWS, AGE_NO_LIMIT, AGE_CLASSES, DEFAULT_ZONE
+from tariff_snapshot import TARIFFS_SNAPSHOT, SnapshotError, load_snapshot
+
+# Класс бонус-малус -> коэффициент; новый водитель получает класс 3 (коэффициент 1)
+BONUS_MALUS = (
+    ('M', 2.45), ('0', 2.3), ('1', 1.55), ('2', 1.4), ('3', 1.0), ('4', 0.95), ('5', 0.9),
+    ('6', 0.85), ('7', 0.8), ('8', 0.75), ('9', 0.7), ('10', 0.65), ('11', 0.6), ('12', 0.55), ('13', 0.5),
+)
+DEFAULT_BONUS_MALUS = '3'
+
+# Срок договора в месяцах (15 дней — 0.5); без снимка доступен только год
+DEFAULT_TERMS = (('1 рік', 1),)
+DEFAULT_TERM_MONTHS = 12
+
+USAGES = ('personal', 'taxi', 'courier')
+DEFAULT_USAGE = 'personal'
+
+# Коэффициенты — целые в десятитысячных: 0.15 -> 1500
+COEFFICIENT_SCALE = 10000
+
+TERM_PATTERN = re.compile(r'(\d+)\s*(дн|міс|рік|рок)')
+USAGE_CATEGORY = str.maketrans('АВСДЕ', 'ABCDE')
+
+
+def _scaled(coefficient: float) -> int:
+    return round(coefficient * COEFFICIENT_SCALE)
+
+
+def term_months(label: str) -> float:
+    """'15 днів**' -> 0.5, '3 місяці' -> 3, '1 рік' -> 12"""
+    match = TERM_PATTERN.search(label.lower())
+    if match is None:
+        raise ValueError(f"Не удалось разобрать срок договора: {label}")
+    number, unit = int(match.group(1)), match.group(2)
+    if unit == 'дн':
+        return number / 30
+    return number * 12 if unit in ('рік', 'рок') else number
+
+
+def usage_coefficients(rows: Iterable[Sequence[Any]], categories: Sequence[str]) -> Dict[str, Tuple[int, ...]]:
+    """Коэффициенты сферы использования по категориям из строк таблицы
+
+    Строка 'ні' — обычное использование, 'так для категорії В' — такси для
+    категорий B*, 'кур"єрські' — курьерские для всех. Такси для категорий,
+    о которых таблица молчит, считается как обычное использование.
+    """
+    personal, courier = 1.0, None
+    taxi = []
+    for label, coefficient in rows:
+        text = label.lower()
+        if '"так"' in text:
+            prefix = text.split('категорії')[-1].strip().upper().translate(USAGE_CATEGORY)
+            taxi.append((prefix, coefficient))
+        elif 'кур' in text and 'таксі' not in text:
+            courier = coefficient
+        else:
+            personal = coefficient
+
+    result = {}
+    for code in categories:
+        taxi_coefficient = next((value for prefix, value in taxi if code.startswith(prefix)), personal)
+        result[code] = (_scaled(personal), _scaled(taxi_coefficient),
+                        _scaled(personal if courier is None else courier))
+    return result
+
+
+class PremiumEngine:
+    """Плотная таблица премий в копейках по всем сочетаниям факторов
+
+    Порядок измерений: категория, зона, класс возраста, бонус-малус, срок,
+    сфера использования. Смещение — сумма индексов, умноженных на strides.
+    """
+
+    DIMENSIONS = ('category', 'zone', 'age', 'bonus_malus', 'term', 'usage')
+
+    def __init__(self, categories: Sequence[str], zones: Sequence[str],
+                 prices: Sequence[Sequence[Sequence[int]]],
+                 terms: Sequence[Sequence[Any]] = DEFAULT_TERMS,
+                 usage: Optional[Dict[str, Tuple[int, ...]]] = None,
+                 version: str = 'builtin'):
+        """prices[категория][зона] = (цена 30+, цена без ограничений) в гривнах"""
+        self.version = version
+        self.categories = tuple(categories)
+        self.zones = tuple(zones)
+        self.bonus_malus = tuple(code for code, _ in BONUS_MALUS)
+        self.terms = tuple(term_months(label) for label, _ in terms)
+        self.usages = USAGES
+
+        self.positions = {
+            'category': {code: i for i, code in enumerate(self.categories)},
+            'zone': {zone: i for i, zone in enumerate(self.zones)},
+            'bonus_malus': {code: i for i, code in enumerate(self.bonus_malus)},
+            'term': {months: i for i, months in enumerate(self.terms)},
+            'usage': {name: i for i, name in enumerate(self.usages)},
+        }
+
+        shape = (len(self.categories), len(self.zones), len(AGE_CLASSES),
+                 len(self.bonus_malus), len(self.terms), len(self.usages))
+        strides = [1] * len(shape)
+        for i in range(len(shape) - 2, -1, -1):
+            strides[i] = strides[i + 1] * shape[i + 1]
+        self.shape = shape
+        self.strides = tuple(strides)
+
+        # Значение фактора -> готовое слагаемое смещения (индекс × stride)
+        self._category, self._zone, self._bonus_malus, self._term, self._usage = (
+            {key: i * strides[axis] for key, i in positions.items()}
+            for axis, positions in zip((0, 1, 3, 4, 5), self.positions.values())
+        )
+        self._no_limit = AGE_NO_LIMIT * strides[2]
+        # Числовые классы бонус-малус принимаются и числом: 5 и '5'
+        self._bonus_malus.update({int(code): value for code, value in self._bonus_malus.items() if code.isdigit()})
+
+        # Для одиночного расчета слагаемые сложены заранее по тройкам факторов: два словаря вместо шести
+        self._base = {
+            (category, zone, over_30): c + z + (0 if over_30 else self._no_limit)
+            for category, c in self._category.items() for zone, z in self._zone.items() for over_30 in (True, False)
+        }
+        self._factors = {
+            (code, months, name): b + t + u
+            for code, b in self._bonus_malus.items() for months, t in self._term.items()
+            for name, u in self._usage.items()
+        }
+
+        if usage is None:
+            usage = {code: (COEFFICIENT_SCALE,) * len(USAGES) for code in self.categories}
+        bonus_malus = [_scaled(value) for _, value in BONUS_MALUS]
+        term_coefficients = [_scaled(value) for _, value in terms]
+
+        # Копейки × три коэффициента в десятитысячных: делим на 10^12 с округлением до копейки
+        scale = COEFFICIENT_SCALE ** 3
+        half = scale // 2
+        self.table = array('i')
+        for c, code in enumerate(self.categories):
+            factors = [bm * term * use for bm in bonus_malus for term in term_coefficients for use in usage[code]]
+            for zone_prices in prices[c]:
+                for price in zone_prices:
+                    base = price * 100
+                    self.table.extend([(base * factor + half) // scale for factor in factors])
+
+    def offset(self, category: str, zone: str = DEFAULT_ZONE, age_over_30: bool = True,
+               bonus_malus: str = DEFAULT_BONUS_MALUS, months: float = DEFAULT_TERM_MONTHS,
+               usage: str = DEFAULT_USAGE) -> Optional[int]:
+        """Смещение премии в таблице или None, если такого сочетания нет"""
+        try:
+            return (self._category[category] + self._zone[zone] + (0 if age_over_30 else self._no_limit)
+                    + self._bonus_malus[bonus_malus] + self._term[months] + self._usage[usage])
+        except KeyError:
+            return None
+
+    def quote(self, category: str, zone: str = DEFAULT_ZONE, age_over_30: bool = True,
+              bonus_malus: str = DEFAULT_BONUS_MALUS, months: float = DEFAULT_TERM_MONTHS,
+              usage: str = DEFAULT_USAGE) -> Optional[int]:
+        """Премия в копейках"""
+        try:
+            return self.table[self._base[category, zone, age_over_30] + self._factors[bonus_malus, months, usage]]
+        except KeyError:
+            return None
+
+    def quote_indices(self, category, zone, age, bonus_malus, term, usage):
+        """Премии в копейках для массивов индексов numpy (или скаляров) одной выборкой
+
+        Индексы — позиции в self.categories, self.zones, AGE_CLASSES и т.д.;
+        массивы одинаковой длины, скаляры растягиваются на всю длину.
+        """
+        import numpy as np
+
+        s = self.strides
+        offsets = (np.asarray(category) * s[0] + np.asarray(zone) * s[1] + np.asarray(age) * s[2]
+                   + np.asarray(bonus_malus) * s[3] + np.asarray(term) * s[4] + np.asarray(usage))
+        return np.frombuffer(self.table, dtype=np.int32)[offsets]
+
+    def quote_many(self, queries: Iterable[Dict[str, Any]]) -> array:
+        """Премии в копейках для последовательности запросов {'category': ..., 'zone': ...}
+
+        Без numpy: смещения считаются по одному, чтение из таблицы — одно на запрос.
+        Неизвестное сочетание дает -1.
+        """
+        table = self.table
+        offset = self.offset
+        result = array('i')
+        for query in queries:
+            i = offset(**query)
+            result.append(-1 if i is None else table[i])
+        return result
+
+
+def format_uah(kopecks: int) -> str:
+    """Сумма для текста: '2527' или '2527.35'"""
+    hryvnias, rest = divmod(kopecks, 100)
+    return str(hryvnias) if not rest else f"{hryvnias}.{rest:02d}"
+
+
+def engine_from_snapshot(snapshot: Dict[str, Any], version: Optional[str] = None) -> PremiumEngine:
+    categories = [item['code'] for item in snapshot['categories']]
+    return PremiumEngine(
+        categories, snapshot['zones'], [item['prices'] for item in snapshot['categories']],
+        terms=snapshot.get('terms') or DEFAULT_TERMS,
+        usage=usage_coefficients(snapshot.get('usage') or (), categories),
+        version=version or snapshot['checksum'][:12],
+    )
+
+
+def builtin_engine() -> PremiumEngine:
+    """Встроенная сетка: одна зона, годовой договор, без коэффициентов сферы использования"""
+    return PremiumEngine([row[0] for row in TARIFF_ROWS], (DEFAULT_ZONE,),
+                         [[row[2:2 + len(AGE_CLASSES)]] for row in TARIFF_ROWS])
+
+
+def load_premium_engine(path: str = TARIFFS_SNAPSHOT) -> PremiumEngine:
+    """Строит таблицу премий из снимка тарифов, при ошибке — из встроенной сетки"""
+    try:
+        return engine_from_snapshot(load_snapshot(path))
+    except (OSError, ValueError, KeyError, SnapshotError) as e:
+        print(f"Снимок тарифов недоступен, премии по встроенной сетке: {e}")
+        return builtin_engine()
+
+
+# Строится один раз при импорте, как tariff_engine
+premium_engine = load_premium_engine()
@@ -0,0 +1,110 @@
+from typing import Dict, Any, NamedTuple, Optional
+
+from lru_cache import LRUCache
+from tariff_engine import DEFAULT_ZONE
+from premium_engine import format_uah, DEFAULT_BONUS_MALUS, DEFAULT_TERM_MONTHS, DEFAULT_USAGE
+from tariff_store import tariff_store, TariffSet
+from metrics import stage_seconds, quotes_total
+
+QUOTE_CACHE_SIZE = 1024
+
+# Необязательные факторы премии в данных расчета и их значения по умолчанию
+PREMIUM_FIELDS = (
+    ('zone', DEFAULT_ZONE), ('bonus_malus', DEFAULT_BONUS_MALUS),
+    ('term_months', DEFAULT_TERM_MONTHS), ('usage', DEFAULT_USAGE),
+)
+
+USAGE_NAMES = {'personal': 'особисте використання', 'taxi': 'таксі', 'courier': "кур'єрські послуги"}
+
+NO_VOLUME_TEXT = "❓ Не указан объем двигателя. Напиши например: 'BMW X3 1998 см³'"
+NO_PREMIUM_TEXT = "⚠️ Не удалось рассчитать цену: нет тарифа для такой категории или условий договора."
+
+
+class Quote(NamedTuple):
+    """Текст расчета и версия тарифов, по которой он посчитан (None — тарифы не понадобились)"""
+    text: str
+    version: Optional[str]
+
+
+class QuoteFormatter:
+    """Текст расчета ОСЦПВ с кэшем готовых ответов для популярных авто"""
+
+    def __init__(self, store=tariff_store, cache_size: int = QUOTE_CACHE_SIZE):
+        self.store = store
+        self.cache = LRUCache(cache_size)
+        self._cache_version = store.version
+
+    def format(self, data: Dict[str, Any], age_over_30: bool = True) -> str:
+        """Форматирует результат расчета"""
+        return self.quote(data, age_over_30).text
+
+    def quote(self, data: Dict[str, Any], age_over_30: bool = True) -> Quote:
+        """Текст расчета вместе с версией тарифов, взятой для этого расчета"""
+        engine_volume = data.get('engine_volume')
+        category = data.get('category')
+        if not engine_volume and not category:
+            return Quote(NO_VOLUME_TEXT, None)
+
+        # Одна версия тарифов на весь расчет, даже если её подменят посередине
+        tariffs = self.store.current
+        # Готовый текст зависит от цен: при смене тарифов кэш сбрасывается
+        if self._cache_version != tariffs.version:
+            self.cache.clear()
+            self._cache_version = tariffs.version
+
+        factors = tuple(data.get(field) for field, _ in PREMIUM_FIELDS)
+        # Версия и в ключе: расчет по старым тарифам, закончившийся после сброса, не попадет к новым
+        key = (tariffs.version, data.get('brand'), data.get('model'), engine_volume, category, age_over_30, factors)
+        text = self.cache.get(key)
+        if text is None:
+            text = self._render(data, age_over_30, tariffs)
+            if text is None:
+                # Ошибку не кэшируем: тариф может появиться со следующей версией
+                return Quote(NO_PREMIUM_TEXT, tariffs.version)
+            self.cache.set(key, text)
+        quotes_total.inc(tariffs.version)
+        return Quote(text, tariffs.version)
+
+    def _render(self, data: Dict[str, Any], age_over_30: bool, tariffs: TariffSet) -> Optional[str]:
+        """Текст расчета или None, если премию посчитать нельзя"""
+        engine_volume = data.get('engine_volume')
+
+        # Явная категория (грузовик, автобус, прицеп) важнее объема; класс бонус-малус 0 — настоящий класс
+        factors = [default if data.get(field) is None else data[field] for field, default in PREMIUM_FIELDS]
+        try:
+            # Срок может прийти строкой ('12'); таблица премий ищет его как число
+            factors[2] = float(factors[2])
+        except (TypeError, ValueError):
+            return None
+        with stage_seconds.time('tariff'):
+            category = data.get('category') or tariffs.engine.get_category(engine_volume)
+            # Премия с коэффициентами — одно чтение из таблицы копеек
+            premium = tariffs.premiums.quote(category, factors[0], age_over_30, *factors[1:])
+        if premium is None:
+            return None
+
+        brand = data.get('brand') or 'Автомобиль'
+        model = data.get('model') or ''
+        volume_liters = f"{float(engine_volume)/1000:.3f} л" if engine_volume else ''
+
+        vehicle_name = f"{brand} {model}".strip()
+        if volume_liters:
+            vehicle_name += f", {volume_liters} бензин"
+
+        drivers = 'більше 30 років' if age_over_30 else 'без обмежень'
+        price = format_uah(premium)
+
+        terms = ''
+        if any(data.get(field) is not None for field, _ in PREMIUM_FIELDS):
+            zone, bonus_malus, months, usage = factors
+            terms = f"\n📋 {zone}, клас бонус-малус {bonus_malus}, строк {months:g} міс., {USAGE_NAMES.get(usage, usage)}"
+
+        return f"""✅ Ціна автоцивілки (ОСЦПВ) для {vehicle_name}:
+🩺 Покриття: життя і здоров'я потерпілих до 5 000 000 грн
+🚗 Покриття: майно потерпілих до 1 250 000 грн
+👤 Діє для водіїв віком: {drivers}{terms}
+💰 Ціна: {price} грн"""
+
+
+# Общий экземпляр для бота и webhook
+quote_formatter = QuoteFormatter()
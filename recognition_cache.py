@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import threading
+from typing import Any, Dict, Optional
+
+from image_pipeline import DOCUMENT_FIELDS, content_hash
+
+RECOGNITION_CACHE_PATH = os.getenv('RECOGNITION_CACHE_PATH', '/tmp/recognition_cache.sqlite3')
+RECOGNITION_CACHE_MAX_BYTES = int(os.getenv('RECOGNITION_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+
+
+class RecognitionCache:
+    """Распознанные поля документов в SQLite по sha256 байтов фото
+
+    Повторная отправка того же фото в Telegram приходит теми же байтами.
+    Перцептивный хэш не используем: техпаспорта разных машин на одном бланке
+    дают почти одинаковый хэш, и кэш вернул бы чужие данные. При превышении
+    max_bytes вытесняются давно не использованные записи.
+    """
+
+    # Проверка размера раз в столько записей
+    CLEANUP_EVERY = 100
+
+    def __init__(self, path: str = RECOGNITION_CACHE_PATH, max_bytes: int = RECOGNITION_CACHE_MAX_BYTES):
+        import sqlite3
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS recognition ('
+            ' key TEXT PRIMARY KEY, fields TEXT NOT NULL,'
+            ' size INTEGER NOT NULL, last_used REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS recognition_last_used ON recognition (last_used)')
+
+    def get(self, image_bytes: bytes) -> Optional[Dict[str, Any]]:
+        """Поля ранее распознанного фото или None"""
+        return self.lookup(content_hash(image_bytes))
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """То же по готовому sha256 (поток хэшируется при чтении)"""
+        with self._lock:
+            row = self._conn.execute('SELECT fields FROM recognition WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute('UPDATE recognition SET last_used = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0])
+
+    def set(self, image_bytes: bytes, fields: Dict[str, Any]):
+        """Сохраняет поля документа; результаты с ошибкой или без единого поля не кэшируются"""
+        self.store(content_hash(image_bytes), fields)
+
+    def store(self, key: str, fields: Dict[str, Any]):
+        # Пустой ответ (размытое фото, сбой распознавания без error) не должен залипнуть на этом фото
+        if fields.get('error') or all(fields.get(field) is None for field in DOCUMENT_FIELDS):
+            return
+        data = json.dumps({field: fields.get(field) for field in DOCUMENT_FIELDS}, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO recognition VALUES (?, ?, ?, ?)',
+                (key, data, len(key) + len(data), time.time())
+            )
+            self._writes += 1
+            if self._writes % self.CLEANUP_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        self._conn.execute(
+            'DELETE FROM recognition WHERE key IN ('
+            ' SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS total'
+            ' FROM recognition) WHERE total > ?)', (self.max_bytes,)
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM recognition').fetchone()[0]
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        total = self.hits + self.misses
+        with self._lock:
+            size, used = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM recognition').fetchone()
+        return {
+            'size': size,
+            'bytes': used,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else None,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def create_recognition_cache() -> Optional[RecognitionCache]:
+    """Кэш по переменным окружения; RECOGNITION_CACHE=0 отключает его"""
+    if os.getenv('RECOGNITION_CACHE', '1') == '0':
+        return None
+    return RecognitionCache()
@@ -0,0 +1,78 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+REPLY_QUEUE_SIZE = 1000
+REPLY_WORKERS = 4
+
+
+class ReplyQueue:
+    """Ограниченная очередь исходящих ответов, которую разбирают фоновые воркеры
+
+    Webhook кладет ответ в очередь и сразу возвращает 200, не дожидаясь
+    Telegram. Если очередь полна дольше put_timeout, ответ отправляется сразу
+    же — так перегрузка замедляет webhook (обратное давление), а ответы не теряются.
+    """
+
+    def __init__(self, send: Callable[..., Awaitable[Any]], maxsize: int = REPLY_QUEUE_SIZE,
+                 workers: int = REPLY_WORKERS, put_timeout: float = 0.5):
+        self.send = send
+        self.maxsize = maxsize
+        self.workers = workers
+        self.put_timeout = put_timeout
+        self.sent = 0
+        self.failed = 0
+        self.sent_inline = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.maxsize)
+            self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def put(self, *args, **kwargs):
+        """Ставит ответ в очередь; при долгой перегрузке отправляет его сам"""
+        self._start()
+        try:
+            await asyncio.wait_for(self._queue.put((args, kwargs)), self.put_timeout)
+        except asyncio.TimeoutError:
+            self.sent_inline += 1
+            await self._send(args, kwargs)
+
+    async def _send(self, args, kwargs):
+        try:
+            await self.send(*args, **kwargs)
+            self.sent += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"Ошибка отправки ответа: {e}")
+
+    async def _worker(self):
+        while True:
+            args, kwargs = await self._queue.get()
+            try:
+                await self._send(args, kwargs)
+            finally:
+                self._queue.task_done()
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def join(self):
+        """Ждет, пока воркеры отправят все, что уже в очереди"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self, timeout: float = 5.0):
+        """Досылает очередь и останавливает воркеры"""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Не отправлено ответов при остановке: {self.qsize()}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._queue = None
+        self._tasks = []
@@ -0,0 +1,95 @@
+"""Самостоятельный webhook-сервер: N процессов на одном порту через SO_REUSEPORT
+
+Каждый воркер — отдельный процесс со своим циклом событий и своим пулом
+соединений к Telegram; ядро раздает входящие соединения между ними.
+
+Запуск: python server.py [--port 8080] [--workers N]
+"""
+import os
+import signal
+import argparse
+import multiprocessing
+
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '8080'))
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '0')) or os.cpu_count() or 1
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/api/webhook')
+
+
+def create_app():
+    """aiohttp-приложение воркера; бот создается внутри процесса, после fork"""
+    from aiohttp import web
+    # Модуль bot импортируется уже в воркере: его simple_bot — свой у процесса, и метрики смотрят на него
+    from bot import simple_bot as bot, WEBHOOK_MODE
+    from metrics import registry
+
+    async def on_webhook(request):
+        try:
+            update_data = await request.json()
+        except (ValueError, UnicodeDecodeError):
+            return web.json_response({"error": "bad json"}, status=400)
+
+        if WEBHOOK_MODE == 'response':
+            payload = bot.reply_payload(update_data) or {"status": "ok"}
+            return web.json_response(payload)
+        if WEBHOOK_MODE == 'queue':
+            await bot.enqueue_update(update_data)
+        else:
+            await bot.process_update(update_data)
+        return web.json_response({"status": "ok"})
+
+    async def on_metrics(request):
+        # Метрики своего процесса: каждый воркер считает отдельно
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    async def on_cleanup(app):
+        await bot.reply_queue.close()
+        await bot.telegram.close()
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, on_webhook)
+    app.router.add_get('/metrics', on_metrics)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def run_worker(host: str, port: int):
+    from aiohttp import web
+
+    web.run_app(create_app(), host=host, port=port, reuse_port=True,
+                print=None, handle_signals=True)
+
+
+def serve(host: str = SERVER_HOST, port: int = SERVER_PORT, workers: int = SERVER_WORKERS):
+    """Запускает воркеры и ждет их; SIGTERM/SIGINT передается всем воркерам"""
+    if workers <= 1:
+        run_worker(host, port)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(host, port), name=f'webhook-{i}')
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    print(f"Webhook на {host}:{port}{WEBHOOK_PATH}, воркеров: {workers}")
+
+    def stop(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
@@ -0,0 +1,139 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Any, Optional, Tuple
+
+from tariff_snapshot import TARIFFS_SNAPSHOT, SnapshotError, load_snapshot
+
+# Классы возраста водителей — столбцы матрицы цен
+AGE_30_PLUS = 0
+AGE_NO_LIMIT = 1
+AGE_CLASSES = ('30plus', 'noLimit')
+
+# Встроенная сетка (зона 5.3): код категории, название, цена 30+, цена без ограничений.
+# Используется, если снимок data/tariffs.json недоступен.
+TARIFF_ROWS = (
+    # Легковые автомобили
+    ('B1', 'до 1600 см³, в т.ч. гибриды', 1959, 2176),
+    ('B2', '1601-2000 см³, в т.ч. гибриды', 2527, 2807),
+    ('B3', '2001-3000 см³, в т.ч. гибриды', 2585, 2873),
+    ('B4', 'более 3001 см³, в т.ч. гибриды', 3349, 3721),
+    ('B5', 'исключительно с ДВС, кроме гибридных', 3330, 3700),
+
+    # Автобусы и пассажирский транспорт
+    ('D1', 'до 20 чел.', 5464, 6071),
+    ('D2', 'более 20 чел.', 6855, 7616),
+    ('D3', 'трамваи', 6855, 7616),
+    ('D4', 'троллейбусы', 6855, 7616),
+
+    # Грузовые автомобили
+    ('C0', 'грузовые до 2,4т', 2703, 3003),
+    ('C1', 'грузовые свыше 2,4т, грузоподъемность до 2т', 4113, 4570),
+    ('C2', 'грузоподъемность свыше 2т', 5660, 6289),
+
+    # Мотоциклы
+    ('A1', 'мотоциклы до 300 см³, до 5 кВт', 745, 827),
+    ('A2', 'мотоциклы свыше 300 см³, багги, квадроциклы', 1371, 1524),
+
+    # Сельхозтехника
+    ('G1', 'тракторы', 3134, 3482),
+    ('G2', 'с/х техника', 3917, 4352),
+    ('G3', 'прицепы к с/х технике и тракторам', 980, 1088),
+
+    # Спецтехника
+    ('H1', 'ТС специального назначения', 3917, 4352),
+    ('H2', 'дорожно-строительная техника', 3917, 4352),
+    ('H3', 'военная техника', 3917, 4352),
+
+    # Прицепы
+    ('F', 'прицепы к легковым ТС', 666, 740),
+    ('E', 'прицепы к грузовым ТС', 980, 1088),
+)
+
+# Верхние границы объема (включительно) для легковых категорий
+CAR_VOLUME_THRESHOLDS = (1600, 2000, 3000)
+CAR_VOLUME_CATEGORIES = ('B1', 'B2', 'B3', 'B4')
+DEFAULT_CAR_CATEGORY = 'B2'
+
+# Зона регистрации, по которой бот показывает цену
+DEFAULT_ZONE = 'Зона 5.3'
+
+
+class TariffEngine:
+    """Тарифная сетка в памяти: категория по объему через bisect и плоская матрица цен"""
+
+    def __init__(self, rows: Tuple[tuple, ...] = TARIFF_ROWS, version: str = 'builtin'):
+        self.version = version
+        # Снимок старше data/tariffs.xlsx: tariff_store пересоберет тарифы из таблицы
+        self.stale = False
+        self.categories = tuple(row[0] for row in rows)
+        self.names = tuple(row[1] for row in rows)
+        self.index = {code: i for i, code in enumerate(self.categories)}
+
+        # Матрица [категория][класс возраста], развернутая в один массив
+        self.prices = array('i')
+        for row in rows:
+            self.prices.extend(row[2:2 + len(AGE_CLASSES)])
+
+        self._thresholds = list(CAR_VOLUME_THRESHOLDS)
+        self._volume_categories = CAR_VOLUME_CATEGORIES
+
+        # Представление в старом формате TariffHandler.tariffs
+        self._legacy = {
+            code: dict(name=self.names[i], **{
+                age: self.prices[i * len(AGE_CLASSES) + j] for j, age in enumerate(AGE_CLASSES)
+            })
+            for code, i in self.index.items()
+        }
+
+    def get_category(self, engine_volume) -> str:
+        """Определяет категорию легкового автомобиля по объему двигателя"""
+        try:
+            volume = int(engine_volume)
+        except (TypeError, ValueError):
+            return DEFAULT_CAR_CATEGORY
+        return self._volume_categories[bisect_left(self._thresholds, volume)]
+
+    def get_price(self, category: str, age_over_30: bool = True) -> Optional[int]:
+        """Цена для категории и возраста водителя"""
+        i = self.index.get(category)
+        if i is None:
+            return None
+        return self.prices[i * len(AGE_CLASSES) + (AGE_30_PLUS if age_over_30 else AGE_NO_LIMIT)]
+
+    def get_name(self, category: str) -> Optional[str]:
+        i = self.index.get(category)
+        return None if i is None else self.names[i]
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Тарифы в формате {'B1': {'name': ..., '30plus': ..., 'noLimit': ...}}"""
+        return self._legacy
+
+
+def rows_from_snapshot(snapshot: Dict[str, Any], zone: str = DEFAULT_ZONE) -> Tuple[tuple, ...]:
+    """Строки тарифной сетки для одной зоны из снимка таблицы"""
+    zone_index = snapshot['zones'].index(zone)
+    names = {row[0]: row[1] for row in TARIFF_ROWS}
+    return tuple(
+        (item['code'], names.get(item['code'], item['label']), *item['prices'][zone_index])
+        for item in snapshot['categories']
+    )
+
+
+def load_engine(path: str = TARIFFS_SNAPSHOT) -> TariffEngine:
+    """Строит движок из снимка тарифов, при ошибке — из встроенной сетки"""
+    try:
+        snapshot = load_snapshot(path)
+        rows = rows_from_snapshot(snapshot)
+    except (OSError, ValueError, KeyError, SnapshotError) as e:
+        print(f"Снимок тарифов недоступен, используем встроенные тарифы: {e}")
+        return TariffEngine()
+
+    engine = TariffEngine(rows, version=snapshot['checksum'][:12])
+    if snapshot['stale']:
+        print("Внимание: data/tariffs.xlsx изменен, а снимок не пересобран (python tariff_snapshot.py)")
+        engine.stale = True
+    return engine
+
+
+# Строится один раз при импорте и разделяется всеми точками входа
+tariff_engine = load_engine()
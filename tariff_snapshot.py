@@ -0,0 +1,225 @@
+"""Компиляция data/tariffs.xlsx в компактный JSON-снимок тарифов
+
+Сборка (после каждого обновления таблицы):
+    python tariff_snapshot.py            # пишет data/tariffs.json
+    python tariff_snapshot.py --check    # код 1, если снимок устарел
+
+Таблица читается стандартными zipfile и ElementTree, поэтому ни при сборке,
+ни во время работы не нужны openpyxl и pandas, а загрузка снимка не
+импортирует даже zipfile.
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+from typing import Dict, Any, List, Optional
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+TARIFFS_XLSX = os.path.join(DATA_DIR, 'tariffs.xlsx')
+TARIFFS_SNAPSHOT = os.path.join(DATA_DIR, 'tariffs.json')
+
+SNAPSHOT_FORMAT = 1
+
+NS = {
+    'm': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+}
+
+# В таблице коды категорий иногда набраны кириллицей (В1, А2)
+CYRILLIC_TO_LATIN = str.maketrans('АВСЕНКМОРТХ', 'ABCEHKMOPTX')
+CATEGORY_CODE = re.compile(r'^([A-Z]\d?)\b')
+CELL_REF = re.compile(r'^([A-Z]+)(\d+)$')
+
+
+class SnapshotError(Exception):
+    """Снимок поврежден или не соответствует исходной таблице"""
+
+
+def file_sha256(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - ord('A') + 1
+    return index - 1
+
+
+def _read_sheet(xlsx, sheet_name: Optional[str]) -> Dict[int, Dict[int, Any]]:
+    """Читает лист открытого zipfile.ZipFile в виде {строка: {столбец: значение}}"""
+    import posixpath
+    import xml.etree.ElementTree as ET
+
+    strings = []
+    if 'xl/sharedStrings.xml' in xlsx.namelist():
+        root = ET.fromstring(xlsx.read('xl/sharedStrings.xml'))
+        for item in root.findall('m:si', NS):
+            strings.append(''.join(t.text or '' for t in item.iter(f"{{{NS['m']}}}t")))
+
+    workbook = ET.fromstring(xlsx.read('xl/workbook.xml'))
+    sheets = workbook.findall('m:sheets/m:sheet', NS)
+    if sheet_name is None:
+        sheet = sheets[0]
+    else:
+        matches = [s for s in sheets if s.get('name') == sheet_name]
+        if not matches:
+            raise SnapshotError(f"Лист '{sheet_name}' не найден")
+        sheet = matches[0]
+
+    rels = ET.fromstring(xlsx.read('xl/_rels/workbook.xml.rels'))
+    rel_id = sheet.get(f"{{{NS['r']}}}id")
+    target = next(rel.get('Target') for rel in rels.findall('rel:Relationship', NS) if rel.get('Id') == rel_id)
+    path = target.lstrip('/') if target.startswith('/') else posixpath.join('xl', target)
+
+    cells: Dict[int, Dict[int, Any]] = {}
+    root = ET.fromstring(xlsx.read(path))
+    for cell in root.iter(f"{{{NS['m']}}}c"):
+        value = cell.find('m:v', NS)
+        if value is None or value.text is None:
+            continue
+        letters, row = CELL_REF.match(cell.get('r')).groups()
+        if cell.get('t') == 's':
+            parsed = strings[int(value.text)]
+        elif cell.get('t') in ('str', 'inlineStr'):
+            parsed = value.text
+        else:
+            number = float(value.text)
+            parsed = int(number) if number.is_integer() else number
+        cells.setdefault(int(row), {})[_column_index(letters)] = parsed
+    return cells
+
+
+def _find_row(cells: Dict[int, Dict[int, Any]], label: str) -> Optional[int]:
+    for row in sorted(cells):
+        first = cells[row].get(0)
+        if isinstance(first, str) and first.strip().startswith(label):
+            return row
+    return None
+
+
+def build_snapshot(xlsx_path: str = TARIFFS_XLSX, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+    """Разбирает тарифную сетку, коэффициенты срока и сферы использования"""
+    # Нужны только при сборке, загрузка снимка обходится без них
+    import zipfile
+
+    with zipfile.ZipFile(xlsx_path) as xlsx:
+        cells = _read_sheet(xlsx, sheet_name)
+
+    header_row = _find_row(cells, 'тип ТЗ')
+    if header_row is None:
+        raise SnapshotError("Не найден заголовок тарифной сетки ('тип ТЗ / Вік водіїв')")
+
+    # Каждая зона занимает два столбца: 30+ и без ограничений
+    zone_columns = sorted(col for col, value in cells[header_row].items()
+                          if isinstance(value, str) and value.startswith('Зона'))
+    zones = [cells[header_row][col].strip() for col in zone_columns]
+
+    categories: List[Dict[str, Any]] = []
+    for row in sorted(r for r in cells if r > header_row):
+        label = cells[row].get(0)
+        if not isinstance(label, str):
+            if categories:
+                break
+            continue
+        match = CATEGORY_CODE.match(label.strip().translate(CYRILLIC_TO_LATIN))
+        if not match:
+            if categories:
+                break
+            continue
+        prices = [[cells[row].get(col), cells[row].get(col + 1)] for col in zone_columns]
+        if any(not isinstance(price, int) for pair in prices for price in pair):
+            raise SnapshotError(f"Неполная строка тарифа в строке {row}: {label}")
+        categories.append({'code': match.group(1), 'label': label.strip(), 'prices': prices})
+
+    terms = []
+    term_row = _find_row(cells, 'Строк дії')
+    if term_row is not None and term_row + 1 in cells:
+        for col in sorted(c for c in cells[term_row] if c > 0):
+            coefficient = cells[term_row + 1].get(col)
+            if coefficient is not None:
+                terms.append([str(cells[term_row][col]).strip(), coefficient])
+
+    usage = []
+    usage_row = _find_row(cells, 'Сфери використання')
+    if usage_row is not None:
+        for row in sorted(r for r in cells if r > usage_row):
+            coefficient = cells[row].get(1)
+            if not isinstance(coefficient, (int, float)):
+                break
+            usage.append([str(cells[row].get(0, '')).strip(), coefficient])
+
+    snapshot = {
+        'format': SNAPSHOT_FORMAT,
+        'source': os.path.basename(xlsx_path),
+        'source_sha256': file_sha256(xlsx_path),
+        'sheet': sheet_name,
+        'zones': zones,
+        'age_classes': ['30plus', 'noLimit'],
+        'categories': categories,
+        'terms': terms,
+        'usage': usage,
+    }
+    snapshot['checksum'] = snapshot_checksum(snapshot)
+    return snapshot
+
+
+def snapshot_checksum(snapshot: Dict[str, Any]) -> str:
+    """Контрольная сумма содержимого снимка (без самого поля checksum)"""
+    body = {key: value for key, value in snapshot.items() if key != 'checksum'}
+    canonical = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def write_snapshot(snapshot: Dict[str, Any], path: str = TARIFFS_SNAPSHOT):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str = TARIFFS_SNAPSHOT, xlsx_path: Optional[str] = TARIFFS_XLSX) -> Dict[str, Any]:
+    """Загружает снимок и проверяет его целостность
+
+    Если рядом лежит исходная таблица, сверяет её хэш: расхождение значит,
+    что таблицу обновили, а снимок не пересобрали.
+    """
+    with open(path, encoding='utf-8') as f:
+        snapshot = json.load(f)
+
+    if snapshot.get('format') != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Неподдерживаемый формат снимка: {snapshot.get('format')}")
+    if snapshot.get('checksum') != snapshot_checksum(snapshot):
+        raise SnapshotError(f"Контрольная сумма снимка {path} не совпадает")
+
+    snapshot['stale'] = bool(xlsx_path and os.path.exists(xlsx_path)
+                             and file_sha256(xlsx_path) != snapshot['source_sha256'])
+    return snapshot
+
+
+def main(argv: List[str]) -> int:
+    if '--check' in argv:
+        try:
+            snapshot = load_snapshot()
+        except (OSError, ValueError, SnapshotError) as e:
+            print(f"Снимок тарифов недействителен: {e}")
+            return 1
+        if snapshot['stale']:
+            print(f"Снимок {TARIFFS_SNAPSHOT} устарел: пересоберите его из {TARIFFS_XLSX}")
+            return 1
+        print(f"Снимок тарифов актуален ({snapshot['checksum'][:12]})")
+        return 0
+
+    snapshot = build_snapshot()
+    write_snapshot(snapshot)
+    print(f"{TARIFFS_SNAPSHOT}: {len(snapshot['categories'])} категорий, "
+          f"{len(snapshot['zones'])} зон, checksum {snapshot['checksum'][:12]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
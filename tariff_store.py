@@ -0,0 +1,166 @@
+"""Версионированные тарифы с горячей перезагрузкой без перезапуска воркера
+
+TariffSet — тарифная сетка и таблица премий, собранные из одного снимка;
+после сборки их никто не меняет. Версия — начало контрольной суммы снимка.
+TariffStore.current заменяется одним присваиванием ссылки: расчет берет
+current один раз и до конца видит одну версию, а читатели не берут блокировок.
+
+Фоновый поток раз в TARIFF_WATCH_INTERVAL секунд сверяет время изменения и
+размер data/tariffs.xlsx и data/tariffs.json. Новый набор собирается в
+стороне: из таблицы, если её обновили без пересборки снимка, иначе из снимка.
+Ошибка сборки оставляет в работе прежнюю версию. Снимок, отставший от таблицы
+уже при старте, пересобирается из неё сразу. Версия в работе видна в метрике
+tariff_version_info и в логе при каждой смене; версию отдельного расчета
+возвращает QuoteFormatter.quote, а bot_quotes_total считает расчеты по версиям.
+"""
+import os
+import time
+import threading
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from tariff_engine import TariffEngine, tariff_engine, rows_from_snapshot
+from premium_engine import PremiumEngine, premium_engine, engine_from_snapshot
+from tariff_snapshot import TARIFFS_SNAPSHOT, TARIFFS_XLSX, SnapshotError, load_snapshot
+from metrics import registry, tariff_reloads_total
+
+# Секунд между проверками файлов тарифов; 0 выключает наблюдение
+TARIFF_WATCH_INTERVAL = float(os.getenv('TARIFF_WATCH_INTERVAL', '30'))
+
+
+class TariffSet(NamedTuple):
+    version: str
+    engine: TariffEngine
+    premiums: PremiumEngine
+    # 'tariffs.json', 'tariffs.xlsx' или 'builtin'
+    source: str
+
+
+def tariffs_from_snapshot(snapshot: Dict[str, Any], source: str) -> TariffSet:
+    version = snapshot['checksum'][:12]
+    return TariffSet(version, TariffEngine(rows_from_snapshot(snapshot), version=version),
+                     engine_from_snapshot(snapshot, version), source)
+
+
+def build_tariffs(path: str = TARIFFS_SNAPSHOT, xlsx_path: Optional[str] = TARIFFS_XLSX) -> TariffSet:
+    """Собирает набор тарифов из снимка или из обновленной таблицы
+
+    SnapshotError, OSError и др., если собрать не удалось ни так, ни так.
+    """
+    try:
+        snapshot = load_snapshot(path, xlsx_path)
+    except (OSError, ValueError, KeyError, SnapshotError) as e:
+        if not xlsx_path:
+            raise
+        print(f"Снимок тарифов недоступен, собираем из таблицы: {e}")
+        snapshot = None
+
+    if snapshot is None or snapshot['stale']:
+        # Таблица нужна только здесь, поэтому и разбор импортируется здесь
+        from tariff_snapshot import build_snapshot
+        try:
+            return tariffs_from_snapshot(build_snapshot(xlsx_path), os.path.basename(xlsx_path))
+        except (OSError, ValueError, KeyError, SnapshotError) as e:
+            if snapshot is None:
+                raise
+            print(f"Таблица тарифов не собирается, остаемся на снимке {snapshot['checksum'][:12]}: {e}")
+    return tariffs_from_snapshot(snapshot, os.path.basename(path))
+
+
+def _signature(paths: Tuple[str, ...]) -> Tuple[Optional[Tuple[int, int]], ...]:
+    """(mtime_ns, размер) каждого файла; None для отсутствующего"""
+    result = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            result.append(None)
+        else:
+            result.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(result)
+
+
+class TariffStore:
+    """Текущий набор тарифов и фоновый поток, который подменяет его при изменении файлов"""
+
+    def __init__(self, current: TariffSet, path: str = TARIFFS_SNAPSHOT, xlsx_path: Optional[str] = TARIFFS_XLSX,
+                 interval: float = TARIFF_WATCH_INTERVAL):
+        """xlsx_path=None — следить только за снимком"""
+        self.current = current
+        self.path = path
+        self.xlsx_path = xlsx_path
+        self.interval = interval
+        self.reloaded_at = time.time()
+        self._paths = tuple(item for item in (path, xlsx_path) if item)
+        self._signature = _signature(self._paths)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def version(self) -> str:
+        return self.current.version
+
+    def reload(self) -> Optional[TariffSet]:
+        """Собирает тарифы заново и подменяет current; None, если сборка не удалась
+
+        Блокировку берут только писатели, чтобы два перезапуска не собирали набор одновременно.
+        """
+        with self._lock:
+            signature = _signature(self._paths)
+            try:
+                tariffs = build_tariffs(self.path, self.xlsx_path)
+            except (OSError, ValueError, KeyError, SnapshotError) as e:
+                tariff_reloads_total.inc('error')
+                print(f"Перезагрузка тарифов не удалась, остаемся на {self.current.version}: {e}")
+                return None
+            finally:
+                # Сломанный файл не пересобираем на каждой проверке, ждем следующего изменения
+                self._signature = signature
+
+            previous = self.current
+            self.current = tariffs
+            self.reloaded_at = time.time()
+            tariff_reloads_total.inc('ok')
+            if tariffs.version != previous.version:
+                print(f"Тарифы обновлены: {previous.version} -> {tariffs.version} ({tariffs.source})")
+            return tariffs
+
+    def check(self) -> Optional[TariffSet]:
+        """Перезагружает тарифы, если файлы изменились с прошлой проверки"""
+        if _signature(self._paths) == self._signature:
+            return None
+        return self.reload()
+
+    def start_watcher(self):
+        """Запускает фоновую проверку файлов (один поток на процесс)"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, name='tariff-watcher', daemon=True)
+        self._thread.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop.clear()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Ошибка проверки тарифов: {e}")
+
+
+# Первая версия — уже построенные при импорте tariff_engine и premium_engine
+tariff_store = TariffStore(TariffSet(
+    tariff_engine.version, tariff_engine, premium_engine,
+    'builtin' if tariff_engine.version == 'builtin' else os.path.basename(TARIFFS_SNAPSHOT),
+))
+registry.info('tariff_version_info', 'Версия тарифов в работе', ('version', 'source'),
+              lambda: (tariff_store.current.version, tariff_store.current.source))
+if tariff_engine.stale:
+    # Таблицу обновили без пересборки снимка: сразу считаем по ней, а не по устаревшему снимку
+    tariff_store.reload()
+tariff_store.start_watcher()
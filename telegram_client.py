@@ -0,0 +1,174 @@
+import os
+import random
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from metrics import telegram_seconds, telegram_retries_total, errors_total
+
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+# Потолок паузы по retry_after: при флуде Telegram просит ждать минутами, а ответ пользователю нужен сейчас
+TELEGRAM_RETRY_AFTER_MAX = float(os.getenv('TELEGRAM_RETRY_AFTER_MAX', '30'))
+
+
+class TelegramClient:
+    """Общий клиент Telegram Bot API с пулом keep-alive соединений"""
+
+    def __init__(self, bot_token: str, api_url: Optional[str] = None,
+                 max_connections: int = 20, max_concurrency: int = 10,
+                 keepalive_timeout: float = 60.0, request_timeout: float = 10.0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 10.0,
+                 retry_after_max: float = TELEGRAM_RETRY_AFTER_MAX):
+        self.bot_token = bot_token
+        self.api_url = (api_url or TELEGRAM_API_URL).rstrip('/')
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+
+        # Сессия и семафор привязаны к циклу событий, в котором созданы
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+    def _get_session(self):
+        """Возвращает живую сессию для текущего цикла событий, создавая её при необходимости"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            import aiohttp
+
+            self._release_session()
+
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._session
+
+    def _release_session(self):
+        """Отпускает сессию прежнего цикла событий перед созданием новой
+
+        Если тот цикл еще работает (loop_runner в другом потоке), сессия закрывается
+        в нем же: закрывать её из чужого цикла нельзя. Если цикл уже закрыт
+        (asyncio.run на каждый вызов), его транспорты больше никто не использует,
+        а закрыть их через закрытый цикл невозможно: сокеты освободит сборщик мусора
+        вместе со старой сессией.
+        """
+        session, loop = self._session, self._loop
+        if session is not None and not session.closed and loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Задержка перед повтором: retry_after от Telegram или экспонента с джиттером"""
+        if retry_after:
+            return min(float(retry_after), self.retry_after_max)
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    async def call(self, method: str, payload: Dict[str, Any],
+                   timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Вызывает метод Bot API с повторами на 429/5xx и сетевых ошибках
+
+        timeout переопределяет request_timeout для одного вызова (long polling).
+        """
+        with telegram_seconds.time(method):
+            return await self._call(method, payload, timeout)
+
+    async def _call(self, method: str, payload: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+        import aiohttp
+
+        session = self._get_session()
+        url = f"{self.api_url}/bot{self.bot_token}/{method}"
+        options = {'timeout': aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+
+        attempt = 0
+        while True:
+            retry_after = None
+            async with self._semaphore:
+                try:
+                    async with session.post(url, json=payload, **options) as response:
+                        status = response.status
+                        data = await response.json(content_type=None)
+                # ValueError — не JSON: HTML-страница балансировщика (502/504), повторяем, как 5xx
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError, ValueError):
+                    if attempt >= self.max_retries:
+                        errors_total.inc('telegram')
+                        raise
+                    status, data = None, None
+
+            if status is not None and status != 429 and status < 500:
+                return data
+
+            if attempt >= self.max_retries:
+                errors_total.inc('telegram')
+                return data
+
+            if isinstance(data, dict):
+                retry_after = (data.get('parameters') or {}).get('retry_after')
+
+            # Ждем вне семафора, чтобы не занимать слот другим запросам
+            telegram_retries_total.inc(method)
+            await asyncio.sleep(self._backoff_delay(attempt, retry_after))
+            attempt += 1
+
+    async def send_message(self, chat_id, text: str, **params) -> Dict[str, Any]:
+        """Отправляет сообщение в чат"""
+        payload = {'chat_id': chat_id, 'text': text}
+        payload.update(params)
+        return await self.call('sendMessage', payload)
+
+    async def get_updates(self, offset: Optional[int] = None, limit: int = 100,
+                          timeout: int = 30) -> List[Dict[str, Any]]:
+        """Пачка обновлений через long polling; RuntimeError, если Telegram вернул ошибку"""
+        payload = {'limit': limit, 'timeout': timeout, 'allowed_updates': ['message']}
+        if offset is not None:
+            payload['offset'] = offset
+        # Запрос висит до timeout секунд, поэтому сетевой таймаут берем с запасом
+        data = await self.call('getUpdates', payload, timeout=timeout + self.request_timeout)
+        if not isinstance(data, dict) or not data.get('ok'):
+            raise RuntimeError(f"getUpdates: {data}")
+        return data['result']
+
+    async def get_file(self, file_id: str) -> Dict[str, Any]:
+        """Метаданные файла (file_path, file_size) для скачивания"""
+        data = await self.call('getFile', {'file_id': file_id})
+        if not isinstance(data, dict) or not data.get('ok'):
+            raise RuntimeError(f"getFile: {data}")
+        return data['result']
+
+    async def download_file(self, file_id: str, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """Скачивает файл по file_id кусками, не собирая его целиком в памяти"""
+        import aiohttp
+
+        file_path = (await self.get_file(file_id))['file_path']
+        session = self._get_session()
+        url = f"{self.api_url}/file/bot{self.bot_token}/{file_path}"
+        # Большой файл может качаться дольше request_timeout, ограничиваем только паузы чтения
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=self.request_timeout)
+        async with self._semaphore:
+            async with session.get(url, timeout=timeout) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    yield chunk
+
+    async def delete_webhook(self) -> Dict[str, Any]:
+        """Снимает webhook: пока он установлен, getUpdates возвращает 409"""
+        return await self.call('deleteWebhook', {'drop_pending_updates': False})
+
+    async def close(self):
+        """Закрывает сессию и освобождает соединения пула"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._semaphore = None
+        self._loop = None
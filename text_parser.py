@@ -0,0 +1,161 @@
+import re
+from typing import Dict, Any, Iterable, Optional
+
+from lru_cache import LRUCache
+from brand_catalog import BrandCatalog, load_catalog
+
+# Известные марки автомобилей
+CAR_BRANDS = [
+    'BMW', 'MERCEDES', 'AUDI', 'VOLKSWAGEN', 'TOYOTA', 'HONDA', 'NISSAN',
+    'HYUNDAI', 'KIA', 'FORD', 'CHEVROLET', 'OPEL', 'PEUGEOT', 'RENAULT',
+    'CITROEN', 'FIAT', 'SKODA', 'SEAT', 'MAZDA', 'SUBARU', 'MITSUBISHI',
+    'LEXUS', 'INFINITI', 'ACURA', 'VOLVO', 'SAAB', 'JAGUAR', 'LAND ROVER',
+    'PORSCHE', 'MINI', 'ALFA ROMEO', 'LADA', 'VAZ', 'GAZ', 'UAZ', 'ZAZ',
+    'DAEWOO', 'SUZUKI', 'ISUZU', 'DACIA', 'LANCIA', 'CHERY', 'GEELY'
+]
+
+PARSE_CACHE_SIZE = 4096
+
+MIN_ENGINE_VOLUME = 500
+MAX_ENGINE_VOLUME = 8000
+
+# Приоритет форм записи объема: явные единицы важнее голых чисел
+VOLUME_KINDS = ('cm', 'liters', 'cc', 'short_liters', 'number')
+
+LETTERS = 'А-ЯЁІЇЄҐA-Z'
+WORD_CHARS = LETTERS + '0-9\\-'
+
+
+class BrandTrie:
+    """Префиксное дерево марок, компилируемое в одно регулярное выражение
+
+    Общие префиксы вынесены за скобки (A(?:UDI|CURA|LFA ROMEO)), поэтому движок
+    регулярных выражений проверяет каждую позицию текста за длину самой марки,
+    а не перебирая весь список марок.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.root: Dict[str, Any] = {}
+        for word in words:
+            node = self.root
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = True
+
+    def to_regex(self) -> str:
+        return self._node_regex(self.root)
+
+    def _node_regex(self, node: Dict[str, Any]) -> str:
+        branches = []
+        terminal = False
+        for char in sorted(node, key=lambda c: (c == '', c)):
+            if char == '':
+                terminal = True
+                continue
+            branches.append(re.escape(char) + self._node_regex(node[char]))
+
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            # Более длинная марка предпочтительнее своего префикса
+            return '(?:' + body + ')?' if len(branches) == 1 else body[:-1] + '|)'
+        return body
+
+
+class VehicleTextParser:
+    """Однопроходный разбор текста: объем двигателя, марка, модель и год"""
+
+    def __init__(self, brands: Iterable[str] = CAR_BRANDS, cache_size: int = PARSE_CACHE_SIZE,
+                 catalog: Optional[BrandCatalog] = None):
+        self.brands = list(brands)
+        self.cache = LRUCache(cache_size)
+        # Нечеткий поиск по каталогу — только если точного латинского названия в тексте нет
+        self.catalog = catalog
+        trie = BrandTrie(self.brands)
+
+        self.pattern = re.compile(
+            r'(?<![0-9])(?:'
+            r'(?P<cm>\d{3,4})\s*(?:СМ|CM|КУБ)'            # 1998 см³, 2000 кубов
+            r'|(?P<liters>\d{1,2})[.,](?P<liters_frac>\d{3})(?![0-9])'  # 1.998 л, 2,000
+            r'|(?P<cc>\d{3,4})\s*(?:СС|CC)'               # 1998 сс
+            r'|(?P<short_liters>\d)[.,](?P<short_frac>\d{1,2})(?![0-9])(?:\s*[ЛL](?![' + LETTERS + r']))?'  # 1.6, 2.0 л
+            r'|(?<![' + LETTERS + r'])(?P<number>\d{3,4})(?![0-9' + LETTERS + r'])'  # просто цифры 1998
+            r')'
+            r'|(?P<brand>' + trie.to_regex() + r')'
+            # Модель смотрим вперед, не поглощая: в ней тоже может быть объем
+            r'(?=\s*(?P<model>(?!\d{3,4}(?![' + WORD_CHARS + r'])|\d{1,2}[.,]\d)[' + WORD_CHARS + r']+))?'
+        )
+        self.year_pattern = re.compile(r'(?:19[89]\d|20[0-2]\d)')
+
+    def parse(self, text: str) -> Dict[str, Optional[str]]:
+        """Разбирает текст пользователя; частые сообщения отдаются из кэша"""
+        key = ' '.join(text.upper().split())
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = self.parse_uncached(key)
+            self.cache.set(key, cached)
+        # Копия: вызывающий код может дополнять результат
+        return dict(cached)
+
+    def parse_uncached(self, text: str) -> Dict[str, Optional[str]]:
+        """Разбирает текст пользователя за один проход"""
+        text = text.upper().strip()
+        result = {'brand': None, 'model': None, 'engine_volume': None, 'year': None}
+
+        volumes = [None] * len(VOLUME_KINDS)
+        # Числа, кроме года, в том числе вне диапазона объемов
+        numbers = 0
+        for match in self.pattern.finditer(text):
+            if match.group('brand') is not None:
+                if result['brand'] is None:
+                    result['brand'] = match.group('brand')
+                    result['model'] = match.group('model')
+                continue
+
+            for rank, kind in enumerate(VOLUME_KINDS):
+                digits = match.group(kind)
+                if digits is not None:
+                    break
+            if kind == 'liters':
+                digits += match.group('liters_frac')
+            elif kind == 'short_liters':
+                digits += match.group('short_frac').ljust(3, '0')
+            elif kind == 'number' and result['year'] is None and self.year_pattern.fullmatch(digits):
+                # Голое число, похожее на год, — год, а объемом станет, только если других чисел нет
+                result['year'] = digits
+                continue
+            numbers += 1
+
+            if volumes[rank] is None and MIN_ENGINE_VOLUME <= int(digits) <= MAX_ENGINE_VOLUME:
+                volumes[rank] = digits
+
+        for volume in volumes:
+            if volume is not None:
+                result['engine_volume'] = volume
+                break
+        else:
+            # 'BMW X3 2000': единственное число — и год, и объем
+            if (not numbers and result['year'] is not None
+                    and MIN_ENGINE_VOLUME <= int(result['year']) <= MAX_ENGINE_VOLUME):
+                result['engine_volume'] = result['year']
+
+        if result['brand'] is None and self.catalog is not None:
+            brand, model, fuzzy = self.catalog.match(text)
+            if brand is not None:
+                result['brand'] = brand
+                result['model'] = model
+                if fuzzy:
+                    # Марка по слову с опечаткой — догадка: марку из диалога она не заменяет
+                    result['brand_guessed'] = True
+
+        return result
+
+
+# Общий экземпляр: шаблоны и индекс каталога строятся один раз при импорте
+vehicle_parser = VehicleTextParser(catalog=load_catalog(brands=CAR_BRANDS))
+
+
+def parse_vehicle_text(text: str) -> Dict[str, Optional[str]]:
+    """Разбирает текст общим парсером"""
+    return vehicle_parser.parse(text)
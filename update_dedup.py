@@ -0,0 +1,49 @@
+import os
+import time
+import threading
+from collections import deque
+from typing import Optional
+
+DEDUP_CAPACITY = int(os.getenv('DEDUP_CAPACITY', '10000'))
+DEDUP_WINDOW = float(os.getenv('DEDUP_WINDOW', '3600'))
+
+
+class UpdateDeduplicator:
+    """Недавно обработанные update_id: кольцевой буфер по времени плюс множество
+
+    Telegram повторяет webhook, если мы отвечаем медленно. Повтор отсекается
+    за O(1) до разбора текста. Память ограничена capacity записями, а записи
+    старше window секунд забываются.
+    """
+
+    def __init__(self, capacity: int = DEDUP_CAPACITY, window: float = DEDUP_WINDOW):
+        self.capacity = capacity
+        self.window = window
+        self.dropped = 0
+        self._ring = deque()
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def seen(self, update_id: Optional[int]) -> bool:
+        """True, если update уже обрабатывался; иначе запоминает его"""
+        if update_id is None:
+            return False
+
+        now = time.monotonic()
+        with self._lock:
+            ring = self._ring
+            while ring and now - ring[0][1] > self.window:
+                self._seen.discard(ring.popleft()[0])
+
+            if update_id in self._seen:
+                self.dropped += 1
+                return True
+
+            self._seen.add(update_id)
+            ring.append((update_id, now))
+            if len(ring) > self.capacity:
+                self._seen.discard(ring.popleft()[0])
+            return False
+
+    def __len__(self) -> int:
+        return len(self._seen)
@@ -0,0 +1,182 @@
+import re
+from bisect import bisect_left
+from typing import Dict, NamedTuple, Optional
+
+from tariff_engine import CAR_VOLUME_THRESHOLDS, CAR_VOLUME_CATEGORIES
+from text_parser import BrandTrie
+
+# Тип ТС, для которого категорию определяет объем двигателя
+AUTO = 'AUTO'
+DEFAULT_CATEGORY = 'B2'
+
+# Семейства в порядке приоритета: при нескольких совпадениях побеждает более
+# раннее. Легковые — последними: «грузовой автомобиль» должен стать грузовиком
+FAMILIES = ('trailer', 'truck', 'bus', 'tram', 'trolleybus', 'moto', 'quad',
+            'tractor', 'agro', 'special', 'car')
+
+# Основы слов -> семейство. Совпадение — по началу слова, как 'грузов' в 'грузовик'
+STEMS = {
+    'car': ('легков', 'автомобил', 'седан', 'хэтчбек', 'хетчбек', 'универсал', 'купе',
+            'кроссовер', 'внедорожник', 'минивэн'),
+    'truck': ('грузов', 'фургон', 'самосвал', 'тягач', 'фура'),
+    'bus': ('автобус', 'микроавтобус', 'маршрутк'),
+    'tram': ('трамва',),
+    'trolleybus': ('троллейбус', 'тролейбус'),
+    'moto': ('мотоцикл', 'скутер', 'мопед', 'мотороллер', 'байк'),
+    'quad': ('квадроцикл', 'багги', 'трицикл'),
+    'tractor': ('трактор',),
+    'agro': ('комбайн', 'сельхоз', 'с/х'),
+    'special': ('экскаватор', 'бульдозер', 'кран', 'автокран', 'погрузчик', 'грейдер', 'каток'),
+    'trailer': ('прицеп', 'полуприцеп'),
+}
+
+# Слова, после которых тоннаж — полная масса, а не грузоподъемность
+MASS_STEMS = ('масс', 'вес')
+
+# Число и следующее за ним слово-единица; ищутся, только если в тексте есть цифры.
+# Лошадиные силы (л.с., к.с.) проверяются раньше слова: иначе 'л' из '150 л.с.' — литры
+NUMBER_PATTERN = re.compile(r'(\d+(?:[.,]\d+)?)\s*-?\s*([лк](?:\.\s*)?с(?![а-яёa-z])|[а-яёa-z]+[³3]?)')
+
+# Единица -> величина: точные написания и начала слов
+UNITS = {
+    'т': 'tons', 'тн': 'tons', 't': 'tons',
+    'кг': 'kg', 'kg': 'kg',
+    'квт': 'kw', 'kw': 'kw',
+    'см': 'cc', 'см3': 'cc', 'см³': 'cc', 'cc': 'cc',
+    'л': 'liters', 'l': 'liters',
+    'лс': 'hp', 'кс': 'hp', 'hp': 'hp',
+}
+UNIT_STEMS = (
+    ('тонн', 'tons'), ('куб', 'cc'), ('лошад', 'hp'),
+    ('мест', 'seats'), ('посадочн', 'seats'), ('чел', 'seats'), ('пассаж', 'seats'), ('seat', 'seats'),
+)
+DIGIT_PATTERN = re.compile(r'\d')
+
+KW_PER_HP = 0.7355
+# Больше — не объем в литрах, а опечатка или другая величина
+MAX_LITERS = 20
+
+
+class VehicleClass(NamedTuple):
+    """Результат классификации: категория тарифа, семейство и извлеченные числа"""
+    category: str
+    family: Optional[str]
+    tons: Optional[float] = None
+    seats: Optional[int] = None
+    kw: Optional[float] = None
+    cc: Optional[int] = None
+
+
+def _number(value: str) -> float:
+    return float(value.replace(',', '.'))
+
+
+class VehicleClassifier:
+    """Категория ТС по свободному описанию за один проход токенизации
+
+    Все основы собраны в префиксное дерево и скомпилированы в одно регулярное
+    выражение с привязкой к началу слова (как марки в text_parser), поэтому
+    текст просматривается один раз внутри движка re, а не по разу на каждое
+    ключевое слово. Числа с единицами (т, мест, кВт, см³) уточняют подкатегорию
+    внутри семейства.
+    """
+
+    def __init__(self, stems: Dict[str, tuple] = STEMS):
+        self.index = {stem: family for family, words in stems.items() for stem in words}
+        self.index.update((stem, 'mass') for stem in MASS_STEMS)
+        self.pattern = re.compile('(?<![а-яёa-z])(' + BrandTrie(self.index).to_regex() + ')')
+        self.priority = {family: i for i, family in enumerate(FAMILIES)}
+
+    def classify(self, text: str) -> VehicleClass:
+        tons = seats = kw = cc = None
+        lowered = text.lower()
+
+        index = self.index
+        families = {index[stem] for stem in self.pattern.findall(lowered)}
+        mass = 'mass' in families
+        families.discard('mass')
+
+        if DIGIT_PATTERN.search(lowered) is not None:
+            tons, seats, kw, cc = self._numbers(lowered)
+
+        family = min(families, key=self.priority.__getitem__) if families else None
+        category = self._category(family, families, tons, mass, seats, kw, cc)
+        return VehicleClass(category, family, tons, seats, kw, cc)
+
+    @staticmethod
+    def _numbers(lowered: str):
+        tons = seats = kw = cc = None
+        for number, unit in NUMBER_PATTERN.findall(lowered):
+            kind = UNITS.get(unit.replace('.', '').replace(' ', ''))
+            if kind is None:
+                kind = next((kind for stem, kind in UNIT_STEMS if unit.startswith(stem)), None)
+                if kind is None:
+                    continue
+            if kind == 'tons':
+                tons = _number(number)
+            elif kind == 'kg':
+                tons = _number(number) / 1000
+            elif kind == 'seats':
+                seats = int(_number(number))
+            elif kind == 'kw':
+                kw = _number(number)
+            elif kind == 'hp':
+                kw = _number(number) * KW_PER_HP
+            elif kind == 'liters':
+                liters = _number(number)
+                if liters <= MAX_LITERS:
+                    cc = round(liters * 1000)
+            else:
+                cc = int(_number(number))
+        return tons, seats, kw, cc
+
+    @staticmethod
+    def _category(family, families, tons, mass, seats, kw, cc) -> str:
+        if family == 'trailer':
+            # Прицеп к грузовику/трактору — отдельные категории
+            if 'truck' in families:
+                return 'E'
+            if 'tractor' in families or 'agro' in families:
+                return 'G3'
+            return 'F'
+
+        if family == 'truck':
+            if tons is None:
+                return 'C1'  # по умолчанию средний грузовик
+            if mass:
+                # Полная масса: до 2,4 т — C0, тяжелее — C1
+                return 'C0' if tons <= 2.4 else 'C1'
+            # Тоннаж без уточнения считаем грузоподъемностью
+            return 'C1' if tons <= 2 else 'C2'
+
+        if family == 'bus':
+            return 'D2' if seats is not None and seats > 20 else 'D1'
+        if family == 'tram':
+            return 'D3'
+        if family == 'trolleybus':
+            return 'D4'
+
+        if family == 'moto':
+            if (cc is not None and cc > 300) or (kw is not None and kw > 5):
+                return 'A2'
+            return 'A1'
+        if family == 'quad':
+            return 'A2'
+
+        if family == 'tractor':
+            return 'G1'
+        if family == 'agro':
+            return 'G2'
+        if family == 'special':
+            return 'H2'
+
+        if family == 'car' or cc is not None:
+            if cc is None:
+                return AUTO  # требует определения по объему
+            return CAR_VOLUME_CATEGORIES[bisect_left(CAR_VOLUME_THRESHOLDS, cc)]
+
+        return DEFAULT_CATEGORY  # легковой по умолчанию
+
+
+# Общий экземпляр: индекс строится один раз при импорте
+vehicle_classifier = VehicleClassifier()